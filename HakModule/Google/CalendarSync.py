@@ -0,0 +1,431 @@
+from google.oauth2 import credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from collections import OrderedDict, namedtuple
+from typing import Iterable, Optional
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import get_record_key
+from HakModule.UnivData.HYU_S.Catalog.schedule import parse_schedule
+import datetime
+import hashlib
+import json
+import time
+
+# event_ids are the calendar event ids of each kind of change
+SyncPlan = namedtuple('SyncPlan', ['inserts', 'updates', 'deletes', 'unchanged'])
+# state is the {event id: fingerprint} to pass as previous to the next sync
+SyncResult = namedtuple('SyncResult', ['inserted', 'updated', 'deleted', 'failed', 'state', 'request_count'])
+
+# Google Calendar rejects batches with more than 50 calls
+MAX_BATCH_SIZE: int = 50
+RETRY_STATUSES: set[int] = {429, 500, 503}
+# 403 is only retried for these reasons, other 403s (ex) no write access to the calendar) are final
+RATE_LIMIT_REASONS: set[str] = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+def get_event_id(key: tuple, day: int, start: int) -> str:
+    """
+    Get a stable calendar event id of one weekly meeting of a class.
+
+    Calendar event ids only allow the base32hex characters (a-v, 0-9), which hex digests satisfy.
+
+    Parameters
+    ----------
+    key : tuple
+        RecordKey (year, term, code) of the class.
+    day : int
+        Day index (0 is Monday).
+    start : int
+        Start minute of the meeting.
+
+    Returns
+    -------
+    str
+        Event id.
+    """
+    return hashlib.blake2b(f"hak|{'|'.join(map(str, key))}|{day}|{start}".encode('UTF-8'), digest_size=16).hexdigest()
+
+
+def get_fingerprint(event: dict) -> str:
+    """
+    Get a fingerprint of an event body. Events with the same fingerprint need no update.
+    """
+    text = json.dumps(event, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(text.encode('UTF-8'), digest_size=16).hexdigest()
+
+
+def is_retryable(error: Optional[Exception]) -> bool:
+    """
+    Check if a failed call is worth retrying (rate limit or server error).
+    """
+    if not isinstance(error, HttpError):
+        return False
+    if error.status_code in RETRY_STATUSES:
+        return True
+    if error.status_code == 403 and isinstance(error.error_details, list):
+        return any(isinstance(detail, dict) and detail.get('reason') in RATE_LIMIT_REASONS
+                   for detail in error.error_details)
+    return False
+
+
+def get_holiday_weeks(weekly_course: Optional[list]) -> set[int]:
+    """
+    Get the week numbers that are marked as holidays in ``weekly_course``.
+
+    Parameters
+    ----------
+    weekly_course : list or None
+        ``weekly_course`` part of a class data.
+
+    Returns
+    -------
+    set[int]
+        1-based holiday week numbers.
+    """
+    weeks = set()
+    for course in weekly_course or []:
+        if not course or not course.get('holiday'):
+            continue
+        try:
+            weeks.add(int(course.get('number')))
+        except (TypeError, ValueError):
+            continue
+    return weeks
+
+
+def merge_meetings(slots: Iterable) -> list[tuple[int, int, int, Optional[str], Optional[str]]]:
+    """
+    Merge back-to-back schedule slots of the same day and room into one meeting.
+
+    Parameters
+    ----------
+    slots : Iterable[ScheduleSlot]
+        Parsed ``course_info['schedule']`` slots.
+
+    Returns
+    -------
+    list of tuple
+        (day, start, end, building, room) meetings.
+    """
+    meetings = []
+    for slot in sorted(set(slots), key=lambda slot: (slot.day, slot.start, slot.end)):
+        if meetings:
+            day, start, end, building, room = meetings[-1]
+            if day == slot.day and (building, room) == (slot.building, slot.room) and slot.start <= end:
+                meetings[-1] = (day, start, max(end, slot.end), building, room)
+                continue
+        meetings.append((slot.day, slot.start, slot.end, slot.building, slot.room))
+    return meetings
+
+
+class GoogleCalendarSync:
+    """
+    Diff-based sync of HYU_S class schedules to a Google calendar.
+
+    Every weekly meeting of a class is one recurring event (RRULE with COUNT = semester weeks)
+    and the given holiday dates are EXDATEs, so a semester is one event per
+    meeting instead of one per meeting per week. Event ids are derived from the class key and
+    the meeting time, so the fingerprints of the last pushed events (the sync state) are enough
+    to send only inserts, updates and deletes, grouped into batch requests.
+
+    Attributes
+    ----------
+    calendar_id : str
+        Calendar to sync to.
+    time_zone : str
+        Time zone of the class times.
+    batch_size : int
+        Maximum number of calls in one batch request.
+    max_retries : int
+        Retries of a call that failed with a rate limit or server error.
+    retry_delay : float
+        First delay before a retry (doubled after every retry).
+
+    Methods
+    -------
+    from_credentials(cred, calendar_id='primary')
+        Create a sync with a calendar service built from credentials.
+    build_events(datas, semester_start, holiday_dates=None, week_count=16, language='kr')
+        Convert class datas to recurring event bodies.
+    plan(events, previous)
+        Diff events against the last pushed state.
+    sync(events, previous)
+        Push the changes and get the new state.
+    """
+    def __init__(self,
+                 service,
+                 calendar_id: str = 'primary',
+                 time_zone: str = 'Asia/Seoul',
+                 batch_size: int = MAX_BATCH_SIZE,
+                 max_retries: int = 3,
+                 retry_delay: float = 1):
+        """
+        Initialize the GoogleCalendarSync.
+
+        Parameters
+        ----------
+        service : googleapiclient.discovery.Resource
+            Calendar v3 service (ex) ``build('calendar', 'v3', credentials=cred)``).
+        calendar_id : str, optional
+            Calendar to sync to, by default 'primary'.
+        time_zone : str, optional
+            Time zone of the class times, by default 'Asia/Seoul'.
+        batch_size : int, optional
+            Maximum number of calls in one batch request, by default 50 (the Calendar API limit).
+        max_retries : int, optional
+            Retries of a call that failed with a rate limit or server error, by default 3.
+        retry_delay : float, optional
+            First delay before a retry, by default 1.
+        """
+        self.service = service
+        self.calendar_id: str = calendar_id
+        self.time_zone: str = time_zone
+        self.batch_size: int = min(batch_size, MAX_BATCH_SIZE)
+        self.max_retries: int = max_retries
+        self.retry_delay: float = retry_delay
+
+    @classmethod
+    def from_credentials(cls, cred: credentials.Credentials, calendar_id: str = 'primary',
+                         **kwargs) -> 'GoogleCalendarSync':
+        """
+        Create a sync with a calendar service built from credentials
+        (ex) from ``GoogleOAuthBuilder().add_scope_calendar()``).
+
+        Parameters
+        ----------
+        cred : credentials.Credentials
+            Credentials with the calendar scope.
+        calendar_id : str, optional
+            Calendar to sync to, by default 'primary'.
+
+        Returns
+        -------
+        GoogleCalendarSync
+            Created sync.
+        """
+        service = build('calendar', 'v3', credentials=cred, cache_discovery=False)
+        return cls(service, calendar_id=calendar_id, **kwargs)
+
+    def __format_time(self, date: datetime.date, minute: int) -> str:
+        # minute can be 24 * 60 (classes that end at 24:00)
+        return (datetime.datetime.combine(date, datetime.time()) + datetime.timedelta(minutes=minute)).isoformat()
+
+    def build_events(self,
+                     datas: Iterable[dict],
+                     semester_start: datetime.date,
+                     holiday_dates: Optional[Iterable[datetime.date]] = None,
+                     week_count: int = 16,
+                     language: str = 'kr') -> OrderedDict[str, dict]:
+        """
+        Convert class datas to recurring event bodies.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        semester_start : datetime.date
+            Any day of the first week of the semester.
+        holiday_dates : Iterable[datetime.date], optional
+            Dates of the holidays, by default None (no meeting is excluded). ``weekly_course``
+            only tells the week of a holiday, not its day, so only the meetings of a holiday
+            week on one of these dates are excluded.
+        week_count : int, optional
+            Number of weeks when a class data has no ``weekly_course``, by default 16.
+        language : str, optional
+            'kr' or 'en' class name, by default 'kr'.
+
+        Returns
+        -------
+        OrderedDict[str, dict]
+            Event bodies by event id.
+        """
+        first_monday = semester_start - datetime.timedelta(days=semester_start.weekday())
+        holiday_dates = set(holiday_dates or ())
+        events = OrderedDict()
+        for data in datas:
+            key = get_record_key(data)
+            if key is None:
+                continue
+            course_info = data['course_info']
+            name = course_info.get(f'name_{language}') or course_info.get('name_kr') or course_info.get('name_en')
+            instructor = (data.get('instructor') or {}).get('name')
+            weeks = len(data['weekly_course']) if data.get('weekly_course') else week_count
+            holiday_weeks = get_holiday_weeks(data.get('weekly_course'))
+
+            for day, start, end, building, room in merge_meetings(parse_schedule(course_info)):
+                first_date = first_monday + datetime.timedelta(days=day)
+                excluded = []
+                for week in sorted(holiday_weeks):
+                    if not 1 <= week <= weeks:
+                        continue
+                    date = first_date + datetime.timedelta(weeks=week - 1)
+                    if date in holiday_dates:
+                        excluded.append(date)
+
+                event_id = get_event_id(key, day, start)
+                recurrence = [f"RRULE:FREQ=WEEKLY;COUNT={weeks}"]
+                if excluded:
+                    recurrence.append(f"EXDATE;TZID={self.time_zone}:" + ','.join(
+                        self.__format_time(date, start).replace('-', '').replace(':', '') for date in excluded))
+                event = OrderedDict()
+                event['id'] = event_id
+                # an update also restores an event that was deleted (cancelled) from the calendar
+                event['status'] = 'confirmed'
+                event['summary'] = name
+                event['location'] = ' '.join(text for text in (building, room) if text)
+                event['description'] = ' '.join(text for text in (course_info.get('number'), instructor) if text)
+                event['start'] = {'dateTime': self.__format_time(first_date, start), 'timeZone': self.time_zone}
+                event['end'] = {'dateTime': self.__format_time(first_date, end), 'timeZone': self.time_zone}
+                event['recurrence'] = recurrence
+                event['extendedProperties'] = {'private': {'hak_key': '|'.join(map(str, key))}}
+                events[event_id] = event
+        return events
+
+    @staticmethod
+    def plan(events: dict[str, dict], previous: Optional[dict[str, str]] = None) -> SyncPlan:
+        """
+        Diff events against the last pushed state.
+
+        Parameters
+        ----------
+        events : dict[str, dict]
+            Event bodies by event id (from ``build_events``).
+        previous : dict[str, str], optional
+            Fingerprints by event id of the last sync (``SyncResult.state``), by default empty.
+
+        Returns
+        -------
+        SyncPlan
+            Event ids to insert, update and delete, and the ones that did not change.
+        """
+        previous = previous or {}
+        inserts, updates, unchanged = [], [], []
+        for event_id, event in events.items():
+            if event_id not in previous:
+                inserts.append(event_id)
+            elif previous[event_id] != get_fingerprint(event):
+                updates.append(event_id)
+            else:
+                unchanged.append(event_id)
+        deletes = [event_id for event_id in previous if event_id not in events]
+        return SyncPlan(inserts, updates, deletes, unchanged)
+
+    def __create_request(self, action: str, event_id: str, event: Optional[dict]):
+        events = self.service.events()
+        if action == 'insert':
+            return events.insert(calendarId=self.calendar_id, body=event)
+        if action == 'update':
+            return events.update(calendarId=self.calendar_id, eventId=event_id, body=event)
+        return events.delete(calendarId=self.calendar_id, eventId=event_id)
+
+    def __execute(self, calls: list[tuple[str, str]], events: dict[str, dict]) -> tuple[dict, int]:
+        """
+        Run (action, event id) calls in batches.
+
+        Returns the error of every failed call (None if it succeeded) and the number of batch requests.
+        If a batch request itself fails, its calls without a response get that error, and the
+        batches that already ran keep their results.
+        """
+        errors: dict[tuple[str, str], Optional[Exception]] = {}
+
+        def callback(request_id, response, exception):
+            action, event_id = request_id.split(':', 1)
+            errors[(action, event_id)] = exception
+
+        request_count = 0
+        for start in range(0, len(calls), self.batch_size):
+            batch_calls = calls[start:start + self.batch_size]
+            batch = self.service.new_batch_http_request(callback=callback)
+            for action, event_id in batch_calls:
+                batch.add(self.__create_request(action, event_id, events.get(event_id)),
+                          request_id=f"{action}:{event_id}")
+            request_count += 1
+            try:
+                batch.execute()
+            except Exception as error:
+                for call in batch_calls:
+                    errors.setdefault(call, error)
+        return errors, request_count
+
+    def sync(self, events: dict[str, dict], previous: Optional[dict[str, str]] = None) -> SyncResult:
+        """
+        Push the changes between events and the last pushed state.
+
+        An insert of an id that already exists (ex) the state was lost, or the event was deleted
+        before) is retried as an update, an update of a missing event as an insert (once each),
+        and a delete of a missing event counts as deleted. Calls that fail with a rate limit or
+        server error (also when the whole batch request failed) are retried with backoff. Failed
+        calls, including the calls of a batch request that raised (ex) connection error), keep
+        their previous state, so the next sync tries them again.
+
+        Parameters
+        ----------
+        events : dict[str, dict]
+            Event bodies by event id (from ``build_events``).
+        previous : dict[str, str], optional
+            ``SyncResult.state`` of the last sync, by default empty.
+
+        Returns
+        -------
+        SyncResult
+            Changed event ids, errors of failed event ids, the new state and the number of
+            batch requests sent.
+        """
+        previous = dict(previous or {})
+        plan = self.plan(events, previous)
+        calls = ([('insert', event_id) for event_id in plan.inserts]
+                 + [('update', event_id) for event_id in plan.updates]
+                 + [('delete', event_id) for event_id in plan.deletes])
+
+        state = previous
+        done = {'insert': [], 'update': [], 'delete': []}
+        failed: dict[str, Exception] = {}
+        switched: set[str] = set()
+        request_count = 0
+        retry = 0
+        while calls:
+            errors, count = self.__execute(calls, events)
+            request_count += count
+            calls = []
+            retry_calls = []
+            for (action, event_id), error in errors.items():
+                status = error.status_code if isinstance(error, HttpError) else None
+                if error is None or (action == 'delete' and status in (404, 410)):
+                    failed.pop(event_id, None)
+                    done[action].append(event_id)
+                    if action == 'delete':
+                        state.pop(event_id, None)
+                    else:
+                        state[event_id] = get_fingerprint(events[event_id])
+                elif event_id not in switched and (action, status) in (('insert', 409), ('update', 404),
+                                                                        ('update', 410)):
+                    switched.add(event_id)
+                    calls.append(('update' if action == 'insert' else 'insert', event_id))
+                elif is_retryable(error) and retry < self.max_retries:
+                    failed[event_id] = error
+                    retry_calls.append((action, event_id))
+                else:
+                    failed[event_id] = error
+            if retry_calls:
+                time.sleep(self.retry_delay * 2 ** retry)
+                retry += 1
+                calls.extend(retry_calls)
+        return SyncResult(done['insert'], done['update'], done['delete'], failed, state, request_count)
+
+
+def load_sync_state(path: str) -> dict[str, str]:
+    """
+    Load the sync state saved by ``save_sync_state`` (empty if the file does not exist).
+    """
+    try:
+        with open(path, "r", encoding='UTF-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_sync_state(path: str, state: dict[str, str]):
+    """
+    Save the sync state of a user.
+    """
+    with open(path, "w", encoding='UTF-8') as file:
+        json.dump(state, file)
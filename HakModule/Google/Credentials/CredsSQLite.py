@@ -0,0 +1,297 @@
+from google.oauth2 import credentials
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from collections import OrderedDict
+from typing import Iterable, Optional, Sequence, Union
+from HakModule.Google.Credentials import ABCcreds
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class GoogleCredentialsStore:
+    """
+    Encrypted credentials of many users in one SQLite database, with an in-process LRU cache.
+
+    Every worker process opens the same database file. SQLite (WAL mode) serializes the writes,
+    and every thread uses its own connection. Cached credentials are trusted for cache_ttl seconds,
+    after which they are read again so changes saved by other workers are seen.
+
+    Attributes
+    ----------
+    path : str
+        Path of the SQLite database file.
+    cache_size : int
+        Maximum number of users kept in memory.
+    cache_ttl : float
+        Seconds a cached credential is used without reading the database.
+
+    Methods
+    -------
+    generate_key()
+        Create a new encryption key.
+    get(user_id)
+        Get the credentials of a user.
+    put(user_id, cred)
+        Save the credentials of a user.
+    delete(user_id)
+        Delete the credentials of a user.
+    load_many(user_ids)
+        Get the credentials of many users with one query.
+    save_many(creds)
+        Save the credentials of many users in one transaction.
+    close()
+        Close the connection of the current thread.
+    """
+    def __init__(self,
+                 path: str,
+                 keys: Union[bytes, str, Sequence[Union[bytes, str]]],
+                 cache_size: int = 1024,
+                 cache_ttl: float = 60,
+                 timeout: float = 30):
+        """
+        Initialize the GoogleCredentialsStore.
+
+        Parameters
+        ----------
+        path : str
+            Path of the SQLite database file. It is created if it does not exist.
+        keys : bytes, str or Sequence of them
+            Fernet key, or keys newest first (old keys can still decrypt, for key rotation).
+        cache_size : int, optional
+            Maximum number of users kept in memory, by default 1024.
+        cache_ttl : float, optional
+            Seconds a cached credential is used without reading the database, by default 60.
+        timeout : float, optional
+            Seconds to wait for a database lock held by another worker, by default 30.
+        """
+        self.path: str = path
+        self.cache_size: int = cache_size
+        self.cache_ttl: float = cache_ttl
+        self.timeout: float = timeout
+
+        if isinstance(keys, (bytes, str)):
+            keys = [keys]
+        self.__fernet = MultiFernet([Fernet(key) for key in keys])
+        self.__local = threading.local()
+        self.__cache: OrderedDict[str, tuple[float, credentials.Credentials]] = OrderedDict()
+        self.__cache_lock = threading.Lock()
+
+        connection = self.__get_connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS credentials ("
+                "user_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def generate_key() -> bytes:
+        """
+        Create a new encryption key. Keep it outside of the database (ex) environment variable).
+
+        Returns
+        -------
+        bytes
+            URL-safe base64 Fernet key.
+        """
+        return Fernet.generate_key()
+
+    def __get_connection(self) -> sqlite3.Connection:
+        """
+        Get the connection of the current thread.
+        """
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.__local.connection = connection
+        return connection
+
+    def __encrypt(self, cred: credentials.Credentials) -> bytes:
+        return self.__fernet.encrypt(cred.to_json().encode('UTF-8'))
+
+    def __decrypt(self, data: bytes) -> Optional[credentials.Credentials]:
+        try:
+            info = json.loads(self.__fernet.decrypt(data).decode('UTF-8'))
+            return credentials.Credentials.from_authorized_user_info(info)
+        except (InvalidToken, ValueError):
+            return None
+
+    def __cache_get(self, user_id: str) -> Optional[credentials.Credentials]:
+        with self.__cache_lock:
+            entry = self.__cache.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.__cache[user_id]
+                return None
+            self.__cache.move_to_end(user_id)
+            return entry[1]
+
+    def __cache_put(self, user_id: str, cred: credentials.Credentials) -> None:
+        with self.__cache_lock:
+            self.__cache[user_id] = (time.monotonic() + self.cache_ttl, cred)
+            self.__cache.move_to_end(user_id)
+            while len(self.__cache) > self.cache_size:
+                self.__cache.popitem(last=False)
+
+    def get(self, user_id: str) -> Optional[credentials.Credentials]:
+        """
+        Get the credentials of a user.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+
+        Returns
+        -------
+        credentials.Credentials or None
+            Credentials, or None if the user has none (or they can not be decrypted with the keys
+            or read back as authorized user credentials).
+        """
+        return self.load_many([user_id]).get(user_id)
+
+    def put(self, user_id: str, cred: credentials.Credentials) -> None:
+        """
+        Save the credentials of a user.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+        cred : credentials.Credentials
+            Credentials to save.
+        """
+        self.save_many({user_id: cred})
+
+    def delete(self, user_id: str) -> None:
+        """
+        Delete the credentials of a user.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+        """
+        connection = self.__get_connection()
+        with connection:
+            connection.execute("DELETE FROM credentials WHERE user_id = ?", (user_id,))
+        with self.__cache_lock:
+            self.__cache.pop(user_id, None)
+
+    def load_many(self, user_ids: Iterable[str]) -> dict[str, credentials.Credentials]:
+        """
+        Get the credentials of many users. Users that are not cached are read with one query.
+
+        Parameters
+        ----------
+        user_ids : Iterable[str]
+            User keys.
+
+        Returns
+        -------
+        dict[str, credentials.Credentials]
+            Credentials of the users that have them.
+        """
+        result = {}
+        missing = []
+        for user_id in user_ids:
+            cred = self.__cache_get(user_id)
+            if cred is None:
+                missing.append(user_id)
+            else:
+                result[user_id] = cred
+
+        connection = self.__get_connection()
+        # stay under the SQLite host parameter limit
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = connection.execute(
+                f"SELECT user_id, data FROM credentials WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for user_id, data in rows:
+                cred = self.__decrypt(data)
+                if cred is not None:
+                    result[user_id] = cred
+                    self.__cache_put(user_id, cred)
+        return result
+
+    def save_many(self, creds: dict[str, credentials.Credentials]) -> None:
+        """
+        Save the credentials of many users in one transaction.
+
+        Parameters
+        ----------
+        creds : dict[str, credentials.Credentials]
+            Credentials by user key.
+
+        Raises
+        ------
+        ValueError
+            If any credentials are None, or have no refresh_token, client_id or client_secret (they
+            could not be loaded back). Nothing is saved then.
+        """
+        for user_id, cred in creds.items():
+            if cred is None:
+                raise ValueError(f"no credentials to save for {user_id} (use delete to remove them)")
+            missing = [name for name in ('refresh_token', 'client_id', 'client_secret') if not getattr(cred, name)]
+            if missing:
+                raise ValueError(f"credentials of {user_id} have no {', '.join(missing)}")
+        now = time.time()
+        rows = [(user_id, self.__encrypt(cred), now) for user_id, cred in creds.items()]
+        connection = self.__get_connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO credentials (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                rows
+            )
+        for user_id, cred in creds.items():
+            self.__cache_put(user_id, cred)
+
+    def close(self) -> None:
+        """
+        Close the connection of the current thread.
+        """
+        connection = getattr(self.__local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.__local.connection = None
+
+
+class GoogleCredentialsSQLite(ABCcreds.ABCGoogleCredentials):
+    """
+    Credentials of one user in a shared GoogleCredentialsStore.
+    """
+    def __init__(self, store: GoogleCredentialsStore, user_id: str = ""):
+        self.__creds: Optional[credentials.Credentials] = None
+        self.store: GoogleCredentialsStore = store
+        self.user_id: str = user_id
+
+    def set_user_id(self, user_id: str):
+        self.user_id = user_id
+
+    def load(self):
+        self.__creds = self.store.get(self.user_id)
+
+    def save(self):
+        self.store.put(self.user_id, self.__creds)
+
+    def get_creds(self) -> credentials.Credentials:
+        return self.__creds
+
+    def set_creds(self, cred: credentials.Credentials):
+        self.__creds = cred
+
+    def destroy(self):
+        self.store.delete(self.user_id)
+
+    def valid_cred(self) -> bool:
+        return self.__creds is not None and self.__creds.valid
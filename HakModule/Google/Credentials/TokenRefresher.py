@@ -0,0 +1,315 @@
+from google.oauth2 import credentials
+from google.auth.transport.requests import Request
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from HakModule.Google.Credentials.CredsSQLite import GoogleCredentialsStore
+import datetime
+import heapq
+import itertools
+import threading
+import time
+
+
+class TokenRefreshScheduler:
+    """
+    Background refresher that renews access tokens shortly before they expire.
+
+    Every tracked user has one scheduled refresh at (expiry - refresh_margin). A scheduler thread
+    hands due refreshes to a bounded worker pool, and a user never has more than one refresh
+    in flight (later requests share the running one). Request handlers read the current
+    credentials with ``get_creds`` and never wait on the token endpoint.
+
+    Attributes
+    ----------
+    store : GoogleCredentialsStore, optional
+        Store that refreshed credentials are saved to.
+    refresh_margin : float
+        Seconds before expiry that a token is refreshed.
+    worker_count : int
+        Maximum number of refreshes at the same time.
+    retry_delay : float
+        First delay before retrying a failed refresh (doubled after every failure).
+    max_retry_delay : float
+        Longest delay between retries.
+
+    Methods
+    -------
+    start()
+        Start the scheduler thread and the worker pool.
+    close()
+        Stop the scheduler and wait for running refreshes.
+    track(user_id, cred)
+        Start keeping the credentials of a user fresh.
+    untrack(user_id)
+        Stop refreshing a user.
+    get_creds(user_id)
+        Get the current credentials of a user without waiting.
+    refresh_now(user_id)
+        Refresh a user now (coalesced with a running refresh).
+    get_errors()
+        Get the last refresh error of every failing user.
+    """
+    def __init__(self,
+                 store: Optional[GoogleCredentialsStore] = None,
+                 refresh_margin: float = 300,
+                 worker_count: int = 4,
+                 retry_delay: float = 30,
+                 max_retry_delay: float = 3600,
+                 request_factory: Callable[[], Request] = Request):
+        """
+        Initialize the TokenRefreshScheduler.
+
+        Parameters
+        ----------
+        store : GoogleCredentialsStore, optional
+            Store that refreshed credentials are saved to, by default None (memory only).
+        refresh_margin : float, optional
+            Seconds before expiry that a token is refreshed, by default 300.
+        worker_count : int, optional
+            Maximum number of refreshes at the same time, by default 4.
+        retry_delay : float, optional
+            First delay before retrying a failed refresh, by default 30.
+        max_retry_delay : float, optional
+            Longest delay between retries, by default 3600.
+        request_factory : Callable[[], Request], optional
+            Creates the HTTP transport of a refresh, by default google.auth.transport.requests.Request.
+        """
+        self.store: Optional[GoogleCredentialsStore] = store
+        self.refresh_margin: float = refresh_margin
+        self.worker_count: int = worker_count
+        self.retry_delay: float = retry_delay
+        self.max_retry_delay: float = max_retry_delay
+        self.request_factory: Callable[[], Request] = request_factory
+
+        self.__creds: dict[str, credentials.Credentials] = {}
+        self.__generations: dict[str, int] = {}
+        self.__failures: dict[str, int] = {}
+        self.__retry_at: dict[str, float] = {}
+        self.__errors: dict[str, Exception] = {}
+        self.__in_flight: dict[str, Future] = {}
+        self.__queue: list[tuple[float, int, str, int]] = []
+        self.__order = itertools.count()
+        self.__condition = threading.Condition()
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__closed: bool = False
+
+    def __enter__(self) -> 'TokenRefreshScheduler':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Start the scheduler thread and the worker pool.
+        """
+        with self.__condition:
+            if self.__thread is not None:
+                return
+            self.__closed = False
+            self.__executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix='token_refresh')
+            self.__thread = threading.Thread(target=self.__run, name='token_refresh_scheduler', daemon=True)
+            self.__thread.start()
+
+    def close(self) -> None:
+        """
+        Stop the scheduler and wait for running refreshes.
+        """
+        with self.__condition:
+            if self.__thread is None:
+                return
+            self.__closed = True
+            self.__condition.notify_all()
+            thread, executor = self.__thread, self.__executor
+            self.__thread = self.__executor = None
+        thread.join()
+        executor.shutdown(wait=True)
+
+    def __get_due_time(self, cred: credentials.Credentials) -> float:
+        """
+        Get the monotonic time that the token of a credential should be refreshed at.
+        """
+        if cred.expiry is None:
+            return float('inf')
+        # google-auth keeps expiry as a naive UTC datetime
+        expiry = cred.expiry.replace(tzinfo=datetime.timezone.utc)
+        remaining = (expiry - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        return time.monotonic() + remaining - self.refresh_margin
+
+    def __schedule(self, user_id: str, due_time: float) -> None:
+        """
+        Replace the scheduled refresh of a user. Must hold the condition.
+        """
+        generation = self.__generations.get(user_id, 0) + 1
+        self.__generations[user_id] = generation
+        if due_time != float('inf'):
+            heapq.heappush(self.__queue, (due_time, next(self.__order), user_id, generation))
+            self.__condition.notify_all()
+
+    def track(self, user_id: str, cred: credentials.Credentials) -> None:
+        """
+        Start keeping the credentials of a user fresh.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+        cred : credentials.Credentials
+            Credentials with a refresh token.
+        """
+        with self.__condition:
+            self.__creds[user_id] = cred
+            self.__failures.pop(user_id, None)
+            self.__retry_at.pop(user_id, None)
+            # a running refresh of the old credentials is dropped, not shared
+            self.__in_flight.pop(user_id, None)
+            self.__schedule(user_id, self.__get_due_time(cred))
+
+    def untrack(self, user_id: str) -> None:
+        """
+        Stop refreshing a user.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+        """
+        with self.__condition:
+            self.__creds.pop(user_id, None)
+            self.__failures.pop(user_id, None)
+            self.__retry_at.pop(user_id, None)
+            self.__errors.pop(user_id, None)
+            self.__in_flight.pop(user_id, None)
+            # a newer generation makes the queued refresh stale
+            self.__generations[user_id] = self.__generations.get(user_id, 0) + 1
+
+    def get_creds(self, user_id: str) -> Optional[credentials.Credentials]:
+        """
+        Get the current credentials of a user without waiting.
+
+        If the token is already expired, a refresh is started in the background and the expired
+        credentials are returned. While a failed refresh waits for its retry (backoff), no new
+        refresh is started.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+
+        Returns
+        -------
+        credentials.Credentials or None
+            Credentials, or None if the user is not tracked.
+        """
+        with self.__condition:
+            cred = self.__creds.get(user_id)
+            retry_at = self.__retry_at.get(user_id)
+        if cred is not None and not cred.valid and (retry_at is None or retry_at <= time.monotonic()):
+            self.refresh_now(user_id)
+        return cred
+
+    def refresh_now(self, user_id: str) -> Future:
+        """
+        Refresh a user now. If a refresh of the user is running, its future is returned instead.
+
+        Parameters
+        ----------
+        user_id : str
+            User key.
+
+        Returns
+        -------
+        Future
+            Resolves to the refreshed credentials (or raises the refresh error).
+        """
+        self.start()
+        with self.__condition:
+            return self.__submit(user_id)
+
+    def __submit(self, user_id: str) -> Future:
+        """
+        Start a refresh of a user unless one is running. Must hold the condition.
+        """
+        future = self.__in_flight.get(user_id)
+        if future is not None:
+            return future
+        future = self.__executor.submit(self.__refresh, user_id)
+        self.__in_flight[user_id] = future
+        return future
+
+    def __run(self) -> None:
+        """
+        Hand due refreshes to the worker pool until the scheduler is closed.
+        """
+        with self.__condition:
+            while not self.__closed:
+                if not self.__queue:
+                    self.__condition.wait()
+                    continue
+                due_time, _, user_id, generation = self.__queue[0]
+                delay = due_time - time.monotonic()
+                if delay > 0:
+                    self.__condition.wait(timeout=delay)
+                    continue
+                heapq.heappop(self.__queue)
+                if self.__generations.get(user_id) == generation and user_id in self.__creds:
+                    self.__submit(user_id)
+
+    def __refresh(self, user_id: str) -> credentials.Credentials:
+        """
+        Refresh the token of a user, save it and schedule the next refresh.
+
+        The result is dropped (not saved nor rescheduled) when the user was untracked or tracked
+        with other credentials while the token endpoint was answering.
+        """
+        with self.__condition:
+            cred = self.__creds.get(user_id)
+            # __submit holds the condition until the future is registered
+            future = self.__in_flight.get(user_id)
+        try:
+            if cred is None:
+                raise KeyError(f"user is not tracked : {user_id}")
+            cred.refresh(self.request_factory())
+            with self.__condition:
+                # saved under the condition so that untrack() cannot slip in between the check and the put
+                if self.__creds.get(user_id) is not cred:
+                    return cred
+                if self.store is not None:
+                    self.store.put(user_id, cred)
+        except Exception as error:
+            # any error (ex) sqlite3.OperationalError from the store) is recorded and backed off
+            with self.__condition:
+                if cred is not None and self.__creds.get(user_id) is cred:
+                    failures = self.__failures.get(user_id, 0) + 1
+                    self.__failures[user_id] = failures
+                    self.__errors[user_id] = error
+                    delay = min(self.max_retry_delay, self.retry_delay * 2 ** (failures - 1))
+                    self.__retry_at[user_id] = time.monotonic() + delay
+                    self.__schedule(user_id, self.__retry_at[user_id])
+            raise
+        else:
+            with self.__condition:
+                if self.__creds.get(user_id) is cred:
+                    self.__failures.pop(user_id, None)
+                    self.__retry_at.pop(user_id, None)
+                    self.__errors.pop(user_id, None)
+                    self.__schedule(user_id, self.__get_due_time(cred))
+            return cred
+        finally:
+            with self.__condition:
+                if self.__in_flight.get(user_id) is future:
+                    del self.__in_flight[user_id]
+
+    def get_errors(self) -> dict[str, Exception]:
+        """
+        Get the last refresh error of every user whose refresh is failing.
+
+        Returns
+        -------
+        dict[str, Exception]
+            Error by user key.
+        """
+        with self.__condition:
+            return dict(self.__errors)
@@ -1,6 +1,15 @@
 from google.oauth2 import credentials
 from google_auth_oauthlib.flow import Flow
-from typing import Optional
+from collections import OrderedDict, namedtuple
+from typing import Hashable, Optional
+from urllib.parse import parse_qs, urlparse
+import copy
+import json
+import threading
+import time
+
+# one sign-in that was started and not finished yet
+PendingAuthorization = namedtuple('PendingAuthorization', ['user_id', 'code_verifier', 'expires_at'])
 
 
 class GoogleOAuthGenerator:
@@ -223,3 +232,262 @@ class GoogleOAuthBuilder:
 
         """
         return self.manager
+
+
+class OAuthStateStore:
+    """
+    Bounded, expiring store of pending sign-ins keyed by OAuth state.
+
+    Attributes
+    ----------
+    ttl : float
+        Seconds a sign-in can take.
+    max_size : int
+        Maximum number of pending sign-ins. The oldest one is dropped when it is full.
+
+    Methods
+    -------
+    put(state, user_id, code_verifier)
+        Keep a pending sign-in.
+    pop(state)
+        Take a pending sign-in out (a state can only be used once).
+    """
+    def __init__(self, ttl: float = 600, max_size: int = 10000):
+        """
+        Initialize the OAuthStateStore.
+
+        Parameters
+        ----------
+        ttl : float, optional
+            Seconds a sign-in can take, by default 600.
+        max_size : int, optional
+            Maximum number of pending sign-ins, by default 10000.
+        """
+        self.ttl: float = ttl
+        self.max_size: int = max_size
+
+        self.__pending: OrderedDict[str, PendingAuthorization] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            self.__purge()
+            return len(self.__pending)
+
+    def __purge(self):
+        """
+        Drop expired sign-ins. Entries are in insertion order, so they expire from the front.
+        """
+        now = time.monotonic()
+        while self.__pending:
+            state, pending = next(iter(self.__pending.items()))
+            if pending.expires_at > now:
+                break
+            del self.__pending[state]
+
+    def put(self, state: str, user_id: Optional[Hashable], code_verifier: Optional[str]):
+        """
+        Keep a pending sign-in.
+
+        Parameters
+        ----------
+        state : str
+            OAuth state of the authorization URL.
+        user_id : Hashable, optional
+            User that started the sign-in.
+        code_verifier : str, optional
+            PKCE code verifier of the authorization URL.
+        """
+        with self.__lock:
+            self.__purge()
+            self.__pending[state] = PendingAuthorization(user_id, code_verifier, time.monotonic() + self.ttl)
+            while len(self.__pending) > self.max_size:
+                self.__pending.popitem(last=False)
+
+    def pop(self, state: str) -> Optional[PendingAuthorization]:
+        """
+        Take a pending sign-in out.
+
+        Parameters
+        ----------
+        state : str
+            OAuth state returned to the redirect URI.
+
+        Returns
+        -------
+        PendingAuthorization or None
+            Pending sign-in, or None if the state is unknown, used or expired.
+        """
+        with self.__lock:
+            self.__purge()
+            return self.__pending.pop(state, None)
+
+
+class GoogleOAuthService:
+    """
+    Multi-user OAuth2 sign-in that parses the client secret once.
+
+    Every sign-in builds a lightweight Flow from the parsed client config, and the state and
+    PKCE code verifier are kept in an OAuthStateStore until the redirect comes back, so one
+    service object serves every concurrent sign-in without file I/O.
+
+    Attributes
+    ----------
+    scopes : list
+        List of OAuth2 scopes.
+    redirect_uri : str
+        Redirect URI for OAuth2 flow.
+    state_store : OAuthStateStore
+        Pending sign-ins.
+
+    Methods
+    -------
+    from_client_secrets_file(path, scopes, redirect_uri, state_store=None)
+        Create a service from a client secret JSON file.
+    from_generator(generator, state_store=None)
+        Create a service with the settings of a GoogleOAuthGenerator.
+    create_authorization_url(user_id=None) -> tuple[str, str]
+        Start a sign-in and get the authorization URL and its state.
+    fetch_credentials(url, state=None) -> tuple[Hashable, credentials.Credentials]
+        Finish a sign-in from the authorization response URL.
+
+    """
+    def __init__(self, client_config: dict, scopes: list, redirect_uri: str = r"https://www.google.com/",
+                 state_store: Optional[OAuthStateStore] = None):
+        """
+        Initialize the GoogleOAuthService.
+
+        Parameters
+        ----------
+        client_config : dict
+            Parsed client secret (with a 'web' or 'installed' section).
+        scopes : list
+            List of OAuth2 scopes.
+        redirect_uri : str, optional
+            Redirect URI for OAuth2 flow.
+        state_store : OAuthStateStore, optional
+            Store of pending sign-ins, by default a new OAuthStateStore.
+
+        """
+        if 'web' not in client_config and 'installed' not in client_config:
+            raise ValueError("Client secrets must be for a web or installed app.")
+        self.scopes: list = list(scopes)
+        self.redirect_uri: str = redirect_uri
+        self.state_store: OAuthStateStore = state_store if state_store is not None else OAuthStateStore()
+
+        self.__client_config: dict = copy.deepcopy(client_config)
+
+    @classmethod
+    def from_client_secrets_file(cls, path: str, scopes: list, redirect_uri: str = r"https://www.google.com/",
+                                 state_store: Optional[OAuthStateStore] = None):
+        """
+        Create a service from a client secret JSON file.
+
+        Parameters
+        ----------
+        path : str
+            Path to the client secret JSON file.
+        scopes : list
+            List of OAuth2 scopes.
+        redirect_uri : str, optional
+            Redirect URI for OAuth2 flow.
+        state_store : OAuthStateStore, optional
+            Store of pending sign-ins.
+
+        Returns
+        -------
+        GoogleOAuthService
+            Created service.
+
+        """
+        with open(path, "r", encoding='UTF-8') as file:
+            client_config = json.load(file)
+        return cls(client_config, scopes, redirect_uri=redirect_uri, state_store=state_store)
+
+    @classmethod
+    def from_generator(cls, generator: GoogleOAuthGenerator, state_store: Optional[OAuthStateStore] = None):
+        """
+        Create a service with the settings of a GoogleOAuthGenerator (ex) from GoogleOAuthBuilder).
+
+        Parameters
+        ----------
+        generator : GoogleOAuthGenerator
+            Generator with the client secret path, redirect URI and scopes set.
+        state_store : OAuthStateStore, optional
+            Store of pending sign-ins.
+
+        Returns
+        -------
+        GoogleOAuthService
+            Created service.
+
+        """
+        return cls.from_client_secrets_file(generator.client_secret_path, generator.scopes,
+                                            redirect_uri=generator.redirect_uri, state_store=state_store)
+
+    def __create_flow(self, state: Optional[str] = None, code_verifier: Optional[str] = None) -> Flow:
+        """
+        Build a Flow from the parsed client config.
+        """
+        return Flow.from_client_config(
+            self.__client_config,
+            scopes=self.scopes,
+            redirect_uri=self.redirect_uri,
+            state=state,
+            code_verifier=code_verifier
+        )
+
+    def create_authorization_url(self, user_id: Optional[Hashable] = None) -> tuple[str, str]:
+        """
+        Start a sign-in and get the authorization URL for user consent.
+
+        Parameters
+        ----------
+        user_id : Hashable, optional
+            User that starts the sign-in. It is returned by ``fetch_credentials``.
+
+        Returns
+        -------
+        tuple[str, str]
+            Authorization URL and its state.
+
+        """
+        flow = self.__create_flow()
+        authorization_url, state = flow.authorization_url(
+            access_type='offline',
+            prompt='consent',
+            include_granted_scopes='true'
+        )
+        self.state_store.put(state, user_id, flow.code_verifier)
+        return authorization_url, state
+
+    def fetch_credentials(self, url: str, state: Optional[str] = None) -> tuple[Hashable, credentials.Credentials]:
+        """
+        Finish a sign-in from the authorization response URL.
+
+        Parameters
+        ----------
+        url : str
+            Authorization response URL (redirect URI with code and state).
+        state : str, optional
+            State of the sign-in, by default read from the URL.
+
+        Returns
+        -------
+        tuple[Hashable, credentials.Credentials]
+            User that started the sign-in and the generated credentials.
+
+        Raises
+        ------
+        ValueError
+            If the state is unknown, already used or expired.
+
+        """
+        if state is None:
+            state = parse_qs(urlparse(url).query).get('state', [None])[0]
+        pending = self.state_store.pop(state) if state is not None else None
+        if pending is None:
+            raise ValueError("unknown or expired OAuth state")
+        flow = self.__create_flow(state=state, code_verifier=pending.code_verifier)
+        flow.fetch_token(authorization_response=url)
+        return pending.user_id, flow.credentials
@@ -0,0 +1,110 @@
+import os
+import re
+import json
+from collections import namedtuple
+from typing import Iterator, Optional
+
+CatalogFileInfo = namedtuple('CatalogFileInfo', ['name', 'year', 'term', 'language', 'start', 'end'])
+RecordKey = namedtuple('RecordKey', ['year', 'term', 'code'])
+
+CATALOG_FILE_PATTERN = re.compile(
+    r"^(?P<name>.*?)_?hyu_class_(?P<year>\d{4})_(?P<term>[a-z]+)_(?P<language>[a-z]+)"
+    r"_(?P<start>\d+)_(?P<end>\d+)\.json$"
+)
+
+
+def parse_catalog_file_name(path: str) -> Optional[CatalogFileInfo]:
+    """
+    Parse a scraper output file name.
+
+    The scraper sample saves files as ``{name}_{year}_{term}_{lang}_{start}_{end}.json``
+    where the middle part comes from ``HYUSeoulClassUrl.get_file_name``.
+
+    Parameters
+    ----------
+    path : str
+        Path or file name of the scraped json file.
+
+    Returns
+    -------
+    CatalogFileInfo or None
+        Parsed file information, or None if the name does not match.
+    """
+    match = CATALOG_FILE_PATTERN.match(os.path.basename(path))
+    if match is None:
+        return None
+    return CatalogFileInfo(
+        name=match.group('name'),
+        year=int(match.group('year')),
+        term=match.group('term'),
+        language=match.group('language'),
+        start=int(match.group('start')),
+        end=int(match.group('end')),
+    )
+
+
+def load_catalog_file(path: str, only_course: bool = True) -> list[dict]:
+    """
+    Load class datas from a scraped json file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the scraped json file (``{'data': [...]}``).
+    only_course : bool, optional
+        Skip datas that have no ``course_info`` (default is True).
+
+    Returns
+    -------
+    list[dict]
+        List of class datas in the ``HYUSeoulClassData.datas`` shape.
+    """
+    with open(path, "r", encoding='UTF-8') as file:
+        datas = json.load(file)['data']
+    if not only_course:
+        return datas
+    return [data
+            for data in datas
+            if data.get('course_info') is not None]
+
+
+def iter_catalog_dir(dir_path: str, only_course: bool = True) -> Iterator[dict]:
+    """
+    Iterate over class datas of every scraped json file in a directory.
+
+    Parameters
+    ----------
+    dir_path : str
+        Directory containing scraped json files (ex) ./HakFile/UnivData/HYU_S).
+    only_course : bool, optional
+        Skip datas that have no ``course_info`` (default is True).
+
+    Yields
+    ------
+    dict
+        Class data in the ``HYUSeoulClassData.datas`` shape.
+    """
+    for file_name in sorted(os.listdir(dir_path)):
+        if not file_name.endswith('.json'):
+            continue
+        yield from load_catalog_file(os.path.join(dir_path, file_name), only_course=only_course)
+
+
+def get_record_key(data: dict) -> Optional[RecordKey]:
+    """
+    Get the (year, term, code) key of a class data.
+
+    Parameters
+    ----------
+    data : dict
+        Class data in the ``HYUSeoulClassData.datas`` shape.
+
+    Returns
+    -------
+    RecordKey or None
+        Key of the class data, or None if it has no course information.
+    """
+    course_info = data.get('course_info')
+    if course_info is None or course_info.get('code') is None:
+        return None
+    return RecordKey(course_info.get('year'), course_info.get('semester'), course_info['code'])
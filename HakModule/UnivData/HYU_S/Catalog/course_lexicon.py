@@ -0,0 +1,267 @@
+import heapq
+from collections import namedtuple
+from typing import Iterable, Optional
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import RecordKey, get_record_key, iter_catalog_dir
+
+# name is None when nothing is close enough. keys are the classes that use the name
+LexiconMatch = namedtuple('LexiconMatch', ['text', 'name', 'confidence', 'keys'])
+
+
+def normalize_name(text: Optional[str]) -> str:
+    """
+    Normalize a course name the way OCR texts are normalized (no whitespace, lower case).
+
+    Parameters
+    ----------
+    text : str or None
+        Course name or OCR text.
+
+    Returns
+    -------
+    str
+        Normalized text.
+    """
+    if not text:
+        return ''
+    return ''.join(text.split()).lower()
+
+
+def get_edit_distance(source: str, target: str, limit: Optional[int] = None) -> int:
+    """
+    Compute the Levenshtein distance of two strings.
+
+    Parameters
+    ----------
+    source : str
+        First string.
+    target : str
+        Second string.
+    limit : int, optional
+        Stop early and return limit + 1 once the distance is known to be over limit.
+
+    Returns
+    -------
+    int
+        Number of insertions, deletions and substitutions.
+    """
+    if len(source) < len(target):
+        source, target = target, source
+    if limit is not None and len(source) - len(target) > limit:
+        return limit + 1
+    previous = list(range(len(target) + 1))
+    for row, source_char in enumerate(source, 1):
+        current = [row]
+        for column, target_char in enumerate(target, 1):
+            current.append(min(previous[column] + 1,
+                               current[column - 1] + 1,
+                               previous[column - 1] + (source_char != target_char)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CourseNameLexicon:
+    """
+    Approximate match index over the course names of the scraped catalog.
+
+    Names are normalized like OCR texts and indexed by character n-grams. A query only computes
+    edit distances against the names sharing the most n-grams with it, so it stays fast with
+    every name of a year loaded.
+
+    Timetable cells usually hold the course name first and the instructor or room after it,
+    so a name is also compared with the prefix of the query that has the length of the name.
+
+    Attributes
+    ----------
+    ngram : int
+        Character n-gram size.
+
+    Methods
+    -------
+    add(name, key=None)
+        Add a course name.
+    from_class_datas(datas, languages=('kr', 'en'), ngram=2)
+        Build a lexicon from class datas.
+    from_catalog_dir(dir_path, languages=('kr', 'en'), ngram=2)
+        Build a lexicon from a directory of scraped json files.
+    match(text, limit=5, candidate_count=50)
+        Get the closest names of an OCR text.
+    correct(text, min_confidence=0.6)
+        Snap an OCR text to the closest name.
+    """
+    def __init__(self, ngram: int = 2):
+        """
+        Initialize the CourseNameLexicon.
+
+        Parameters
+        ----------
+        ngram : int, optional
+            Character n-gram size (default is 2).
+        """
+        self.ngram: int = ngram
+
+        self.__names: list[str] = []
+        self.__normalized: list[str] = []
+        self.__keys: list[list[RecordKey]] = []
+        self.__name_ids: dict[str, int] = {}
+        self.__postings: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    def __get_grams(self, text: str) -> set[str]:
+        """
+        Get the character n-grams of a normalized text.
+        """
+        if len(text) <= self.ngram:
+            return {text} if text else set()
+        return {text[index:index + self.ngram] for index in range(len(text) - self.ngram + 1)}
+
+    def add(self, name: Optional[str], key: Optional[RecordKey] = None) -> None:
+        """
+        Add a course name.
+
+        Parameters
+        ----------
+        name : str or None
+            Course name. Empty names are skipped.
+        key : RecordKey, optional
+            (year, term, code) key of a class with this name.
+        """
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        name_id = self.__name_ids.get(normalized)
+        if name_id is None:
+            name_id = self.__name_ids[normalized] = len(self.__names)
+            self.__names.append(name.strip())
+            self.__normalized.append(normalized)
+            self.__keys.append([])
+            for gram in self.__get_grams(normalized):
+                self.__postings.setdefault(gram, []).append(name_id)
+        if key is not None and key not in self.__keys[name_id]:
+            self.__keys[name_id].append(key)
+
+    @classmethod
+    def from_class_datas(cls, datas: Iterable[dict], languages: tuple[str, ...] = ('kr', 'en'),
+                         ngram: int = 2) -> 'CourseNameLexicon':
+        """
+        Build a lexicon from class datas.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        languages : tuple[str, ...], optional
+            Name fields to use, 'kr' (name_kr) and/or 'en' (name_en) (default is both).
+        ngram : int, optional
+            Character n-gram size (default is 2).
+
+        Returns
+        -------
+        CourseNameLexicon
+            Built lexicon.
+        """
+        lexicon = cls(ngram=ngram)
+        for data in datas:
+            course_info = data.get('course_info') or {}
+            key = get_record_key(data)
+            for language in languages:
+                lexicon.add(course_info.get(f'name_{language}'), key)
+        return lexicon
+
+    @classmethod
+    def from_catalog_dir(cls, dir_path: str, languages: tuple[str, ...] = ('kr', 'en'),
+                         ngram: int = 2) -> 'CourseNameLexicon':
+        """
+        Build a lexicon from a directory of scraped json files.
+
+        Parameters
+        ----------
+        dir_path : str
+            Directory of scraped json files (ex) ./HakFile/UnivData/HYU_S).
+        languages : tuple[str, ...], optional
+            Name fields to use (default is ('kr', 'en')).
+        ngram : int, optional
+            Character n-gram size (default is 2).
+
+        Returns
+        -------
+        CourseNameLexicon
+            Built lexicon.
+        """
+        return cls.from_class_datas(iter_catalog_dir(dir_path), languages=languages, ngram=ngram)
+
+    def __score(self, query: str, name_id: int) -> float:
+        """
+        Get the confidence of a name for a normalized query (1.0 is an exact match).
+        """
+        name = self.__normalized[name_id]
+        limit = len(name)
+        distance = get_edit_distance(query, name, limit)
+        for length in (len(name) - 1, len(name), len(name) + 1):
+            if 0 < length < len(query):
+                distance = min(distance, get_edit_distance(query[:length], name, limit))
+        return max(0.0, 1.0 - distance / len(name))
+
+    def match(self, text: Optional[str], limit: int = 5, candidate_count: int = 50) -> list[LexiconMatch]:
+        """
+        Get the closest course names of an OCR text.
+
+        Parameters
+        ----------
+        text : str or None
+            OCR text.
+        limit : int, optional
+            Maximum number of results (default is 5).
+        candidate_count : int, optional
+            Number of names (with the most shared n-grams) that get an edit distance (default is 50).
+
+        Returns
+        -------
+        list[LexiconMatch]
+            Matches with the best confidence first.
+        """
+        query = normalize_name(text)
+        if not query:
+            return []
+        name_id = self.__name_ids.get(query)
+        if name_id is not None:
+            return [LexiconMatch(text, self.__names[name_id], 1.0, list(self.__keys[name_id]))]
+
+        shared: dict[int, int] = {}
+        for gram in self.__get_grams(query):
+            for candidate_id in self.__postings.get(gram, ()):
+                shared[candidate_id] = shared.get(candidate_id, 0) + 1
+        candidates = heapq.nlargest(candidate_count, shared, key=shared.__getitem__)
+        scored = heapq.nlargest(limit, ((self.__score(query, candidate_id), candidate_id)
+                                        for candidate_id in candidates))
+        return [LexiconMatch(text, self.__names[candidate_id], score, list(self.__keys[candidate_id]))
+                for score, candidate_id in scored]
+
+    def correct(self, text: Optional[str], min_confidence: float = 0.6) -> LexiconMatch:
+        """
+        Snap an OCR text to the closest course name.
+
+        Parameters
+        ----------
+        text : str or None
+            OCR text.
+        min_confidence : float, optional
+            Matches under this confidence are rejected (default is 0.6).
+
+        Returns
+        -------
+        LexiconMatch
+            Best match. name is None (and keys is empty) if no name reaches min_confidence,
+            but confidence still tells how close the best name was.
+        """
+        matches = self.match(text, limit=1)
+        if not matches:
+            return LexiconMatch(text, None, 0.0, [])
+        best = matches[0]
+        if best.confidence < min_confidence:
+            return LexiconMatch(text, None, best.confidence, [])
+        return best
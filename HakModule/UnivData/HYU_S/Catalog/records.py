@@ -0,0 +1,322 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+
+def intern_text(value: Any) -> Any:
+    """
+    Intern a string so repeated values (department names, buildings, view types...) share one object.
+
+    Parameters
+    ----------
+    value : Any
+        Value to intern. Values that are not str are returned as is.
+
+    Returns
+    -------
+    Any
+        Interned string or the original value.
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+
+class SlottedRecord:
+    """
+    Base class for the slotted catalog records.
+
+    Subclasses list their dict keys in ``FIELDS`` (in the ``HYUSeoulClassData.datas`` order).
+    Every string value is interned: besides low-cardinality values (departments, buildings,
+    view types), sections of one course repeat the same outline and weekly subjects.
+    """
+    __slots__ = ()
+    FIELDS: tuple[str, ...] = ()
+
+    def __init__(self, **kwargs):
+        for field in self.FIELDS:
+            setattr(self, field, intern_text(kwargs.get(field)))
+
+    def __eq__(self, other) -> bool:
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+        Create a record from its dict form.
+
+        Parameters
+        ----------
+        data : dict
+            Dict in the ``HYUSeoulClassData.datas`` shape.
+        """
+        return cls(**data)
+
+    def to_dict(self) -> OrderedDict:
+        """
+        Convert the record to its dict form.
+
+        Returns
+        -------
+        OrderedDict
+            Dict in the ``HYUSeoulClassData.datas`` shape.
+        """
+        return OrderedDict((field, getattr(self, field)) for field in self.FIELDS)
+
+
+class CourseInfo(SlottedRecord):
+    """
+    Course information (data: course_info). schedule is kept as a tuple of interned token tuples.
+    """
+    __slots__ = ('year', 'semester', 'number', 'code', 'type', 'name_kr', 'name_en', 'unit', 'c_hy',
+                 'credit', 'time_theory', 'time_pratice', 'department_lecture', 'department_charge',
+                 'schedule')
+    FIELDS = __slots__
+
+    def __init__(self, **kwargs):
+        super(CourseInfo, self).__init__(**kwargs)
+        self.schedule = tuple(tuple(intern_text(token) for token in entry)
+                              for entry in (self.schedule or ()))
+
+    def to_dict(self) -> OrderedDict:
+        course_info = super(CourseInfo, self).to_dict()
+        course_info['schedule'] = [list(entry) for entry in self.schedule]
+        return course_info
+
+
+class Instructor(SlottedRecord):
+    """
+    Instructor information (data: instructor).
+    """
+    __slots__ = ('department', 'name', 'contact', 'email', 'homepage')
+    FIELDS = __slots__
+
+
+class Outline(SlottedRecord):
+    """
+    Course outline (data: outline).
+    """
+    __slots__ = ('outline', 'guide', 'last_eval', 'details', 'main_subject', 'prerequisites')
+    FIELDS = __slots__
+
+    def __init__(self, **kwargs):
+        super(Outline, self).__init__(**kwargs)
+        self.details = tuple(intern_text(detail) for detail in (self.details or ()))
+
+    def to_dict(self) -> OrderedDict:
+        outline = super(Outline, self).to_dict()
+        outline['details'] = list(self.details)
+        return outline
+
+
+class Book(SlottedRecord):
+    """
+    Textbook information (data: books.first[], books.second[]).
+    """
+    __slots__ = ('name', 'author', 'publish', 'isbn', 'price')
+    FIELDS = __slots__
+
+
+class Books(SlottedRecord):
+    """
+    Textbooks (data: books). first and second are None if the key was not scraped.
+    """
+    __slots__ = ('first', 'second')
+    FIELDS = __slots__
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Books':
+        return cls(**{key: tuple(Book.from_dict(book) for book in books)
+                      for key, books in data.items()})
+
+    def to_dict(self) -> OrderedDict:
+        return OrderedDict((field, [book.to_dict() for book in getattr(self, field)])
+                           for field in self.FIELDS
+                           if getattr(self, field) is not None)
+
+
+class Evaluation(SlottedRecord):
+    """
+    Evaluation ratios (data: eval).
+    """
+    __slots__ = ('attendance', 'quiz', 'report', 'exam_mid', 'debate', 'exam_final', 'team', 'participation')
+    FIELDS = __slots__
+
+
+class WeeklyCourse(SlottedRecord):
+    """
+    Weekly course row (data: weekly_course[]).
+
+    holiday_name and holiday_notice are only written back when holiday is True.
+    Rows with nothing but a week number are shared through ``WeeklyCourse.null``.
+    """
+    __slots__ = ('number', 'holiday', 'holiday_name', 'holiday_notice', 'subject', 'career', 'view_type')
+    FIELDS = __slots__
+
+    __null_rows: dict[str, 'WeeklyCourse'] = {}
+
+    @classmethod
+    def null(cls, number: str) -> 'WeeklyCourse':
+        """
+        Get the shared all-null row of a week.
+
+        Parameters
+        ----------
+        number : str
+            Week number (ex) '1').
+
+        Returns
+        -------
+        WeeklyCourse
+            Shared row. It must not be modified.
+        """
+        row = cls.__null_rows.get(number)
+        if row is None:
+            row = cls(number=number, holiday=False, view_type='')
+            cls.__null_rows[row.number] = row
+        return row
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Optional['WeeklyCourse']:
+        """
+        Create a row from its dict form. An empty row (emptyDataList) becomes None.
+        """
+        if not data:
+            return None
+        if (not data.get('holiday') and data.get('subject') is None and data.get('career') is None
+                and data.get('view_type') == '' and data.get('number') is not None):
+            return cls.null(data['number'])
+        return cls(**data)
+
+    def is_null(self) -> bool:
+        """
+        Check if the row has nothing but a week number.
+        """
+        return self is WeeklyCourse.__null_rows.get(self.number)
+
+    def to_dict(self) -> OrderedDict:
+        course = super(WeeklyCourse, self).to_dict()
+        if not self.holiday:
+            del course['holiday_name']
+            del course['holiday_notice']
+        return course
+
+
+class ClassRecord:
+    """
+    Slotted replacement of ``HYUSeoulClassData.datas``.
+
+    Sections that were not scraped (check flags) are None, and ``to_dict`` writes back the same keys
+    the scraper wrote. Weekly rows that are all null share one object per week number.
+
+    Methods
+    -------
+    from_dict(data)
+        Create a record from a ``HYUSeoulClassData.datas`` dict.
+    from_datas(datas)
+        Create records from many dicts.
+    to_dict()
+        Convert the record back to the dict shape.
+    """
+    __slots__ = ('valid', 'course_info', 'instructor', 'outline', 'books', 'eval', 'weekly_course')
+
+    def __init__(self,
+                 valid: bool = False,
+                 course_info: Optional[CourseInfo] = None,
+                 instructor: Optional[Instructor] = None,
+                 outline: Optional[Outline] = None,
+                 books: Optional[Books] = None,
+                 evaluation: Optional[Evaluation] = None,
+                 weekly_course: Optional[tuple[Optional[WeeklyCourse], ...]] = None):
+        self.valid: bool = valid
+        self.course_info: Optional[CourseInfo] = course_info
+        self.instructor: Optional[Instructor] = instructor
+        self.outline: Optional[Outline] = outline
+        self.books: Optional[Books] = books
+        self.eval: Optional[Evaluation] = evaluation
+        self.weekly_course: Optional[tuple[Optional[WeeklyCourse], ...]] = weekly_course
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ClassRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in ClassRecord.__slots__)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ClassRecord':
+        """
+        Create a record from a class data dict.
+
+        Parameters
+        ----------
+        data : dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+
+        Returns
+        -------
+        ClassRecord
+            Slotted record.
+        """
+        record = cls(valid=data.get('valid', False))
+        if data.get('course_info') is not None:
+            record.course_info = CourseInfo.from_dict(data['course_info'])
+        if data.get('instructor') is not None:
+            record.instructor = Instructor.from_dict(data['instructor'])
+        if data.get('outline') is not None:
+            record.outline = Outline.from_dict(data['outline'])
+        if data.get('books') is not None:
+            record.books = Books.from_dict(data['books'])
+        if data.get('eval') is not None:
+            record.eval = Evaluation.from_dict(data['eval'])
+        if data.get('weekly_course') is not None:
+            record.weekly_course = tuple(WeeklyCourse.from_dict(course) for course in data['weekly_course'])
+        return record
+
+    @classmethod
+    def from_datas(cls, datas: Iterable[dict]) -> list['ClassRecord']:
+        """
+        Create records from class data dicts.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+
+        Returns
+        -------
+        list[ClassRecord]
+            Slotted records.
+        """
+        return [cls.from_dict(data) for data in datas]
+
+    def to_dict(self) -> OrderedDict:
+        """
+        Convert the record back to the ``HYUSeoulClassData.datas`` shape.
+
+        Returns
+        -------
+        OrderedDict
+            Class data dict.
+        """
+        data = OrderedDict([])
+        data['valid'] = self.valid
+        if not self.valid:
+            return data
+        data['course_info'] = None if self.course_info is None else self.course_info.to_dict()
+        if self.instructor is not None:
+            data['instructor'] = self.instructor.to_dict()
+        if self.outline is not None:
+            data['outline'] = self.outline.to_dict()
+        if self.books is not None:
+            data['books'] = self.books.to_dict()
+        if self.eval is not None:
+            data['eval'] = self.eval.to_dict()
+        if self.weekly_course is not None:
+            data['weekly_course'] = [OrderedDict([]) if course is None else course.to_dict()
+                                     for course in self.weekly_course]
+        return data
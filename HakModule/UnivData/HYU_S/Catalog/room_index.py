@@ -0,0 +1,348 @@
+from typing import Iterable, Optional, Union
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import RecordKey, get_record_key
+from HakModule.UnivData.HYU_S.Catalog.schedule import ScheduleSlot, parse_day, parse_schedule
+
+RoomKey = tuple[str, str]
+
+
+class RoomOccupancyIndex:
+    """
+    Room occupancy index built from ``course_info['schedule']`` of scraped class datas.
+
+    Every room keeps one slot bitset (python int) per day, so point, range and
+    "free rooms in building" queries are a few bit operations instead of a scan over every class.
+
+    Attributes
+    ----------
+    slot_minutes : int
+        Size of one bit in minutes.
+
+    Methods
+    -------
+    add_class_data(data)
+        Add (or replace) the schedule of a class data.
+    remove_class(key)
+        Remove the schedule of a class.
+    update_class_datas(datas)
+        Replace the schedules of rescraped class datas.
+    is_occupied(building, room, day, minute)
+        Check if a room is used at a moment.
+    is_free(building, room, day, start, end)
+        Check if a room is free for a whole time range.
+    get_occupants(building, room, day, start, end)
+        Get classes using a room in a time range.
+    get_free_rooms(building, day, start, end)
+        Get rooms of a building that are free for a whole time range.
+    """
+    def __init__(self, slot_minutes: int = 5):
+        """
+        Initialize the RoomOccupancyIndex.
+
+        Parameters
+        ----------
+        slot_minutes : int, optional
+            Size of one bit in minutes (default is 5). Class times are multiples of 5 minutes.
+        """
+        self.slot_minutes: int = slot_minutes
+
+        self.__room_masks: dict[RoomKey, list[int]] = {}
+        self.__room_slots: dict[RoomKey, dict[RecordKey, list[ScheduleSlot]]] = {}
+        self.__class_rooms: dict[RecordKey, set[RoomKey]] = {}
+        self.__building_rooms: dict[str, set[str]] = {}
+
+    @classmethod
+    def from_class_datas(cls, datas: Iterable[dict], slot_minutes: int = 5) -> 'RoomOccupancyIndex':
+        """
+        Build an index from class datas.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        slot_minutes : int, optional
+            Size of one bit in minutes (default is 5).
+
+        Returns
+        -------
+        RoomOccupancyIndex
+            Built index.
+        """
+        index = cls(slot_minutes=slot_minutes)
+        index.update_class_datas(datas)
+        return index
+
+    def range_mask(self, start: int, end: int) -> int:
+        """
+        Convert a minute range to a slot bitset.
+
+        Parameters
+        ----------
+        start : int
+            Start minute from midnight.
+        end : int
+            End minute from midnight (exclusive).
+
+        Returns
+        -------
+        int
+            Bitset with every slot touched by the range set.
+        """
+        first_slot = start // self.slot_minutes
+        last_slot = -(-end // self.slot_minutes)
+        if last_slot <= first_slot:
+            return 0
+        return ((1 << (last_slot - first_slot)) - 1) << first_slot
+
+    def add_class_data(self, data: dict) -> None:
+        """
+        Add the schedule of a class data. A class that is already indexed is replaced.
+
+        Parameters
+        ----------
+        data : dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+        """
+        key = get_record_key(data)
+        if key is None:
+            return
+        touched_rooms = self.__detach_class(key)
+
+        for slot in parse_schedule(data.get('course_info')):
+            if slot.building is None or slot.room is None:
+                continue
+            room_key = (slot.building, slot.room)
+            self.__room_slots.setdefault(room_key, {}).setdefault(key, []).append(slot)
+            self.__class_rooms.setdefault(key, set()).add(room_key)
+            self.__building_rooms.setdefault(slot.building, set()).add(slot.room)
+            touched_rooms.add(room_key)
+
+        for room_key in touched_rooms:
+            self.__rebuild_room(room_key)
+
+    def remove_class(self, key: RecordKey) -> None:
+        """
+        Remove the schedule of a class.
+
+        Parameters
+        ----------
+        key : RecordKey
+            (year, term, code) key of the class.
+        """
+        for room_key in self.__detach_class(key):
+            self.__rebuild_room(room_key)
+
+    def update_class_datas(self, datas: Iterable[dict]) -> None:
+        """
+        Replace the schedules of (re)scraped class datas. Only rooms used by those classes are rebuilt.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        """
+        for data in datas:
+            self.add_class_data(data)
+
+    def __detach_class(self, key: RecordKey) -> set[RoomKey]:
+        """
+        Remove the slots of a class without rebuilding the room bitsets.
+
+        Returns
+        -------
+        set[RoomKey]
+            Rooms that need to be rebuilt.
+        """
+        room_keys = self.__class_rooms.pop(key, set())
+        for room_key in room_keys:
+            self.__room_slots[room_key].pop(key, None)
+        return set(room_keys)
+
+    def __rebuild_room(self, room_key: RoomKey) -> None:
+        """
+        Rebuild the day bitsets of a room from its slots.
+        """
+        class_slots = self.__room_slots.get(room_key)
+        if not class_slots:
+            self.__room_slots.pop(room_key, None)
+            self.__room_masks.pop(room_key, None)
+            building, room = room_key
+            rooms = self.__building_rooms.get(building)
+            if rooms is not None:
+                rooms.discard(room)
+                if not rooms:
+                    del self.__building_rooms[building]
+            return
+
+        masks = [0] * 7
+        for slots in class_slots.values():
+            for slot in slots:
+                masks[slot.day] |= self.range_mask(slot.start, slot.end)
+        self.__room_masks[room_key] = masks
+
+    def get_buildings(self) -> list[str]:
+        """
+        Get every indexed building.
+
+        Returns
+        -------
+        list[str]
+            Sorted building names.
+        """
+        return sorted(self.__building_rooms)
+
+    def get_rooms(self, building: str) -> list[str]:
+        """
+        Get every indexed room of a building.
+
+        Parameters
+        ----------
+        building : str
+            Building name (ex) '제1공학관').
+
+        Returns
+        -------
+        list[str]
+            Sorted room names.
+        """
+        return sorted(self.__building_rooms.get(building, ()))
+
+    def get_day_mask(self, building: str, room: str, day: Union[int, str]) -> int:
+        """
+        Get the occupancy bitset of a room for a day.
+
+        Parameters
+        ----------
+        building : str
+            Building name.
+        room : str
+            Room name.
+        day : int or str
+            Day index (0 is Monday) or day name (ex) '화').
+
+        Returns
+        -------
+        int
+            Occupancy bitset (0 if the room is unknown).
+        """
+        masks = self.__room_masks.get((building, room))
+        if masks is None:
+            return 0
+        return masks[_to_day_index(day)]
+
+    def is_occupied(self, building: str, room: str, day: Union[int, str], minute: int) -> bool:
+        """
+        Check if a room is used at a moment.
+
+        Parameters
+        ----------
+        building : str
+            Building name.
+        room : str
+            Room name.
+        day : int or str
+            Day index (0 is Monday) or day name.
+        minute : int
+            Minutes from midnight.
+
+        Returns
+        -------
+        bool
+            True if a class uses the room at that moment.
+        """
+        return bool(self.get_day_mask(building, room, day) >> (minute // self.slot_minutes) & 1)
+
+    def is_free(self, building: str, room: str, day: Union[int, str], start: int, end: int) -> bool:
+        """
+        Check if a room is free for a whole time range.
+
+        Parameters
+        ----------
+        building : str
+            Building name.
+        room : str
+            Room name.
+        day : int or str
+            Day index (0 is Monday) or day name.
+        start : int
+            Start minute from midnight.
+        end : int
+            End minute from midnight (exclusive).
+
+        Returns
+        -------
+        bool
+            True if no class uses the room in the range.
+        """
+        return self.get_day_mask(building, room, day) & self.range_mask(start, end) == 0
+
+    def get_occupants(self, building: str, room: str, day: Union[int, str], start: int, end: int) -> list[RecordKey]:
+        """
+        Get classes using a room in a time range.
+
+        Parameters
+        ----------
+        building : str
+            Building name.
+        room : str
+            Room name.
+        day : int or str
+            Day index (0 is Monday) or day name.
+        start : int
+            Start minute from midnight.
+        end : int
+            End minute from midnight (exclusive).
+
+        Returns
+        -------
+        list[RecordKey]
+            Keys of the classes overlapping the range.
+        """
+        if self.is_free(building, room, day, start, end):
+            return []
+        day_index = _to_day_index(day)
+        result = []
+        for key, slots in self.__room_slots[(building, room)].items():
+            for slot in slots:
+                if slot.day == day_index and slot.start < end and start < slot.end:
+                    result.append(key)
+                    break
+        return result
+
+    def get_free_rooms(self, building: str, day: Union[int, str], start: int, end: int) -> list[str]:
+        """
+        Get rooms of a building that are free for a whole time range.
+
+        Parameters
+        ----------
+        building : str
+            Building name (ex) '제1공학관').
+        day : int or str
+            Day index (0 is Monday) or day name (ex) '화').
+        start : int
+            Start minute from midnight (ex) 13 * 60).
+        end : int
+            End minute from midnight, exclusive (ex) 15 * 60).
+
+        Returns
+        -------
+        list[str]
+            Sorted names of the free rooms.
+        """
+        day_index = _to_day_index(day)
+        query_mask = self.range_mask(start, end)
+        return [room
+                for room in self.get_rooms(building)
+                if self.__room_masks[(building, room)][day_index] & query_mask == 0]
+
+
+def _to_day_index(day: Union[int, str]) -> int:
+    """
+    Convert a day index or day name to a day index.
+    """
+    if isinstance(day, int):
+        return day
+    day_index: Optional[int] = parse_day(day)
+    if day_index is None:
+        raise ValueError(f"unknown day : {day}")
+    return day_index
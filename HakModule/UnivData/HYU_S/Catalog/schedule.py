@@ -0,0 +1,121 @@
+from collections import namedtuple
+from typing import Optional
+
+# (ex) ['수', '10:00-11:30', '제1공학관', '606강의실(공학대학원', '전용)']
+ScheduleSlot = namedtuple('ScheduleSlot', ['day', 'start', 'end', 'building', 'room'])
+
+DAY_NAMES: list[str] = ['월', '화', '수', '목', '금', '토', '일']
+DAY_NAMES_EN: list[str] = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def parse_day(day_text: str) -> Optional[int]:
+    """
+    Convert a day name to a day index (0 is Monday).
+
+    Parameters
+    ----------
+    day_text : str
+        Day name (ex) '수', 'Wed'). '無' means the class has no fixed day.
+
+    Returns
+    -------
+    int or None
+        Day index, or None if the day is unknown.
+    """
+    if day_text in DAY_NAMES:
+        return DAY_NAMES.index(day_text)
+    if day_text[:3].capitalize() in DAY_NAMES_EN:
+        return DAY_NAMES_EN.index(day_text[:3].capitalize())
+    return None
+
+
+def parse_time(time_text: str) -> int:
+    """
+    Convert 'HH:MM' text to minutes from midnight.
+
+    Parameters
+    ----------
+    time_text : str
+        Time text (ex) '13:30').
+
+    Returns
+    -------
+    int
+        Minutes from midnight.
+    """
+    hour, minute = time_text.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def parse_time_range(range_text: str) -> Optional[tuple[int, int]]:
+    """
+    Convert 'HH:MM-HH:MM' text to a (start, end) minute tuple.
+
+    Parameters
+    ----------
+    range_text : str
+        Time range text (ex) '10:00-11:30').
+
+    Returns
+    -------
+    tuple[int, int] or None
+        Start and end minutes, or None if the text can not be parsed.
+    """
+    try:
+        start_text, end_text = range_text.split('-')
+        return parse_time(start_text), parse_time(end_text)
+    except ValueError:
+        return None
+
+
+def parse_schedule_entry(entry: list[str]) -> Optional[ScheduleSlot]:
+    """
+    Convert a ``course_info['schedule']`` entry to a ScheduleSlot.
+
+    ``convert_course_info_schedule`` splits the room name on spaces, so every token after
+    the building is joined back into one room name.
+
+    Parameters
+    ----------
+    entry : list[str]
+        Schedule entry (day, time range, building, room tokens...).
+
+    Returns
+    -------
+    ScheduleSlot or None
+        Parsed slot, or None if the entry has no valid day or time.
+        building and room are None if they are not given.
+    """
+    if len(entry) < 2:
+        return None
+    day = parse_day(entry[0])
+    time_range = parse_time_range(entry[1])
+    if day is None or time_range is None:
+        return None
+    building: Optional[str] = entry[2] if len(entry) > 2 else None
+    room: Optional[str] = ' '.join(entry[3:]) if len(entry) > 3 else None
+    return ScheduleSlot(day, time_range[0], time_range[1], building, room)
+
+
+def parse_schedule(course_info: Optional[dict]) -> list[ScheduleSlot]:
+    """
+    Convert every schedule entry of a course information to ScheduleSlots.
+
+    Parameters
+    ----------
+    course_info : dict or None
+        ``course_info`` part of a class data.
+
+    Returns
+    -------
+    list[ScheduleSlot]
+        Parsed slots. Entries without a valid day or time are skipped.
+    """
+    if course_info is None:
+        return []
+    slots = []
+    for entry in course_info.get('schedule', []):
+        slot = parse_schedule_entry(entry)
+        if slot is not None:
+            slots.append(slot)
+    return slots
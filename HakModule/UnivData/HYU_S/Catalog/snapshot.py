@@ -0,0 +1,551 @@
+"""
+Catalog snapshot file layout (little endian, every section 8 byte aligned)
+
+    header   : magic(8s) version(I) section_count(I)
+    sections : name(48s) offset(Q) length(Q) * section_count
+    'strings'       : string table (count(I), offsets(I) * (count + 1), utf-8 blob)
+    'records'       : string table of the full class data json, one per row
+    'num:{column}'  : int32 column, INT_NONE for None
+    'str:{column}'  : uint32 string id column, STR_NONE for None
+    'slot:{column}' : room slot index columns sorted by (building, room, day, start)
+    'terms'         : string table of search terms sorted by utf-8 bytes
+    'post:*'        : postings (offsets per term, doc rows, term counts) and doc lengths
+"""
+
+import os
+import json
+import math
+import mmap
+import heapq
+import struct
+import bisect
+from array import array
+from typing import Any, Iterable, Optional
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import RecordKey, get_record_key
+from HakModule.UnivData.HYU_S.Catalog.schedule import parse_schedule
+from HakModule.UnivData.HYU_S.Catalog.text_search import get_syllabus_text, tokenize
+
+MAGIC: bytes = b'HAKSNAP\x00'
+VERSION: int = 1
+HEADER = struct.Struct('<8sII')
+SECTION = struct.Struct('<48sQQ')
+
+INT_NONE: int = -2 ** 31
+STR_NONE: int = 2 ** 32 - 1
+
+NUMERIC_COLUMNS: list[tuple[str, str]] = [
+    ('course_info', 'code'), ('course_info', 'year'), ('course_info', 'unit'), ('course_info', 'credit'),
+    ('course_info', 'time_theory'), ('course_info', 'time_pratice'),
+    ('eval', 'attendance'), ('eval', 'quiz'), ('eval', 'report'), ('eval', 'exam_mid'), ('eval', 'debate'),
+    ('eval', 'exam_final'), ('eval', 'team'), ('eval', 'participation'),
+]
+STRING_COLUMNS: list[tuple[str, str]] = [
+    ('course_info', 'semester'), ('course_info', 'number'), ('course_info', 'type'),
+    ('course_info', 'name_kr'), ('course_info', 'name_en'), ('course_info', 'c_hy'),
+    ('course_info', 'department_lecture'), ('course_info', 'department_charge'),
+    ('instructor', 'department'), ('instructor', 'name'),
+]
+SLOT_COLUMNS: list[tuple[str, str]] = [
+    ('building', 'I'), ('room', 'I'), ('day', 'I'), ('start', 'I'), ('end', 'I'), ('row', 'I'),
+]
+
+
+def get_column_name(section: str, field: str) -> str:
+    """
+    Get the snapshot column name of a class data field (ex) ('instructor', 'name') -> 'instructor.name').
+    """
+    return f"{section}.{field}"
+
+
+def _encode_string_table(values: list[bytes]) -> bytes:
+    """
+    Encode byte strings as count, offsets and one blob.
+    """
+    offsets = array('I', [0])
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return struct.pack('<I', len(values)) + offsets.tobytes() + b''.join(values)
+
+
+class _StringTable:
+    """
+    Read only view of an encoded string table.
+    """
+    def __init__(self, view: memoryview):
+        self.count: int = struct.unpack_from('<I', view, 0)[0]
+        self.offsets: memoryview = view[4:4 + 4 * (self.count + 1)].cast('I')
+        self.blob: memoryview = view[4 + 4 * (self.count + 1):]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get_bytes(self, index: int) -> bytes:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]])
+
+    def get(self, index: int) -> Optional[str]:
+        if index == STR_NONE:
+            return None
+        return self.get_bytes(index).decode('UTF-8')
+
+
+class _SortedBytes:
+    """
+    Sequence adapter so ``bisect`` can search a string table sorted by bytes.
+    """
+    def __init__(self, table: _StringTable):
+        self.table: _StringTable = table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.table.get_bytes(index)
+
+
+def write_catalog_snapshot(datas: Iterable[dict], path: str, ngram: int = 2) -> None:
+    """
+    Write class datas to a snapshot file.
+
+    The file is written next to ``path`` and moved over it with ``os.replace``, so readers
+    always see either the old or the new snapshot.
+
+    Parameters
+    ----------
+    datas : Iterable[dict]
+        Class datas in the ``HYUSeoulClassData.datas`` shape. Datas without course information are skipped.
+    path : str
+        Path of the snapshot file.
+    ngram : int, optional
+        Character n-gram size of the search index (default is 2).
+    """
+    rows: list[tuple[RecordKey, dict]] = []
+    for data in datas:
+        key = get_record_key(data)
+        if key is not None:
+            rows.append((key, data))
+    rows.sort(key=lambda row: (row[0].code, row[0].year or 0, row[0].term or ''))
+
+    strings: list[bytes] = []
+    string_ids: dict[str, int] = {}
+
+    def string_id(value: Optional[str]) -> int:
+        if value is None:
+            return STR_NONE
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value.encode('UTF-8'))
+        return string_ids[value]
+
+    sections: dict[str, bytes] = {}
+    for section, field in NUMERIC_COLUMNS:
+        column = array('i', [INT_NONE if (data.get(section) or {}).get(field) is None
+                             else (data.get(section) or {}).get(field)
+                             for _, data in rows])
+        sections[f"num:{get_column_name(section, field)}"] = column.tobytes()
+    for section, field in STRING_COLUMNS:
+        column = array('I', [string_id((data.get(section) or {}).get(field)) for _, data in rows])
+        sections[f"str:{get_column_name(section, field)}"] = column.tobytes()
+
+    slots = []
+    for row, (_, data) in enumerate(rows):
+        for slot in parse_schedule(data['course_info']):
+            if slot.building is not None and slot.room is not None:
+                slots.append((slot.building, slot.room, slot.day, slot.start, slot.end, row))
+    slots.sort()
+    slot_columns = {name: array(type_code) for name, type_code in SLOT_COLUMNS}
+    for building, room, day, start, end, row in slots:
+        slot_columns['building'].append(string_id(building))
+        slot_columns['room'].append(string_id(room))
+        slot_columns['day'].append(day)
+        slot_columns['start'].append(start)
+        slot_columns['end'].append(end)
+        slot_columns['row'].append(row)
+    for name, column in slot_columns.items():
+        sections[f"slot:{name}"] = column.tobytes()
+
+    postings: dict[bytes, list[tuple[int, int]]] = {}
+    doc_lengths = array('I')
+    for row, (_, data) in enumerate(rows):
+        term_counts: dict[str, int] = {}
+        for text in get_syllabus_text(data):
+            for token in tokenize(text, ngram=ngram):
+                term_counts[token] = term_counts.get(token, 0) + 1
+        for term, count in term_counts.items():
+            postings.setdefault(term.encode('UTF-8'), []).append((row, count))
+        doc_lengths.append(sum(term_counts.values()))
+    terms = sorted(postings)
+    posting_offsets, posting_docs, posting_counts = array('I', [0]), array('I'), array('I')
+    for term in terms:
+        for row, count in postings[term]:
+            posting_docs.append(row)
+            posting_counts.append(count)
+        posting_offsets.append(len(posting_docs))
+    sections['terms'] = _encode_string_table(terms)
+    sections['post:offsets'] = posting_offsets.tobytes()
+    sections['post:docs'] = posting_docs.tobytes()
+    sections['post:counts'] = posting_counts.tobytes()
+    sections['post:lengths'] = doc_lengths.tobytes()
+    sections['meta'] = json.dumps({'rows': len(rows), 'ngram': ngram, 'total_length': sum(doc_lengths)}).encode('UTF-8')
+
+    sections['records'] = _encode_string_table([
+        json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('UTF-8') for _, data in rows
+    ])
+    sections['strings'] = _encode_string_table(strings)
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = []
+    for name, body in sections.items():
+        offset += -offset % 8
+        table.append((name, offset, len(body)))
+        offset += len(body)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as fw:
+        fw.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+        for name, section_offset, length in table:
+            fw.write(SECTION.pack(name.encode('UTF-8'), section_offset, length))
+        for (name, section_offset, length), body in zip(table, sections.values()):
+            fw.write(b'\x00' * (section_offset - fw.tell()))
+            fw.write(body)
+        fw.flush()
+        os.fsync(fw.fileno())
+    os.replace(temp_path, path)
+
+
+class CatalogSnapshot:
+    """
+    Read only, memory mapped view of a catalog snapshot file.
+
+    Nothing is parsed on open; columns and indexes are memoryviews over the shared mapping,
+    so every worker process that opens the same file shares one physical copy.
+
+    Methods
+    -------
+    get_value(row, section, field)
+        Get one column value of a row.
+    get_record(row)
+        Get the full class data of a row.
+    find_rows(code, year=None, term=None)
+        Get rows of a class code.
+    get_free_rooms(building, day, start, end)
+        Get rooms of a building that are free for a whole time range.
+    get_occupants(building, room, day, start, end)
+        Get rows using a room in a time range.
+    search(query, limit=10)
+        Get the best matching rows for a syllabus search.
+    close()
+        Close the mapping.
+    """
+    def __init__(self, path: str):
+        """
+        Open a snapshot file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the snapshot file.
+        """
+        self.path: str = path
+        with open(path, "rb") as fr:
+            self.__map: mmap.mmap = mmap.mmap(fr.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__view: memoryview = memoryview(self.__map)
+
+        magic, version, section_count = HEADER.unpack_from(self.__view, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"not a catalog snapshot (version {VERSION}) : {path}")
+        self.__sections: dict[str, memoryview] = {}
+        for index in range(section_count):
+            name, offset, length = SECTION.unpack_from(self.__view, HEADER.size + SECTION.size * index)
+            self.__sections[name.rstrip(b'\x00').decode('UTF-8')] = self.__view[offset:offset + length]
+
+        meta = json.loads(bytes(self.__sections['meta']))
+        self.row_count: int = meta['rows']
+        self.ngram: int = meta['ngram']
+        self.__total_length: int = meta['total_length']
+        self.__strings = _StringTable(self.__sections['strings'])
+        self.__records = _StringTable(self.__sections['records'])
+        self.__terms = _StringTable(self.__sections['terms'])
+        self.__columns: dict[str, memoryview] = {}
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __enter__(self) -> 'CatalogSnapshot':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release the memoryviews and close the mapping.
+        """
+        if self.__map.closed:
+            return
+        for view in getattr(self, '_CatalogSnapshot__columns', {}).values():
+            view.release()
+        self.__columns = {}
+        self.__sections = {}
+        self.__strings = self.__records = self.__terms = None
+        self.__view.release()
+        self.__map.close()
+
+    def __column(self, name: str, type_code: str) -> memoryview:
+        column = self.__columns.get(name)
+        if column is None:
+            column = self.__sections[name].cast(type_code)
+            self.__columns[name] = column
+        return column
+
+    def get_value(self, row: int, section: str, field: str) -> Any:
+        """
+        Get one column value of a row without decoding the whole record.
+
+        Parameters
+        ----------
+        row : int
+            Row index.
+        section : str
+            Class data section (ex) 'course_info', 'eval').
+        field : str
+            Field name (ex) 'name_kr', 'credit').
+
+        Returns
+        -------
+        Any
+            Column value.
+        """
+        column_name = get_column_name(section, field)
+        if f"num:{column_name}" in self.__sections:
+            value = self.__column(f"num:{column_name}", 'i')[row]
+            return None if value == INT_NONE else value
+        if f"str:{column_name}" in self.__sections:
+            return self.__strings.get(self.__column(f"str:{column_name}", 'I')[row])
+        return (self.get_record(row).get(section) or {}).get(field)
+
+    def get_record(self, row: int) -> dict:
+        """
+        Get the full class data of a row.
+
+        Parameters
+        ----------
+        row : int
+            Row index.
+
+        Returns
+        -------
+        dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+        """
+        return json.loads(self.__records.get_bytes(row))
+
+    def get_record_key(self, row: int) -> RecordKey:
+        """
+        Get the (year, term, code) key of a row.
+        """
+        return RecordKey(self.get_value(row, 'course_info', 'year'),
+                         self.get_value(row, 'course_info', 'semester'),
+                         self.get_value(row, 'course_info', 'code'))
+
+    def find_rows(self, code: int, year: Optional[int] = None, term: Optional[str] = None) -> list[int]:
+        """
+        Get rows of a class code. Rows are sorted by code, so this is a binary search.
+
+        Parameters
+        ----------
+        code : int
+            Class code (ex) 10001).
+        year : int, optional
+            Only rows of this year.
+        term : str, optional
+            Only rows of this term (ex) 'second').
+
+        Returns
+        -------
+        list[int]
+            Matching rows.
+        """
+        codes = self.__column(f"num:{get_column_name('course_info', 'code')}", 'i')
+        first = bisect.bisect_left(codes, code)
+        last = bisect.bisect_right(codes, code, lo=first)
+        return [row
+                for row in range(first, last)
+                if (year is None or self.get_value(row, 'course_info', 'year') == year)
+                and (term is None or self.get_value(row, 'course_info', 'semester') == term)]
+
+    def __building_slots(self, building: str) -> range:
+        """
+        Get the slot index range of a building.
+        """
+        # slots are sorted by building name, so bisect over the decoded names
+        names = _SlotNames(self.__strings, self.__column('slot:building', 'I'))
+        first = bisect.bisect_left(names, building)
+        last = bisect.bisect_right(names, building, lo=first)
+        return range(first, last)
+
+    def get_free_rooms(self, building: str, day: int, start: int, end: int) -> list[str]:
+        """
+        Get rooms of a building that are free for a whole time range.
+
+        Parameters
+        ----------
+        building : str
+            Building name (ex) '제1공학관').
+        day : int
+            Day index (0 is Monday).
+        start : int
+            Start minute from midnight.
+        end : int
+            End minute from midnight (exclusive).
+
+        Returns
+        -------
+        list[str]
+            Sorted names of the free rooms.
+        """
+        rooms = self.__column('slot:room', 'I')
+        days = self.__column('slot:day', 'I')
+        starts = self.__column('slot:start', 'I')
+        ends = self.__column('slot:end', 'I')
+        room_free: dict[int, bool] = {}
+        for index in self.__building_slots(building):
+            room_id = rooms[index]
+            busy = days[index] == day and starts[index] < end and start < ends[index]
+            room_free[room_id] = room_free.get(room_id, True) and not busy
+        return sorted(self.__strings.get(room_id) for room_id, free in room_free.items() if free)
+
+    def get_occupants(self, building: str, room: str, day: int, start: int, end: int) -> list[int]:
+        """
+        Get rows using a room in a time range.
+
+        Parameters
+        ----------
+        building : str
+            Building name.
+        room : str
+            Room name.
+        day : int
+            Day index (0 is Monday).
+        start : int
+            Start minute from midnight.
+        end : int
+            End minute from midnight (exclusive).
+
+        Returns
+        -------
+        list[int]
+            Rows of the classes overlapping the range.
+        """
+        rooms = self.__column('slot:room', 'I')
+        days = self.__column('slot:day', 'I')
+        starts = self.__column('slot:start', 'I')
+        ends = self.__column('slot:end', 'I')
+        slot_rows = self.__column('slot:row', 'I')
+        result = []
+        for index in self.__building_slots(building):
+            if (self.__strings.get(rooms[index]) == room and days[index] == day
+                    and starts[index] < end and start < ends[index] and slot_rows[index] not in result):
+                result.append(slot_rows[index])
+        return result
+
+    def search(self, query: str, limit: int = 10, k1: float = 1.2, b: float = 0.75) -> list[tuple[int, float]]:
+        """
+        Get the best matching rows for a syllabus search (BM25, same tokens as SyllabusSearchIndex).
+
+        Parameters
+        ----------
+        query : str
+            Search text.
+        limit : int, optional
+            Maximum number of results (default is 10).
+        k1 : float, optional
+            BM25 k1 parameter (default is 1.2).
+        b : float, optional
+            BM25 b parameter (default is 0.75).
+
+        Returns
+        -------
+        list[tuple[int, float]]
+            (row, score) pairs, best first.
+        """
+        if self.row_count == 0:
+            return []
+        offsets = self.__column('post:offsets', 'I')
+        docs = self.__column('post:docs', 'I')
+        counts = self.__column('post:counts', 'I')
+        lengths = self.__column('post:lengths', 'I')
+        average_length = self.__total_length / self.row_count
+
+        terms = _SortedBytes(self.__terms)
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query, ngram=self.ngram)):
+            term_bytes = term.encode('UTF-8')
+            index = bisect.bisect_left(terms, term_bytes)
+            if index == len(terms) or terms[index] != term_bytes:
+                continue
+            first, last = offsets[index], offsets[index + 1]
+            idf = math.log(1 + (self.row_count - (last - first) + 0.5) / ((last - first) + 0.5))
+            for position in range(first, last):
+                row, count = docs[position], counts[position]
+                norm = k1 * (1 - b + b * lengths[row] / average_length)
+                scores[row] = scores.get(row, 0.0) + idf * count * (k1 + 1) / (count + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class _SlotNames:
+    """
+    Sequence adapter so ``bisect`` can search the slot building column by name.
+    """
+    def __init__(self, strings: _StringTable, column: memoryview):
+        self.strings: _StringTable = strings
+        self.column: memoryview = column
+
+    def __len__(self) -> int:
+        return len(self.column)
+
+    def __getitem__(self, index: int) -> str:
+        return self.strings.get(self.column[index])
+
+
+class SharedCatalogSnapshot:
+    """
+    Holder that reopens the snapshot when a new file was swapped in with ``write_catalog_snapshot``.
+
+    Methods
+    -------
+    get()
+        Get the current snapshot.
+    """
+    def __init__(self, path: str):
+        """
+        Initialize the SharedCatalogSnapshot.
+
+        Parameters
+        ----------
+        path : str
+            Path of the snapshot file.
+        """
+        self.path: str = path
+        self.__snapshot: Optional[CatalogSnapshot] = None
+        self.__file_id: Optional[tuple[int, int]] = None
+
+    def get(self) -> CatalogSnapshot:
+        """
+        Get the current snapshot, reopening it if the file was replaced.
+
+        The old mapping is not closed here because requests may still be reading it;
+        it is released when the last reference goes away.
+
+        Returns
+        -------
+        CatalogSnapshot
+            Current snapshot.
+        """
+        stat = os.stat(self.path)
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if self.__snapshot is None or file_id != self.__file_id:
+            self.__snapshot = CatalogSnapshot(self.path)
+            self.__file_id = file_id
+        return self.__snapshot
@@ -0,0 +1,303 @@
+import math
+import heapq
+import pickle
+import re
+from typing import Iterable, Optional
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import RecordKey, get_record_key
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+TOKEN_PATTERN = re.compile(r"[가-힣ㄱ-ㅎㅏ-ㅣ]+|[a-z0-9]+")
+
+
+def tokenize(text: Optional[str], ngram: int = 2) -> list[str]:
+    """
+    Split text into search tokens.
+
+    Korean has no reliable word boundary (particles stick to nouns), so hangul runs are split
+    into character n-grams. Latin letters and digits are kept as lower case word tokens.
+
+    Parameters
+    ----------
+    text : str or None
+        Text to tokenize.
+    ngram : int, optional
+        Character n-gram size for hangul (default is 2).
+
+    Returns
+    -------
+    list[str]
+        Tokens in text order (with duplicates).
+    """
+    if not text:
+        return []
+    tokens = []
+    for part in TOKEN_PATTERN.findall(text.lower()):
+        if WORD_PATTERN.fullmatch(part):
+            tokens.append(part)
+        elif len(part) <= ngram:
+            tokens.append(part)
+        else:
+            tokens.extend(part[index:index + ngram] for index in range(len(part) - ngram + 1))
+    return tokens
+
+
+def get_syllabus_text(data: dict) -> list[str]:
+    """
+    Collect the searchable syllabus texts of a class data.
+
+    Parameters
+    ----------
+    data : dict
+        Class data in the ``HYUSeoulClassData.datas`` shape.
+
+    Returns
+    -------
+    list[str]
+        Course names, outline texts and weekly subjects.
+    """
+    texts = []
+    course_info = data.get('course_info') or {}
+    texts.append(course_info.get('name_kr'))
+    texts.append(course_info.get('name_en'))
+
+    outline = data.get('outline') or {}
+    for key in ['outline', 'guide', 'main_subject', 'prerequisites']:
+        texts.append(outline.get(key))
+    texts.extend(outline.get('details') or [])
+
+    for week in data.get('weekly_course') or []:
+        texts.append(week.get('subject'))
+    return [text for text in texts if text]
+
+
+class SyllabusSearchIndex:
+    """
+    Inverted index with BM25 ranking over the syllabus texts of class datas.
+
+    Attributes
+    ----------
+    ngram : int
+        Character n-gram size for hangul.
+    k1 : float
+        BM25 term frequency saturation.
+    b : float
+        BM25 document length normalization.
+
+    Methods
+    -------
+    add_class_data(data)
+        Add (or replace) a class data.
+    remove_class(key)
+        Remove a class.
+    search(query, limit=10)
+        Get the best matching classes.
+    save(path)
+        Save the index to a file.
+    load(path)
+        Load an index from a file.
+    """
+    FORMAT_VERSION: int = 1
+
+    def __init__(self, ngram: int = 2, k1: float = 1.2, b: float = 0.75):
+        """
+        Initialize the SyllabusSearchIndex.
+
+        Parameters
+        ----------
+        ngram : int, optional
+            Character n-gram size for hangul (default is 2).
+        k1 : float, optional
+            BM25 k1 parameter (default is 1.2).
+        b : float, optional
+            BM25 b parameter (default is 0.75).
+        """
+        self.ngram: int = ngram
+        self.k1: float = k1
+        self.b: float = b
+
+        self.__postings: dict[str, dict[int, int]] = {}
+        self.__doc_terms: Optional[dict[int, dict[str, int]]] = {}
+        self.__doc_lengths: dict[int, int] = {}
+        self.__doc_keys: dict[int, RecordKey] = {}
+        self.__key_docs: dict[RecordKey, int] = {}
+        self.__total_length: int = 0
+        self.__next_doc: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__doc_keys)
+
+    @classmethod
+    def from_class_datas(cls, datas: Iterable[dict], ngram: int = 2) -> 'SyllabusSearchIndex':
+        """
+        Build an index from class datas.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        ngram : int, optional
+            Character n-gram size for hangul (default is 2).
+
+        Returns
+        -------
+        SyllabusSearchIndex
+            Built index.
+        """
+        index = cls(ngram=ngram)
+        for data in datas:
+            index.add_class_data(data)
+        return index
+
+    def add_class_data(self, data: dict) -> None:
+        """
+        Add a class data. A class that is already indexed is replaced.
+
+        Parameters
+        ----------
+        data : dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+        """
+        key = get_record_key(data)
+        if key is None:
+            return
+        self.remove_class(key)
+
+        term_counts: dict[str, int] = {}
+        for text in get_syllabus_text(data):
+            for token in tokenize(text, ngram=self.ngram):
+                term_counts[token] = term_counts.get(token, 0) + 1
+        if not term_counts:
+            return
+
+        doc_id = self.__next_doc
+        self.__next_doc += 1
+        for term, count in term_counts.items():
+            self.__postings.setdefault(term, {})[doc_id] = count
+        length = sum(term_counts.values())
+        if self.__doc_terms is not None:
+            self.__doc_terms[doc_id] = term_counts
+        self.__doc_lengths[doc_id] = length
+        self.__doc_keys[doc_id] = key
+        self.__key_docs[key] = doc_id
+        self.__total_length += length
+
+    def remove_class(self, key: RecordKey) -> None:
+        """
+        Remove a class from the index.
+
+        Parameters
+        ----------
+        key : RecordKey
+            (year, term, code) key of the class.
+        """
+        doc_id = self.__key_docs.pop(key, None)
+        if doc_id is None:
+            return
+        if self.__doc_terms is None:
+            self.__rebuild_doc_terms()
+        for term in self.__doc_terms.pop(doc_id):
+            posting = self.__postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.__postings[term]
+        self.__total_length -= self.__doc_lengths.pop(doc_id)
+        del self.__doc_keys[doc_id]
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[RecordKey, float]]:
+        """
+        Get the classes that best match a query.
+
+        Parameters
+        ----------
+        query : str
+            Search text (ex) '머신러닝', 'deep learning').
+        limit : int, optional
+            Maximum number of results (default is 10).
+
+        Returns
+        -------
+        list[tuple[RecordKey, float]]
+            (key, BM25 score) pairs, best first.
+        """
+        doc_count = len(self.__doc_keys)
+        if doc_count == 0:
+            return []
+        average_length = self.__total_length / doc_count
+
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query, ngram=self.ngram)):
+            posting = self.__postings.get(term)
+            if posting is None:
+                continue
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, count in posting.items():
+                norm = self.k1 * (1 - self.b + self.b * self.__doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.__doc_keys[doc_id], score) for doc_id, score in best]
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to a file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the index file.
+        """
+        state = {
+            'version': SyllabusSearchIndex.FORMAT_VERSION,
+            'ngram': self.ngram,
+            'k1': self.k1,
+            'b': self.b,
+            'doc_keys': {doc_id: tuple(key) for doc_id, key in self.__doc_keys.items()},
+            'doc_lengths': self.__doc_lengths,
+            'postings': self.__postings,
+        }
+        with open(path, "wb") as fw:
+            pickle.dump(state, fw, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> 'SyllabusSearchIndex':
+        """
+        Load an index saved with ``save``.
+
+        Only the postings are stored. The per document term lists used by updates are
+        rebuilt on the first update, so a read only worker never pays for them.
+
+        Parameters
+        ----------
+        path : str
+            Path of the index file.
+
+        Returns
+        -------
+        SyllabusSearchIndex
+            Loaded index.
+        """
+        with open(path, "rb") as fr:
+            state = pickle.load(fr)
+        if state.get('version') != SyllabusSearchIndex.FORMAT_VERSION:
+            raise ValueError(f"unsupported index version : {state.get('version')}")
+
+        index = cls(ngram=state['ngram'], k1=state['k1'], b=state['b'])
+        index.__postings = state['postings']
+        index.__doc_lengths = state['doc_lengths']
+        index.__doc_keys = {doc_id: RecordKey(*key) for doc_id, key in state['doc_keys'].items()}
+        index.__key_docs = {key: doc_id for doc_id, key in index.__doc_keys.items()}
+        index.__total_length = sum(index.__doc_lengths.values())
+        index.__next_doc = max(index.__doc_keys, default=-1) + 1
+        index.__doc_terms = None
+        return index
+
+    def __rebuild_doc_terms(self) -> None:
+        """
+        Rebuild the per document term lists from the postings.
+        """
+        doc_terms: dict[int, dict[str, int]] = {doc_id: {} for doc_id in self.__doc_keys}
+        for term, posting in self.__postings.items():
+            for doc_id, count in posting.items():
+                doc_terms[doc_id][term] = count
+        self.__doc_terms = doc_terms
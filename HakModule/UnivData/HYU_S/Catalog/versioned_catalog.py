@@ -0,0 +1,370 @@
+import os
+import json
+import bisect
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import (RecordKey, get_record_key, load_catalog_file,
+                                                           parse_catalog_file_name)
+
+# data is None when the class disappeared from a rescrape
+RecordVersion = namedtuple('RecordVersion', ['version', 'data'])
+CatalogChange = namedtuple('CatalogChange', ['key', 'version', 'data'])
+
+
+class VersionedCatalog:
+    """
+    Catalog that merges scraper outputs by (year, term, code) and keeps a version history per class.
+
+    Every merge that changes something creates a new catalog version, and ``changes_since``
+    returns what changed after a version so consumers can catch up without reloading everything.
+
+    Attributes
+    ----------
+    language : str
+        Language of the merged scrapes ('ko' or 'en').
+    history_limit : int, optional
+        Number of versions kept per class (None keeps every version).
+    version : int
+        Current catalog version (0 is empty).
+
+    Methods
+    -------
+    upsert(data)
+        Insert or update a class data.
+    remove(key)
+        Mark a class as removed.
+    merge_datas(datas, year=None, term=None, code_range=None)
+        Merge class datas as one new version.
+    merge_file(path, remove_missing=True)
+        Merge a scraped json file.
+    merge_dir(dir_path, remove_missing=True)
+        Merge every scraped json file of a directory, oldest first.
+    get(key)
+        Get the current class data.
+    get_history(key)
+        Get the versions of a class.
+    changes_since(version)
+        Get the classes changed after a version.
+    save(path)
+        Save the catalog to a json file.
+    load(path)
+        Load a catalog from a json file.
+    """
+    def __init__(self, language: str = 'ko', history_limit: Optional[int] = None):
+        """
+        Initialize the VersionedCatalog.
+
+        Parameters
+        ----------
+        language : str, optional
+            Language of the merged scrapes (default is 'ko').
+        history_limit : int, optional
+            Number of versions kept per class (default is None, keep every version).
+        """
+        self.language: str = language
+        self.history_limit: Optional[int] = history_limit
+        self.version: int = 0
+
+        self.__records: dict[RecordKey, list[RecordVersion]] = {}
+        self.__log_versions: list[int] = []
+        self.__log_keys: list[RecordKey] = []
+        self.__pending: bool = False
+
+    def __len__(self) -> int:
+        return sum(1 for versions in self.__records.values() if versions[-1].data is not None)
+
+    def __begin(self) -> int:
+        """
+        Get the version that the next change will be written to.
+        """
+        if not self.__pending:
+            self.__pending = True
+            self.version += 1
+        return self.version
+
+    def __commit(self) -> None:
+        self.__pending = False
+
+    def __write(self, key: RecordKey, data: Optional[dict]) -> bool:
+        """
+        Append a version of a class if it differs from the current one.
+        """
+        versions = self.__records.get(key)
+        current = None if versions is None else versions[-1].data
+        if current == data:
+            return False
+        version = self.__begin()
+        if versions is None:
+            versions = self.__records[key] = []
+        if versions and versions[-1].version == version:
+            versions[-1] = RecordVersion(version, data)
+        else:
+            versions.append(RecordVersion(version, data))
+        if self.history_limit is not None and len(versions) > self.history_limit:
+            del versions[:len(versions) - self.history_limit]
+        self.__log_versions.append(version)
+        self.__log_keys.append(key)
+        return True
+
+    def upsert(self, data: dict) -> bool:
+        """
+        Insert or update a class data as a single change.
+
+        Parameters
+        ----------
+        data : dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+
+        Returns
+        -------
+        bool
+            True if the catalog changed.
+        """
+        key = get_record_key(data)
+        if key is None:
+            return False
+        try:
+            return self.__write(key, data)
+        finally:
+            self.__commit()
+
+    def remove(self, key: RecordKey) -> bool:
+        """
+        Mark a class as removed.
+
+        Parameters
+        ----------
+        key : RecordKey
+            (year, term, code) key of the class.
+
+        Returns
+        -------
+        bool
+            True if the catalog changed.
+        """
+        if key not in self.__records:
+            return False
+        try:
+            return self.__write(key, None)
+        finally:
+            self.__commit()
+
+    def merge_datas(self,
+                    datas: Iterable[dict],
+                    year: Optional[int] = None,
+                    term: Optional[str] = None,
+                    code_range: Optional[tuple[int, int]] = None) -> int:
+        """
+        Merge class datas as one new version.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        year : int, optional
+            Scraped year. Needed with code_range.
+        term : str, optional
+            Scraped term (ex) 'second'). Needed with code_range.
+        code_range : tuple[int, int], optional
+            Scraped code range (start, end exclusive). Classes of that year and term in the range
+            that are missing from datas are marked as removed.
+
+        Returns
+        -------
+        int
+            Catalog version after the merge.
+        """
+        merged_keys: set[RecordKey] = set()
+        try:
+            for data in datas:
+                key = get_record_key(data)
+                if key is None:
+                    continue
+                merged_keys.add(key)
+                self.__write(key, data)
+
+            if code_range is not None:
+                start, end = code_range
+                for key, versions in list(self.__records.items()):
+                    if (key.year == year and key.term == term and start <= key.code < end
+                            and key not in merged_keys and versions[-1].data is not None):
+                        self.__write(key, None)
+        finally:
+            # the changes written before an error stay in their version, the next change gets a new one
+            self.__commit()
+        return self.version
+
+    def merge_file(self, path: str, remove_missing: bool = True) -> int:
+        """
+        Merge a scraped ``{name}_{year}_{term}_{lang}_{start}_{end}.json`` file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the scraped json file.
+        remove_missing : bool, optional
+            Mark classes in the scraped range that are missing from the file as removed (default is True).
+
+        Returns
+        -------
+        int
+            Catalog version after the merge.
+        """
+        file_info = parse_catalog_file_name(path)
+        if file_info is not None and file_info.language != self.language:
+            raise ValueError(f"language mismatch ({file_info.language} != {self.language}) : {path}")
+        if file_info is None or not remove_missing:
+            return self.merge_datas(load_catalog_file(path))
+        return self.merge_datas(
+            load_catalog_file(path),
+            year=file_info.year,
+            term=file_info.term,
+            code_range=(file_info.start, file_info.end)
+        )
+
+    def merge_dir(self, dir_path: str, remove_missing: bool = True) -> int:
+        """
+        Merge every scraped json file of a directory, oldest file first.
+
+        Parameters
+        ----------
+        dir_path : str
+            Directory of scraped json files (ex) ./HakFile/UnivData/HYU_S).
+        remove_missing : bool, optional
+            Mark classes in the scraped ranges that are missing from the files as removed (default is True).
+
+        Returns
+        -------
+        int
+            Catalog version after the merge.
+        """
+        paths = [os.path.join(dir_path, file_name)
+                 for file_name in os.listdir(dir_path)
+                 if file_name.endswith('.json')]
+        paths.sort(key=lambda path: (os.path.getmtime(path), path))
+        for path in paths:
+            file_info = parse_catalog_file_name(path)
+            if file_info is not None and file_info.language != self.language:
+                continue
+            self.merge_file(path, remove_missing=remove_missing)
+        return self.version
+
+    def get(self, key: RecordKey) -> Optional[dict]:
+        """
+        Get the current class data.
+
+        Parameters
+        ----------
+        key : RecordKey
+            (year, term, code) key of the class.
+
+        Returns
+        -------
+        dict or None
+            Class data, or None if the class is unknown or removed.
+        """
+        versions = self.__records.get(key)
+        if versions is None:
+            return None
+        return versions[-1].data
+
+    def get_history(self, key: RecordKey) -> list[RecordVersion]:
+        """
+        Get the kept versions of a class, oldest first.
+
+        Parameters
+        ----------
+        key : RecordKey
+            (year, term, code) key of the class.
+
+        Returns
+        -------
+        list[RecordVersion]
+            (version, data) pairs. data is None for a removal.
+        """
+        return list(self.__records.get(key, []))
+
+    def iter_datas(self) -> Iterator[dict]:
+        """
+        Iterate over the current class datas.
+
+        Yields
+        ------
+        dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+        """
+        for versions in self.__records.values():
+            if versions[-1].data is not None:
+                yield versions[-1].data
+
+    def changes_since(self, version: int) -> list[CatalogChange]:
+        """
+        Get the classes changed after a version.
+
+        Parameters
+        ----------
+        version : int
+            Version the consumer already has (0 for everything).
+
+        Returns
+        -------
+        list[CatalogChange]
+            One (key, version, data) change per class with its latest state, in change order.
+            data is None if the class was removed.
+        """
+        first = bisect.bisect_right(self.__log_versions, version)
+        latest: dict[RecordKey, None] = {}
+        for key in self.__log_keys[first:]:
+            latest.pop(key, None)
+            latest[key] = None
+        result = []
+        for key in latest:
+            record_version = self.__records[key][-1]
+            result.append(CatalogChange(key, record_version.version, record_version.data))
+        return result
+
+    def save(self, path: str) -> None:
+        """
+        Save the catalog to a json file.
+
+        Parameters
+        ----------
+        path : str
+            Path of the catalog file.
+        """
+        state = {
+            'language': self.language,
+            'history_limit': self.history_limit,
+            'version': self.version,
+            'records': [[list(key), [[record_version.version, record_version.data] for record_version in versions]]
+                        for key, versions in self.__records.items()],
+            'log': [[version, list(key)] for version, key in zip(self.__log_versions, self.__log_keys)],
+        }
+        with open(path, "w", encoding='UTF-8') as file:
+            json.dump(state, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'VersionedCatalog':
+        """
+        Load a catalog saved with ``save``.
+
+        Parameters
+        ----------
+        path : str
+            Path of the catalog file.
+
+        Returns
+        -------
+        VersionedCatalog
+            Loaded catalog.
+        """
+        with open(path, "r", encoding='UTF-8') as file:
+            state = json.load(file)
+        catalog = cls(language=state['language'], history_limit=state['history_limit'])
+        catalog.version = state['version']
+        catalog.__records = {RecordKey(*key): [RecordVersion(version, data) for version, data in versions]
+                             for key, versions in state['records']}
+        catalog.__log_versions = [version for version, _ in state['log']]
+        catalog.__log_keys = [RecordKey(*key) for _, key in state['log']]
+        return catalog
@@ -16,6 +16,7 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
 from HakModule.Google.Selenium.SimpleDriver import SimpleDriver
 from HakModule.Google.Selenium.SimpleElementFinder import SimpleElementFinder
+from HakModule.UnivData.HYU_S.Catalog.records import ClassRecord
 
 
 class HYUSeoulClassUrl:
@@ -105,6 +106,8 @@ class HYUSeoulClassData(SimpleElementFinder):
     -------
     clear_web_element()
         Clear the web element.
+    to_record()
+        Convert the class data to a slotted ClassRecord.
     convert_data(check_course_info=True, check_instructor=True, ...)
         Convert class data based on given flags.
     check_valid_class_data()
@@ -154,6 +157,17 @@ class HYUSeoulClassData(SimpleElementFinder):
         """
         self.full_web_element = None
 
+    def to_record(self) -> ClassRecord:
+        """
+        Convert the class data to a slotted ClassRecord.
+
+        Returns
+        -------
+        ClassRecord
+            Record that uses much less memory than the nested OrderedDicts.
+        """
+        return ClassRecord.from_dict(self.datas)
+
     def convert_data(self,
                      check_course_info: bool = True,
                      check_instructor: bool = True,
@@ -1,6 +1,7 @@
 import pprint
+import re
 import time
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options
@@ -11,6 +12,97 @@ from selenium.webdriver.support.wait import WebDriverWait
 from HakModule.Google.Selenium.SimpleDriver import SimpleDriver
 from HakModule.Google.Selenium.SimpleElementFinder import *
 
+# day is the column index (0 is Monday), start/end are minutes from midnight. they are None for untimed classes
+EverytimeBlock = namedtuple('EverytimeBlock', ['name', 'instructor', 'place', 'day', 'start', 'end'])
+
+# reads every block of a tablebody in one call: texts, day column and css position
+TABLE_BODY_SCRIPT: str = """
+const body = arguments[0];
+const hours = Array.from(body.querySelectorAll('.times .time'));
+const columns = Array.from(body.querySelectorAll('td'));
+const text = (element, selector) => {
+    const found = element.querySelector(selector);
+    return found === null ? null : found.textContent.trim();
+};
+const blocks = [];
+body.querySelectorAll('.subject').forEach(subject => {
+    const column = subject.closest('td');
+    blocks.push({
+        timed: subject.querySelector('.name') === null,
+        name: text(subject, '.name') || text(subject, 'h3'),
+        instructor: text(subject, 'em'),
+        place: text(subject, 'span'),
+        column: column === null ? -1 : columns.indexOf(column),
+        top: parseFloat(subject.style.top || subject.offsetTop),
+        height: parseFloat(subject.style.height || subject.offsetHeight),
+    });
+});
+return {
+    hour_label: hours.length > 0 ? hours[0].textContent.trim() : null,
+    hour_height: hours.length > 0 ? hours[0].getBoundingClientRect().height : null,
+    blocks: blocks,
+};
+"""
+
+HOUR_PATTERN = re.compile(r"\d+")
+
+
+def parse_hour_label(label: Optional[str], default: int = 9) -> int:
+    """
+    Convert the first hour label of the table (ex) '9', '오전 9시', '오후 1시') to an hour.
+
+    Parameters
+    ----------
+    label : str, optional
+        Hour label text.
+    default : int, optional
+        Hour used when the label can not be read, by default 9.
+
+    Returns
+    -------
+    int
+        Hour in 24 hour format.
+    """
+    if not label:
+        return default
+    found = HOUR_PATTERN.search(label)
+    if found is None:
+        return default
+    hour = int(found.group())
+    if ('오후' in label or 'pm' in label.lower()) and hour < 12:
+        hour += 12
+    return hour
+
+
+def position_to_minutes(top: float, height: float, start_hour: int, hour_height: float,
+                        minute_step: int = 5) -> tuple[int, int]:
+    """
+    Convert the css position of a block to start and end minutes.
+
+    Parameters
+    ----------
+    top : float
+        Top of the block in pixels from the first hour.
+    height : float
+        Height of the block in pixels.
+    start_hour : int
+        Hour of the first row.
+    hour_height : float
+        Height of one hour in pixels.
+    minute_step : int, optional
+        Times are rounded to this step, by default 5.
+
+    Returns
+    -------
+    tuple[int, int]
+        Start and end minutes from midnight.
+    """
+    def to_minute(position: float) -> int:
+        minute = start_hour * 60 + position / hour_height * 60
+        return int(round(minute / minute_step) * minute_step)
+
+    return to_minute(top), to_minute(top + height)
+
 
 class EverytimeScheduleData(SimpleElementFinder):
     def __init__(self, table_body_data: WebElement = None):
@@ -24,6 +116,7 @@ class EverytimeScheduleData(SimpleElementFinder):
         """
         super(EverytimeScheduleData, self).__init__(table_body_data)
         self.classroom_datas = []
+        self.__name_indexes: dict[str, int] = {}
 
     def convert_data(self):
         """
@@ -32,6 +125,57 @@ class EverytimeScheduleData(SimpleElementFinder):
         for classroom_element in self.find_elements_safe(by=By.CLASS_NAME, value="subject"):
             self.add_classroom_data(classroom_element)
 
+    def read_blocks(self, default_hour_height: float = 60) -> list[EverytimeBlock]:
+        """
+        Read every block of the table body with a single script call.
+
+        Parameters
+        ----------
+        default_hour_height : float, optional
+            Height of one hour in pixels when the table has no hour labels, by default 60.
+
+        Returns
+        -------
+        list[EverytimeBlock]
+            Blocks in page order, with their day and start/end minutes.
+            Empty if there is no table body, like ``find_elements_safe``.
+        """
+        if self.full_web_element is None:
+            return []
+        table = self.full_web_element.parent.execute_script(TABLE_BODY_SCRIPT, self.full_web_element)
+        if table is None:
+            return []
+        start_hour = parse_hour_label(table['hour_label'])
+        hour_height = table['hour_height'] or default_hour_height
+        blocks = []
+        for block in table['blocks']:
+            if not block['timed'] or block['column'] < 0:
+                blocks.append(EverytimeBlock(block['name'], None, None, None, None, None))
+                continue
+            start, end = position_to_minutes(block['top'], block['height'], start_hour, hour_height)
+            blocks.append(EverytimeBlock(block['name'], block['instructor'], block['place'],
+                                         block['column'], start, end))
+        return blocks
+
+    def convert_data_by_script(self):
+        """
+        Convert the table body into structured classroom data with a single script call.
+
+        The 'times' of timed classroom datas get the day and start/end minutes of every block.
+        """
+        for block in self.read_blocks():
+            classroom_data = OrderedDict([])
+            classroom_data['timed']: bool = block.day is not None
+            classroom_data['name']: str = block.name
+            if not classroom_data['timed']:
+                self.merge_classroom_data(classroom_data)
+                continue
+            classroom_data['instructor']: str = block.instructor
+            classroom_data['place']: str = block.place
+            self.merge_classroom_data(classroom_data, OrderedDict([
+                ('day', block.day), ('start', block.start), ('end', block.end), ('place', block.place)
+            ]))
+
     def add_classroom_data(self, element: WebElement = None):
         """
         Add classroom data to the list of classroom datas.
@@ -50,8 +194,38 @@ class EverytimeScheduleData(SimpleElementFinder):
             classroom_data['name']: str = self.find_text_data(target=element, by=By.TAG_NAME, value="h3")
             classroom_data['instructor']: str = self.find_text_data(target=element, by=By.TAG_NAME, value="em")
             classroom_data['place']: str = self.find_text_data(target=element, by=By.TAG_NAME, value="span")
-        if classroom_data['name'] not in [data['name'] for data in self.classroom_datas]:
+        if not classroom_data['timed']:
+            self.merge_classroom_data(classroom_data)
+            return
+        # the element path does not read the block position
+        self.merge_classroom_data(classroom_data, OrderedDict([
+            ('day', None), ('start', None), ('end', None), ('place', classroom_data['place'])
+        ]))
+
+    def merge_classroom_data(self, classroom_data: OrderedDict, slot: Optional[OrderedDict] = None):
+        """
+        Add a classroom data, or merge it into the classroom data with the same name.
+
+        A class is drawn as one block per meeting, so repeated names are merged into one
+        classroom data whose 'times' keeps the slot of every block.
+
+        Parameters
+        ----------
+        classroom_data : OrderedDict
+            Classroom data of one block.
+        slot : OrderedDict, optional
+            Slot of the block ('day', 'start', 'end', 'place') for timed classes.
+        """
+        index = self.__name_indexes.get(classroom_data['name'])
+        if index is None:
+            self.__name_indexes[classroom_data['name']] = len(self.classroom_datas)
+            if classroom_data['timed']:
+                classroom_data['times'] = []
             self.classroom_datas.append(classroom_data)
+        else:
+            classroom_data = self.classroom_datas[index]
+        if slot is not None and 'times' in classroom_data and slot not in classroom_data['times']:
+            classroom_data['times'].append(slot)
 
 
 class EverytimeToText(SimpleDriver):
@@ -88,7 +262,8 @@ class EverytimeToText(SimpleDriver):
         """
         self.options.add_argument("--headless=new")
 
-    def code_to_classroom_data(self, code: str = '') -> Optional[EverytimeScheduleData]:
+    def code_to_classroom_data(self, code: str = '', timeout: float = 2,
+                               by_script: bool = True) -> Optional[EverytimeScheduleData]:
         """
         Convert a code to classroom data.
 
@@ -96,15 +271,20 @@ class EverytimeToText(SimpleDriver):
         ----------
         code : str, optional
             The code to convert.
+        timeout : float, optional
+            Seconds to wait for the timetable, by default 2.
+        by_script : bool, optional
+            Read the table with one script call (with day and time), by default True.
 
         Returns
         -------
         EverytimeScheduleData or None
             An instance of EverytimeScheduleData containing classroom data.
         """
-        return self.url_to_classroom_data(f"https://everytime.kr/@{code}")
+        return self.url_to_classroom_data(f"https://everytime.kr/@{code}", timeout=timeout, by_script=by_script)
 
-    def url_to_classroom_data(self, url: str = '') -> Optional[EverytimeScheduleData]:
+    def url_to_classroom_data(self, url: str = '', timeout: float = 2,
+                              by_script: bool = True) -> Optional[EverytimeScheduleData]:
         """
         Convert a URL to classroom data.
 
@@ -112,6 +292,11 @@ class EverytimeToText(SimpleDriver):
         ----------
         url : str, optional
             The URL to convert.
+        timeout : float, optional
+            Seconds to wait for the timetable, by default 2.
+        by_script : bool, optional
+            Read the table with one script call (with day and time) instead of
+            one WebDriver call per element, by default True.
 
         Returns
         -------
@@ -120,7 +305,7 @@ class EverytimeToText(SimpleDriver):
         """
         self.driver.get(url)
         try:
-            WebDriverWait(self.driver, 2).until(
+            WebDriverWait(self.driver, timeout).until(
                 WebEC.presence_of_element_located((By.CLASS_NAME, "tablebody"))  # thinking
             )
         except TimeoutException:
@@ -131,7 +316,10 @@ class EverytimeToText(SimpleDriver):
             schedule_data = EverytimeScheduleData(
                 self.get_classroom_element()
             )
-            schedule_data.convert_data()
+            if by_script:
+                schedule_data.convert_data_by_script()
+            else:
+                schedule_data.convert_data()
             return schedule_data
 
     def get_classroom_element(self, element: WebElement = None) -> Optional[WebElement]:
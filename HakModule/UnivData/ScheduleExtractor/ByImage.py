@@ -3,23 +3,79 @@ Currently a Work-in-Progress (WIP) due to lower recognition accuracy.
 Pausing for improvements.
 """
 # TODO: Address the low recognition accuracy issue and improve the text extraction process.
-from colorthief import ColorThief
 from collections import namedtuple
+from typing import Optional, Sequence
 import pytesseract
 import cv2
 import numpy as np
 import os
+import time
 
 import pprint
 
+from HakModule.UnivData.ScheduleExtractor.OCREngine import OCRConfig, OCRWorkerPool, build_tesseract_config
+
 ImageBox2D = namedtuple('ImageBox2D', ['x', 'y', 'w', 'h'])
 ColorRGB = namedtuple('ColorRGB', ['r', 'g', 'b'])
 
 
+def extract_palette(image: np.ndarray, color_count: int = 120, quality: int = 10,
+                    bits: int = 5, ignore_white: bool = True) -> list[ColorRGB]:
+    """
+    Extract the dominant colors of a decoded BGR image.
+
+    Pixels are sampled every ``quality`` pixels (same meaning as ColorThief's quality), quantized to
+    ``bits`` bits per channel and counted with one histogram. Each palette color is the mean of the
+    pixels in its histogram bin.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Input image in BGR (cv2.imread) format.
+    color_count : int, optional
+        Maximum number of colors in the palette, by default 120.
+    quality : int, optional
+        Sampling step over the pixels (1 uses every pixel), by default 10.
+    bits : int, optional
+        Bits kept per channel when quantizing, by default 5.
+    ignore_white : bool, optional
+        Whether to skip almost white pixels (all channels > 250) like ColorThief, by default True.
+
+    Returns
+    -------
+    list of ColorRGB
+        Palette colors in RGB, most frequent first.
+
+    """
+    pixels = image.reshape(-1, 3)[::max(1, quality)]
+    if ignore_white:
+        pixels = pixels[~np.all(pixels > 250, axis=1)]
+    if len(pixels) == 0:
+        return []
+    pixels = pixels[:, ::-1].astype(np.int64)  # BGR -> RGB
+
+    shift = 8 - bits
+    bins = (pixels[:, 0] >> shift) << (2 * bits) | (pixels[:, 1] >> shift) << bits | (pixels[:, 2] >> shift)
+    bin_size = 1 << (3 * bits)
+    counts = np.bincount(bins, minlength=bin_size)
+    sums = np.stack([np.bincount(bins, weights=pixels[:, channel], minlength=bin_size) for channel in range(3)],
+                    axis=1)
+
+    used_bins = np.flatnonzero(counts)
+    if len(used_bins) > color_count:
+        used_bins = used_bins[np.argpartition(counts[used_bins], -color_count)[-color_count:]]
+    used_bins = used_bins[np.argsort(-counts[used_bins], kind='stable')]
+    means = np.rint(sums[used_bins] / counts[used_bins, None]).astype(int)
+    return [ColorRGB(int(r), int(g), int(b)) for r, g, b in means]
+
+
 def filter_colors(colors: list[ColorRGB], limit: int = 50) -> list[ColorRGB]:
     """
     Filter a list of RGB colors based on a limit.
 
+    A color is kept if it is at least ``limit`` away from every color kept before it.
+    The pairwise distances are computed once as a matrix.
+
     Parameters
     ----------
     colors : list of ColorRGB
@@ -33,15 +89,19 @@ def filter_colors(colors: list[ColorRGB], limit: int = 50) -> list[ColorRGB]:
         Filtered list of RGB colors.
 
     """
+    if len(colors) == 0:
+        return []
+    color_array = np.asarray(colors, dtype=np.int64).reshape(-1, 3)
+    differences = color_array[:, None, :] - color_array[None, :, :]
+    is_close = (differences ** 2).sum(axis=2) < limit * limit
+
+    is_removed = np.zeros(len(color_array), dtype=bool)
     result = []
-    for r_one, g_one, b_one in colors:
-        can_add_result: bool = True
-        for r_two, g_two, b_two in result:
-            if ((r_one - r_two) ** 2 + (g_one - g_two) ** 2 + (b_one - b_two) ** 2) < limit * limit:
-                can_add_result = False
-                break
-        if can_add_result:
-            result.append(ColorRGB(r_one, g_one, b_one))
+    for index, (r, g, b) in enumerate(color_array):
+        if is_removed[index]:
+            continue
+        result.append(ColorRGB(int(r), int(g), int(b)))
+        is_removed |= is_close[index]
     return result
 
 
@@ -86,59 +146,129 @@ def show_color_palette(colors: list[ColorRGB], wait: bool = True, size: int = 70
         cv2.destroyAllWindows()
 
 
-def get_contour_boxes_by_color(image, rgb_color) -> list[ImageBox2D]:
+def get_hue_range(rgb_color) -> tuple[int, int]:
     """
-    Given an image and RGB color, find contours based on the color and return the bounding boxes.
+    Get the hue range (inclusive) used to segment an RGB color.
 
-    Parameters:
-    - image: Input image
-    - rgb_color: Target RGB color for contour detection
+    The lower bound wraps like the original uint8 arithmetic, so colors with hue < 20 give an
+    empty range (lower > upper).
+
+    Parameters
+    ----------
+    rgb_color : ColorRGB
+        Target RGB color.
+
+    Returns
+    -------
+    tuple[int, int]
+        Lower and upper hue (OpenCV 0~179 scale).
 
-    Returns:
-    - List of bounding boxes [(x1, y1, w1, h1), (x2, y2, w2, h2), ...]
     """
+    hue = int(cv2.cvtColor(np.uint8([[list(rgb_color)]]), cv2.COLOR_RGB2HSV)[0][0][0])
+    return (hue - 20) % 256, hue + 20
 
-    # Convert the given RGB color to HSV for better color segmentation
-    hsv_color = cv2.cvtColor(np.uint8([[list(rgb_color)]]), cv2.COLOR_RGB2HSV)[0][0]
 
-    # Masking image based on the given color
-    lower_bound = np.array([hsv_color[0] - 20, 50, 50])
-    upper_bound = np.array([hsv_color[0] + 20, 255, 255])
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, lower_bound, upper_bound)
+def get_contour_boxes_by_mask(mask, min_area: float = 5000) -> list[ImageBox2D]:
+    """
+    Find external contours of a binary mask and return their bounding boxes.
 
-    # Finding contours
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Binary (0 or 255) mask.
+    min_area : float, optional
+        Contours with an area not above this are skipped, by default 5000.
+
+    Returns
+    -------
+    list of ImageBox2D
+        Bounding boxes of the contours.
+
+    """
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
     bounding_boxes = []
     for contour in contours:
-        if cv2.contourArea(contour) > 5000:  # Filtering small contours
+        if cv2.contourArea(contour) > min_area:  # Filtering small contours
             x, y, w, h = cv2.boundingRect(contour)
             bounding_boxes.append(ImageBox2D(x, y, w, h))
-
     return bounding_boxes
 
 
-def get_contour_boxes_by_colors(image, colors: list[ColorRGB]) -> list[tuple[ColorRGB, list[ImageBox2D]]]:
+def get_contour_boxes_by_color(image, rgb_color) -> list[ImageBox2D]:
+    """
+    Given an image and RGB color, find contours based on the color and return the bounding boxes.
+
+    Parameters:
+    - image: Input image
+    - rgb_color: Target RGB color for contour detection
+
+    Returns:
+    - List of bounding boxes [(x1, y1, w1, h1), (x2, y2, w2, h2), ...]
+    """
+    return get_contour_boxes_by_colors(image, [rgb_color])[0][1]
+
+
+def get_contour_boxes_by_colors(image, colors: list[ColorRGB], min_area: float = 5000,
+                                detect_scale: float = 1.0) -> list[tuple[ColorRGB, list[ImageBox2D]]]:
     """
     Find contours based on specified colors in the image and return the corresponding bounding boxes.
 
+    The image is converted to HSV once and the saturation/value condition is shared by every color.
+    A hue histogram of the valid pixels skips colors whose hue range has no pixel, and colors with
+    the same hue range reuse one contour search.
+
+    With ``detect_scale`` below 1, pixels are still classified at full resolution and only the
+    masks are downscaled: a downscaled pixel is valid only if all the pixels it covers are, so
+    the 1 px gaps between blocks keep splitting them (downscaling the image itself blends the
+    gaps away and merges neighbouring blocks).
+
     Parameters
     ----------
     image : numpy.ndarray
         Input image in NumPy array format.
     colors : list of ColorRGB
         List of RGB colors to be used for contour detection.
+    min_area : float, optional
+        Contours with an area not above this (in original image pixels) are skipped, by default 5000.
+    detect_scale : float, optional
+        Resize factor of the masks that contours are searched on, by default 1.0.
 
     Returns
     -------
     list of tuple[ColorRGB, list[ImageBox2D]]
-        List of tuples containing RGB color and corresponding image boxes.
+        List of tuples containing RGB color and corresponding image boxes (original image coordinates).
 
     """
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hue = cv2.extractChannel(hsv, 0)
+    # a 3 channel range on the whole image is several times faster than a range on the hsv[:, :, 1:] view
+    valid_mask = cv2.inRange(hsv, np.array([0, 50, 50]), np.array([255, 255, 255]))
+    if detect_scale != 1.0:
+        valid_mask = cv2.resize(valid_mask, dsize=(0, 0), fx=detect_scale, fy=detect_scale,
+                                interpolation=cv2.INTER_AREA)
+        valid_mask = cv2.compare(valid_mask, 255, cv2.CMP_EQ)
+        hue = cv2.resize(hue, dsize=(valid_mask.shape[1], valid_mask.shape[0]), interpolation=cv2.INTER_NEAREST)
+        min_area = min_area * detect_scale * detect_scale
+
+    hue_count = np.bincount(hue[valid_mask > 0], minlength=256)
+    hue_cumulative = np.concatenate([[0], np.cumsum(hue_count)])
+
+    boxes_by_range: dict[tuple[int, int], list[ImageBox2D]] = {}
     result = []
     for color in colors:
-        result.append((color, get_contour_boxes_by_color(image, color)))
+        lower_hue, upper_hue = get_hue_range(color)
+        hue_range = (lower_hue, upper_hue)
+        if hue_range not in boxes_by_range:
+            if lower_hue > upper_hue or hue_cumulative[min(upper_hue, 255) + 1] == hue_cumulative[lower_hue]:
+                boxes_by_range[hue_range] = []
+            else:
+                mask = cv2.bitwise_and(cv2.inRange(hue, lower_hue, upper_hue), valid_mask)
+                boxes = get_contour_boxes_by_mask(mask, min_area=min_area)
+                if detect_scale != 1.0:
+                    boxes = scale_boxes(boxes, detect_scale, image.shape)
+                boxes_by_range[hue_range] = boxes
+        result.append((color, list(boxes_by_range[hue_range])))
     return result
 
 
@@ -165,6 +295,36 @@ def draw_boxes_on_image_by_color(image, rgb_color, box_color=(255, 0, 0), paint_
     return paint_image
 
 
+def scale_boxes(boxes: list[ImageBox2D], scale: float, image_shape: tuple = None) -> list[ImageBox2D]:
+    """
+    Map boxes found on a resized image back to the original image.
+
+    Parameters
+    ----------
+    boxes : list of ImageBox2D
+        Boxes on the resized image.
+    scale : float
+        Resize factor that was used (resized = original * scale).
+    image_shape : tuple, optional
+        Shape of the original image. If given, boxes are clipped to it.
+
+    Returns
+    -------
+    list of ImageBox2D
+        Boxes in original image coordinates.
+
+    """
+    result = []
+    for x, y, w, h in boxes:
+        left, top = int(round(x / scale)), int(round(y / scale))
+        right, bottom = int(round((x + w) / scale)), int(round((y + h) / scale))
+        if image_shape is not None:
+            left, top = max(0, left), max(0, top)
+            right, bottom = min(image_shape[1], right), min(image_shape[0], bottom)
+        result.append(ImageBox2D(left, top, right - left, bottom - top))
+    return result
+
+
 def calculate_overlap(box1: ImageBox2D, box2: ImageBox2D) -> float:
     """
     Calculate the overlap ratio between two image boxes.
@@ -202,6 +362,10 @@ def remove_overlapping_boxes(boxes: list[ImageBox2D], overlap_threshold: float =
     """
     Remove overlapping boxes from the given list of image boxes.
 
+    Boxes are visited in the given order, and a box is kept if its overlap ratio (see
+    ``calculate_overlap``) with every box kept before it is below the threshold. Each kept box is
+    compared with all the remaining boxes at once with NumPy.
+
     Parameters
     ----------
     boxes : list of ImageBox2D
@@ -215,17 +379,28 @@ def remove_overlapping_boxes(boxes: list[ImageBox2D], overlap_threshold: float =
         List of image boxes with overlapping boxes removed.
 
     """
+    if len(boxes) == 0:
+        return []
+    box_array = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x1, y1 = box_array[:, 0], box_array[:, 1]
+    x2, y2 = x1 + box_array[:, 2], y1 + box_array[:, 3]
+    areas = box_array[:, 2] * box_array[:, 3]
+
+    is_removed = np.zeros(len(box_array), dtype=bool)
     valid_boxes = []
-    for index_box, box in enumerate(boxes):
-        is_valid = True
-        for index_valid_box, valid_box in enumerate(valid_boxes):
-            if index_box != index_valid_box:
-                overlap_ratio = calculate_overlap(box, valid_box)
-                if overlap_ratio >= overlap_threshold:
-                    is_valid = False
-                    break
-        if is_valid:
-            valid_boxes.append(box)
+    for index, box in enumerate(boxes):
+        if is_removed[index]:
+            continue
+        valid_boxes.append(box)
+
+        rest = slice(index + 1, None)
+        width = np.minimum(x2[index], x2[rest]) - np.maximum(x1[index], x1[rest])
+        height = np.minimum(y2[index], y2[rest]) - np.maximum(y1[index], y1[rest])
+        intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+        min_area = np.minimum(areas[index], areas[rest])
+        overlap_ratio = np.divide(intersection, min_area,
+                                  out=np.zeros(len(min_area), dtype=float), where=intersection > 0)
+        is_removed[rest] |= overlap_ratio >= overlap_threshold
 
     return valid_boxes
 
@@ -247,8 +422,7 @@ def show_palette_and_image(path: str):
     image = cv2.imread(path)
     small_image = cv2.resize(image, dsize=(0, 0), fx=resize, fy=resize)
 
-    colorthief = ColorThief(path)
-    palettes = colorthief.get_palette(color_count=120, quality=100)
+    palettes = extract_palette(image, color_count=120, quality=100)
     palettes = filter_colors(palettes, limit=50)
     # show_color_palette(palettes, wait=False, size=70, x_length=7)
 
@@ -289,7 +463,9 @@ def preprocess_image(image):
     return threshold_image
 
 
-def extract_text_from_image(image, boxes, lang: str = 'kor+eng', show_image: bool = False):
+def extract_text_from_image(image, boxes, lang: str = 'kor+eng', show_image: bool = False,
+                            ocr_pool: Optional[OCRWorkerPool] = None,
+                            configs: Optional[Sequence[Optional[OCRConfig]]] = None):
     """
     Extract text from image using Tesseract OCR for the specified boxes.
 
@@ -303,6 +479,10 @@ def extract_text_from_image(image, boxes, lang: str = 'kor+eng', show_image: boo
         Tesseract OCR language(s), by default 'kor+eng'.
     show_image : bool
         show image by default False.
+    ocr_pool : OCRWorkerPool, optional
+        Pool of long-lived OCR workers. If None, tesseract is run once per box, by default None.
+    configs : Sequence of OCRConfig, optional
+        Page segmentation mode and whitelist for every box, by default None.
 
     Returns
     -------
@@ -310,23 +490,25 @@ def extract_text_from_image(image, boxes, lang: str = 'kor+eng', show_image: boo
         List of extracted texts corresponding to the specified boxes.
 
     """
-    extracted_texts = []
+    if configs is None:
+        configs = [None] * len(boxes)
     images = []
     for box in boxes:
         x, y, w, h = box
         cropped_image = image[y:y + h, x:x + w]
 
         # Preprocess the cropped image
-        preprocessed_image = preprocess_image(cropped_image)
+        images.append(preprocess_image(cropped_image))
 
-        # Extract text using Tesseract OCR
-        extracted_text = pytesseract.image_to_string(preprocessed_image, lang=lang)
-        if show_image:
-            images.append(preprocessed_image)
-        # Remove spaces and newlines from the extracted text
-        processed_text = extracted_text.replace(" ", "").replace("\n", "")
+    # Extract text using Tesseract OCR
+    if ocr_pool is not None:
+        raw_texts = ocr_pool.recognize(images, configs)
+    else:
+        raw_texts = [pytesseract.image_to_string(preprocessed_image, lang=lang, config=build_tesseract_config(config))
+                     for preprocessed_image, config in zip(images, configs)]
 
-        extracted_texts.append(processed_text)
+    # Remove spaces and newlines from the extracted text
+    extracted_texts = [extracted_text.replace(" ", "").replace("\n", "") for extracted_text in raw_texts]
     if show_image:
         show_resized_images_in_row(images, 120)
     return extracted_texts
@@ -368,7 +550,7 @@ def show_resized_images_in_row(image_list, target_width):
 
 class ImageToText:
 
-    def __init__(self, image_path: str):
+    def __init__(self, image_path: str = "", image: Optional[np.ndarray] = None):
         """
         Initialize an instance of TextInScheduleImage.
 
@@ -376,13 +558,17 @@ class ImageToText:
         ----------
         image_path : str
             Path to the input image.
+        image : numpy.ndarray, optional
+            Already decoded BGR image. If given, image_path is not read.
 
         """
         self.image_path: str = image_path
-        self.original_image: np.ndarray = cv2.imread(self.image_path)
+        self.original_image: np.ndarray = cv2.imread(self.image_path) if image is None else image
         self.colors: list[ColorRGB] = []
         self.boxes: list[ImageBox2D] = []
         self.texts: list[str] = []
+        self.corrections: list = []
+        self.timings: dict[str, float] = {}
 
     def clear(self):
         """
@@ -398,6 +584,8 @@ class ImageToText:
         self.colors.clear()
         self.boxes.clear()
         self.texts.clear()
+        self.corrections.clear()
+        self.timings.clear()
 
     def set_path(self, image_path: str):
         """
@@ -427,11 +615,12 @@ class ImageToText:
             box_overlap_threshold: float = 0.4,
             show_box_resize: float = 0.4,
             wait: bool = True,
+            detect_scale: float = 1.0,
     ):
         """
         Run the process of setting bounding boxes based on colors in the image.
 
-        This function extracts a color palette from the input image and then detects contours
+        This function extracts a color palette from the decoded image and then detects contours
         corresponding to each color in the palette. Bounding boxes are generated for the detected
         contours, and overlapping boxes are removed based on the specified overlap threshold.
 
@@ -440,7 +629,7 @@ class ImageToText:
         palette_color_count : int, optional
             Number of colors in the palette, by default 120.
         palette_color_quality : int, optional
-            Quality of color extraction from the palette, by default 100.
+            Pixel sampling step of the palette extraction, by default 100.
         filter_colors_limit : int, optional
             Threshold for filtering similar colors in the palette, by default 50.
         show_palette : bool, optional
@@ -455,28 +644,37 @@ class ImageToText:
             Resize factor for displaying bounding box image, by default 0.4.
         wait : bool, optional
             Whether to wait for a key press before closing windows, by default True.
+        detect_scale : float, optional
+            Resize factor of the color masks that contours are searched on, by default 1.0.
+            The palette and the pixel colors are still read at full resolution (see
+            ``get_contour_boxes_by_colors``) and boxes are in original image coordinates.
 
         Returns
         -------
         None
 
         """
-        colorthief = ColorThief(self.image_path)
+        start_time = time.perf_counter()
         self.colors = filter_colors(
-            colorthief.get_palette(color_count=palette_color_count, quality=palette_color_quality),
+            extract_palette(self.original_image, color_count=palette_color_count, quality=palette_color_quality),
             limit=filter_colors_limit
         )
+        self.timings['palette'] = time.perf_counter() - start_time
         if show_palette:
             show_color_palette(self.colors, wait=False)
 
+        start_time = time.perf_counter()
         self.boxes = []
-        color_boxes = get_contour_boxes_by_colors(self.original_image, self.colors)
+        color_boxes = get_contour_boxes_by_colors(self.original_image, self.colors, detect_scale=detect_scale)
         for color, boxes in color_boxes:
             self.boxes.extend(boxes)
+        self.timings['segmentation'] = time.perf_counter() - start_time
 
+        start_time = time.perf_counter()
         self.boxes.sort(key=lambda image_box: image_box.w * image_box.h)
 
         self.boxes = remove_overlapping_boxes(self.boxes, overlap_threshold=box_overlap_threshold)
+        self.timings['nms'] = time.perf_counter() - start_time
 
         if show_boxes:
             box_image = self.original_image.copy()
@@ -489,7 +687,7 @@ class ImageToText:
             cv2.waitKey(0)
             cv2.destroyAllWindows()
 
-    def run_get_texts(self, show_image=False):
+    def run_get_texts(self, show_image=False, ocr_pool: Optional[OCRWorkerPool] = None):
         """
         Run the process of extracting text from the image based on the defined boxes.
 
@@ -497,13 +695,38 @@ class ImageToText:
         ----------
         show_image : bool, optional
             Whether to display intermediate images, by default False.
+        ocr_pool : OCRWorkerPool, optional
+            Pool of long-lived OCR workers shared between images, by default None.
+
+        Returns
+        -------
+        None
+
+        """
+        start_time = time.perf_counter()
+        self.texts = extract_text_from_image(self.original_image, self.boxes, show_image=show_image,
+                                             ocr_pool=ocr_pool)
+        self.timings['ocr'] = time.perf_counter() - start_time
+
+    def run_correct_texts(self, lexicon, min_confidence: float = 0.6):
+        """
+        Snap every extracted text to the closest known course name.
+
+        Parameters
+        ----------
+        lexicon : CourseNameLexicon
+            Course name index (ex) ``CourseNameLexicon.from_catalog_dir``).
+        min_confidence : float, optional
+            Matches under this confidence are rejected, by default 0.6.
 
         Returns
         -------
         None
 
         """
-        self.texts = extract_text_from_image(self.original_image, self.boxes, show_image=show_image)
+        start_time = time.perf_counter()
+        self.corrections = [lexicon.correct(text, min_confidence=min_confidence) for text in self.texts]
+        self.timings['correction'] = time.perf_counter() - start_time
 
 
 if __name__ == "__main__":
@@ -0,0 +1,435 @@
+"""
+Grid based timetable detection.
+
+Instead of searching contours for every palette color, the timetable grid is found once with
+morphological line extraction. Day columns and hour rows come from the grid lines, blocks are
+segmented inside each day column (so they never join across a grid line), and every colored
+block is mapped to a (day, start, end) slot from its position.
+"""
+import time
+from collections import namedtuple
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from HakModule.UnivData.ScheduleExtractor.ByImage import ImageBox2D, ColorRGB, ImageToText, show_color_palette
+
+TimetableGrid = namedtuple('TimetableGrid', ['columns', 'top', 'bottom', 'hour_height', 'start_hour'])
+TimetableBlock = namedtuple('TimetableBlock', ['day', 'start', 'end', 'box', 'text_box', 'color'])
+
+
+def find_line_positions(line_mask: np.ndarray, axis: int, min_ratio: float = 0.5,
+                        valid_mask: Optional[np.ndarray] = None) -> list[int]:
+    """
+    Find the positions of long lines in a line mask.
+
+    Parameters
+    ----------
+    line_mask : numpy.ndarray
+        Binary mask that only contains horizontal or vertical lines.
+    axis : int
+        1 for horizontal lines (positions are rows), 0 for vertical lines (positions are columns).
+    min_ratio : float, optional
+        Minimum line length as a ratio of the longest line, by default 0.5.
+        With valid_mask, the minimum ratio of the valid pixels of a row (column) that are on the line.
+    valid_mask : numpy.ndarray, optional
+        Pixels where a line can be seen (ex) not covered by a block), by default every pixel.
+
+    Returns
+    -------
+    list of int
+        Center position of every line.
+
+    """
+    projection = (line_mask > 0).sum(axis=axis)
+    if projection.max(initial=0) == 0:
+        return []
+    if valid_mask is None:
+        is_line = projection >= projection.max() * min_ratio
+    else:
+        is_line = (projection > 0) & (projection >= (valid_mask > 0).sum(axis=axis) * min_ratio)
+
+    positions = []
+    start = None
+    for index, value in enumerate(is_line):
+        if value and start is None:
+            start = index
+        elif not value and start is not None:
+            positions.append((start + index - 1) // 2)
+            start = None
+    if start is not None:
+        positions.append((start + len(is_line) - 1) // 2)
+    return positions
+
+
+def get_block_mask(image: np.ndarray) -> np.ndarray:
+    """
+    Get the mask of colored (saturated) block pixels.
+    """
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, np.array([0, 50, 50]), np.array([179, 255, 255]))
+
+
+def detect_timetable_grid(image: np.ndarray, start_hour: int = 9, line_scale: int = 30,
+                          line_ratio: float = 0.5) -> Optional[TimetableGrid]:
+    """
+    Find the timetable grid with morphological line extraction.
+
+    Grid lines are thin gray lines: low saturation pixels that differ from the background.
+    Blocks are drawn over the lines, so a row (column) is a line when most of its pixels that
+    are not covered by a block are on it. The hour labels and day names are never covered, so
+    every line is still found when blocks hide the rest of it, and block edges are never lines.
+
+    The leftmost column (hour labels) and the top row (day names) are recognized by their size:
+    day columns share the most common width and hour rows share the most common height.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Input image in BGR format.
+    start_hour : int, optional
+        Hour of the first grid row, by default 9 (Everytime default).
+    line_scale : int, optional
+        Minimum line segment length as a fraction of the image size (1 / line_scale), by default 30.
+    line_ratio : float, optional
+        Minimum ratio of the uncovered pixels of a row (column) that are on the line, by default 0.5.
+
+    Returns
+    -------
+    TimetableGrid or None
+        Day column ranges, grid top/bottom, hour height and start hour, or None if no grid is found.
+
+    """
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    saturation, value = hsv[:, :, 1], hsv[:, :, 2]
+    uncovered = cv2.bitwise_not(get_block_mask(image))
+    # the background is the most common gray (white, or dark in dark mode)
+    histogram = cv2.calcHist([value], [0], uncovered, [256], [0, 256])
+    background = int(histogram.argmax()) if histogram.any() else 255
+    line_pixels = ((saturation < 40) & (np.abs(value.astype(np.int16) - background) >= 8)).astype(np.uint8) * 255
+
+    height, width = value.shape
+    horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(1, width // line_scale), 1))
+    vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(1, height // line_scale)))
+    horizontal = cv2.morphologyEx(line_pixels, cv2.MORPH_OPEN, horizontal_kernel)
+    vertical = cv2.morphologyEx(line_pixels, cv2.MORPH_OPEN, vertical_kernel)
+
+    rows = find_line_positions(horizontal, axis=1, min_ratio=line_ratio, valid_mask=uncovered)
+    columns = find_line_positions(vertical, axis=0, min_ratio=line_ratio, valid_mask=uncovered)
+    if len(rows) < 2 or len(columns) < 2:
+        return None
+
+    column_widths = np.diff(columns)
+    day_width = np.median(column_widths)
+    day_columns = [(left, right)
+                   for left, right, column_width in zip(columns[:-1], columns[1:], column_widths)
+                   if abs(column_width - day_width) <= day_width * 0.2]
+
+    row_heights = np.diff(rows)
+    hour_height = float(np.median(row_heights))
+    hour_rows = [index
+                 for index, row_height in enumerate(row_heights)
+                 if abs(row_height - hour_height) <= hour_height * 0.2]
+    if not day_columns or not hour_rows:
+        return None
+    top = rows[hour_rows[0]]
+    bottom = rows[hour_rows[-1] + 1]
+    return TimetableGrid(day_columns, top, bottom, hour_height, start_hour)
+
+
+def find_color_blocks(image: np.ndarray, grid: TimetableGrid, min_area_ratio: float = 0.2,
+                      min_fill: float = 0.3, color_distance: float = 40) -> list[ImageBox2D]:
+    """
+    Find colored blocks inside the grid, one day column at a time.
+
+    Every day column is read between its grid lines, so a block never joins a block of another
+    day. Inside a column, rows that are mostly block colored are grouped into runs, and a run is
+    split where the rows stop being colored (the gap between two blocks) or where the color
+    changes (two blocks that touch). Text only removes part of a row, so it never splits a block.
+    A block that covers several hours is kept whole (blocks are drawn over the hour lines) and
+    clipped to the grid top and bottom.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Input image in BGR format.
+    grid : TimetableGrid
+        Detected grid.
+    min_area_ratio : float, optional
+        Minimum block area as a ratio of one (day x quarter hour) cell, by default 0.2.
+    min_fill : float, optional
+        Minimum ratio of colored pixels of a block row, by default 0.3.
+    color_distance : float, optional
+        Minimum BGR distance between two rows that splits touching blocks, by default 40.
+
+    Returns
+    -------
+    list of ImageBox2D
+        Block boxes.
+
+    """
+    mask = get_block_mask(image)
+    block_image = cv2.bitwise_and(image, image, mask=mask)
+    boxes = []
+    for left, right in grid.columns:
+        # skip the grid lines on both sides of the column
+        x0, x1 = left + 1, right
+        column_mask = mask[grid.top:grid.bottom + 1, x0:x1]
+        if column_mask.size == 0:
+            continue
+        counts = cv2.reduce(column_mask // 255, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)[:, 0]
+        is_block = counts >= column_mask.shape[1] * min_fill
+        # mean color of the block pixels of every row
+        color_sums = cv2.reduce(block_image[grid.top:grid.bottom + 1, x0:x1], 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)
+        row_colors = color_sums[:, 0, :] / np.maximum(counts, 1)[:, None]
+        color_jumps = np.zeros(len(counts), dtype=bool)
+        color_jumps[1:] = np.linalg.norm(np.diff(row_colors, axis=0), axis=1) >= color_distance
+
+        min_area = (x1 - x0) * grid.hour_height / 4 * min_area_ratio
+        run_start = None
+        for index in range(len(counts) + 1):
+            ends = index == len(counts) or not is_block[index] or color_jumps[index]
+            if run_start is not None and ends:
+                columns_used = np.flatnonzero(column_mask[run_start:index].max(axis=0))
+                box = ImageBox2D(int(x0 + columns_used[0]), int(grid.top + run_start),
+                                 int(columns_used[-1] - columns_used[0] + 1), int(index - run_start))
+                if box.w * box.h >= min_area:
+                    boxes.append(box)
+                run_start = None
+            if run_start is None and index < len(counts) and is_block[index]:
+                run_start = index
+    return boxes
+
+
+def find_text_box(image: np.ndarray, box: ImageBox2D, margin: int = 3, color_distance: int = 60,
+                  padding: int = 4) -> ImageBox2D:
+    """
+    Find the area of a block that holds its text (pixels far from the block color).
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Input image in BGR format.
+    box : ImageBox2D
+        Block box.
+    margin : int, optional
+        Border ignored on every side, by default 3.
+    color_distance : int, optional
+        Minimum color distance of a text pixel, by default 60.
+    padding : int, optional
+        Space kept around the text (inside the block), by default 4.
+
+    Returns
+    -------
+    ImageBox2D
+        Text box in image coordinates (the inner block box if no text pixel is found).
+
+    """
+    x, y = box.x + margin, box.y + margin
+    w, h = max(1, box.w - 2 * margin), max(1, box.h - 2 * margin)
+    inner = image[y:y + h, x:x + w].astype(np.int32)
+    block_color = np.median(inner.reshape(-1, 3), axis=0)
+    is_text = ((inner - block_color) ** 2).sum(axis=2) >= color_distance * color_distance
+    points = cv2.findNonZero(is_text.astype(np.uint8))
+    if points is None:
+        return ImageBox2D(x, y, w, h)
+    text_x, text_y, text_w, text_h = cv2.boundingRect(points)
+    left, top = max(0, text_x - padding), max(0, text_y - padding)
+    right, bottom = min(w, text_x + text_w + padding), min(h, text_y + text_h + padding)
+    return ImageBox2D(x + left, y + top, right - left, bottom - top)
+
+
+def map_block_to_slot(grid: TimetableGrid, box: ImageBox2D, minute_step: int = 5) -> Optional[tuple[int, int, int]]:
+    """
+    Map a block box to a (day, start, end) slot.
+
+    Parameters
+    ----------
+    grid : TimetableGrid
+        Detected grid.
+    box : ImageBox2D
+        Block box.
+    minute_step : int, optional
+        Times are rounded to this step, by default 5.
+
+    Returns
+    -------
+    tuple[int, int, int] or None
+        Day index (0 is the first day column), start and end minutes from midnight,
+        or None if the block is outside every day column.
+
+    """
+    center_x = box.x + box.w / 2
+    day = None
+    for index, (left, right) in enumerate(grid.columns):
+        if left <= center_x <= right:
+            day = index
+            break
+    if day is None:
+        return None
+
+    def to_minute(position: float) -> int:
+        minute = grid.start_hour * 60 + (position - grid.top) / grid.hour_height * 60
+        return int(round(minute / minute_step) * minute_step)
+
+    return day, to_minute(box.y), to_minute(box.y + box.h)
+
+
+class GridImageToText(ImageToText):
+    """
+    Timetable image extractor that uses the grid structure instead of palette contours.
+
+    Attributes
+    ----------
+    grid : TimetableGrid, optional
+        Detected grid.
+    blocks : list of TimetableBlock
+        Detected blocks with their slots.
+    """
+    def __init__(self, image_path: str = "", image: Optional[np.ndarray] = None):
+        """
+        Initialize an instance of GridImageToText.
+
+        Parameters
+        ----------
+        image_path : str
+            Path to the input image.
+        image : numpy.ndarray, optional
+            Already decoded BGR image. If given, image_path is not read.
+
+        """
+        super(GridImageToText, self).__init__(image_path, image=image)
+        self.grid: Optional[TimetableGrid] = None
+        self.blocks: list[TimetableBlock] = []
+
+    def clear(self):
+        """
+        Clear all attributes of the GridImageToText instance.
+
+        Returns
+        -------
+        None
+
+        """
+        super(GridImageToText, self).clear()
+        self.grid = None
+        self.blocks.clear()
+
+    def run_setting_box(
+            self,
+            start_hour: int = 9,
+            minute_step: int = 5,
+            line_scale: int = 30,
+            line_ratio: float = 0.5,
+            min_area_ratio: float = 0.2,
+            min_fill: float = 0.3,
+            color_distance: float = 40,
+            show_palette: bool = False,
+            show_boxes: bool = False,
+            box_contour_color: ColorRGB = (255, 0, 0),
+            show_box_resize: float = 0.4,
+            wait: bool = False,
+            palette_color_count: int = 120,
+            palette_color_quality: int = 100,
+            filter_colors_limit: int = 50,
+            box_overlap_threshold: float = 0.4,
+            detect_scale: float = 1.0,
+    ):
+        """
+        Detect the grid and map every colored block to a (day, start, end) slot.
+
+        ``boxes`` is set to the text box of every block, so ``run_get_texts`` only reads the text area.
+        The palette and box options of ``ImageToText.run_setting_box`` are accepted and ignored, so
+        the same setting options work for both (ex) ``run_benchmark``, ``run_with_cache``).
+
+        Parameters
+        ----------
+        start_hour : int, optional
+            Hour of the first grid row, by default 9.
+        minute_step : int, optional
+            Times are rounded to this step, by default 5.
+        line_scale : int, optional
+            Minimum grid line segment length as a fraction of the image size, by default 30.
+        line_ratio : float, optional
+            Minimum ratio of the uncovered pixels of a row (column) that are on the line, by default 0.5.
+        min_area_ratio : float, optional
+            Minimum block area as a ratio of one (day x quarter hour) cell, by default 0.2.
+        min_fill : float, optional
+            Minimum ratio of colored pixels of a block row, by default 0.3.
+        color_distance : float, optional
+            Minimum color change that splits touching blocks, by default 40.
+        show_palette : bool, optional
+            Whether to display the colors of the detected blocks, by default False.
+        show_boxes : bool, optional
+            Whether to display the detected blocks on an image, by default False.
+        box_contour_color : ColorRGB, optional
+            Color for drawing block contours, by default (255, 0, 0).
+        show_box_resize : float, optional
+            Resize factor for displaying the block image, by default 0.4.
+        wait : bool, optional
+            Whether to wait for a key press before closing windows, by default False.
+        palette_color_count, palette_color_quality, filter_colors_limit : int, optional
+            Ignored, blocks are found from the grid instead of a palette.
+        box_overlap_threshold : float, optional
+            Ignored, blocks of one day column never overlap.
+        detect_scale : float, optional
+            Ignored, the grid lines are 1 px wide and are read at full resolution.
+
+        Returns
+        -------
+        None
+
+        """
+        start_time = time.perf_counter()
+        self.grid = detect_timetable_grid(self.original_image, start_hour=start_hour, line_scale=line_scale,
+                                          line_ratio=line_ratio)
+        self.timings['grid'] = time.perf_counter() - start_time
+        self.blocks = []
+        self.boxes = []
+        if self.grid is not None:
+            start_time = time.perf_counter()
+            for box in find_color_blocks(self.original_image, self.grid, min_area_ratio=min_area_ratio,
+                                         min_fill=min_fill, color_distance=color_distance):
+                slot = map_block_to_slot(self.grid, box, minute_step=minute_step)
+                if slot is None:
+                    continue
+                x, y, w, h = box
+                color = self.original_image[y + h // 2, x + min(3, w - 1)]
+                self.blocks.append(TimetableBlock(
+                    *slot,
+                    box=box,
+                    text_box=find_text_box(self.original_image, box),
+                    color=ColorRGB(int(color[2]), int(color[1]), int(color[0]))
+                ))
+            self.blocks.sort(key=lambda block: (block.day, block.start))
+            self.boxes = [block.text_box for block in self.blocks]
+            self.colors = [block.color for block in self.blocks]
+            self.timings['segmentation'] = time.perf_counter() - start_time
+
+        if show_palette:
+            show_color_palette(self.colors, wait=False)
+        if show_boxes:
+            box_image = self.original_image.copy()
+            for block in self.blocks:
+                x, y, w, h = block.box
+                cv2.rectangle(box_image, (x, y), (x + w, y + h), box_contour_color, 2)
+            box_image = cv2.resize(box_image, dsize=(0, 0), fx=show_box_resize, fy=show_box_resize)
+            cv2.imshow("box", box_image)
+        if wait:
+            cv2.waitKey(0)
+            cv2.destroyAllWindows()
+
+    def get_schedule(self) -> list[dict]:
+        """
+        Get the detected blocks as schedule data.
+
+        Returns
+        -------
+        list of dict
+            {'day', 'start', 'end', 'text'} for every block. text is None before ``run_get_texts``.
+
+        """
+        texts = self.texts if len(self.texts) == len(self.blocks) else [None] * len(self.blocks)
+        return [{'day': block.day, 'start': block.start, 'end': block.end, 'text': text}
+                for block, text in zip(self.blocks, texts)]
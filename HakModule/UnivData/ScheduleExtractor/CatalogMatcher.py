@@ -0,0 +1,288 @@
+"""
+Join imported Everytime timetables to the scraped HYU catalog.
+
+Classes are indexed once by (name, instructor, room number), (name, instructor) and name.
+A block is resolved from the most specific key that has candidates, and the class meeting
+times break ties. Names that are not in the catalog (typos, shortened names) fall back to the
+n-gram CourseNameLexicon. Resolved blocks are memoized in a bounded LRU, so a batch of thousands
+of timetables that share the same classes only resolves every distinct block once.
+"""
+import re
+from collections import OrderedDict, namedtuple
+from typing import Iterable, Optional, Union
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import RecordKey, get_record_key, iter_catalog_dir
+from HakModule.UnivData.HYU_S.Catalog.course_lexicon import CourseNameLexicon, normalize_name
+from HakModule.UnivData.HYU_S.Catalog.schedule import parse_schedule
+from HakModule.UnivData.ScheduleExtractor.ByEverytime import EverytimeScheduleData
+
+# method is 'exact', 'instructor', 'name' or 'fuzzy'. key is None when nothing matched
+CatalogMatch = namedtuple('CatalogMatch', ['name', 'key', 'confidence', 'method'])
+
+ROOM_NUMBER_PATTERN = re.compile(r"\d+")
+
+
+def get_room_number(text: Optional[str]) -> str:
+    """
+    Get the room number of a place text (ex) '제1공학관 606' -> '606', '606강의실(공학대학원 전용)' -> '606').
+
+    Parameters
+    ----------
+    text : str or None
+        Place or room text.
+
+    Returns
+    -------
+    str
+        Last number of an Everytime place (first number of a catalog room), or '' if there is none.
+    """
+    if not text:
+        return ''
+    numbers = ROOM_NUMBER_PATTERN.findall(text)
+    return numbers[-1] if numbers else ''
+
+
+def split_instructors(text: Optional[str]) -> list[str]:
+    """
+    Split and normalize an instructor text that may hold several names.
+    """
+    if not text:
+        return []
+    return [normalize_name(name) for name in re.split(r"[,/]", text) if normalize_name(name)]
+
+
+class CatalogMatcher:
+    """
+    Resolver of Everytime blocks to catalog classes.
+
+    Attributes
+    ----------
+    min_confidence : float
+        Least lexicon confidence of a fuzzy name match.
+    max_memo : int
+        Maximum number of resolved blocks kept.
+
+    Methods
+    -------
+    from_class_datas(datas, min_confidence=0.7, max_memo=65536)
+        Build a matcher from class datas.
+    from_catalog_dir(dir_path, min_confidence=0.7, max_memo=65536)
+        Build a matcher from a directory of scraped json files.
+    match_block(name, instructor=None, place=None, times=())
+        Resolve one block.
+    match_classroom_datas(classroom_datas)
+        Resolve every classroom data of a timetable.
+    match_batch(schedules)
+        Resolve many timetables in one pass.
+    """
+    def __init__(self, min_confidence: float = 0.7, max_memo: int = 65536):
+        """
+        Initialize the CatalogMatcher.
+
+        Parameters
+        ----------
+        min_confidence : float, optional
+            Least lexicon confidence of a fuzzy name match, by default 0.7.
+        max_memo : int, optional
+            Maximum number of resolved blocks kept, by default 65536.
+        """
+        self.min_confidence: float = min_confidence
+        self.max_memo: int = max_memo
+
+        self.__lexicon = CourseNameLexicon()
+        self.__by_room: dict[tuple[str, str, str], list[RecordKey]] = {}
+        self.__by_instructor: dict[tuple[str, str], list[RecordKey]] = {}
+        self.__by_name: dict[str, list[RecordKey]] = {}
+        self.__slots: dict[RecordKey, set[tuple[int, int]]] = {}
+        self.__memo: OrderedDict[tuple, CatalogMatch] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__slots)
+
+    def add_class_data(self, data: dict) -> None:
+        """
+        Add a class data to the index.
+
+        Parameters
+        ----------
+        data : dict
+            Class data in the ``HYUSeoulClassData.datas`` shape.
+        """
+        key = get_record_key(data)
+        course_info = data.get('course_info') or {}
+        name = normalize_name(course_info.get('name_kr'))
+        if key is None or not name:
+            return
+        slots = parse_schedule(course_info)
+        instructors = split_instructors((data.get('instructor') or {}).get('name'))
+        rooms = {get_room_number(slot.room) for slot in slots} - {''}
+
+        self.__lexicon.add(course_info.get('name_kr'), key)
+        self.__by_name.setdefault(name, []).append(key)
+        for instructor in instructors:
+            self.__by_instructor.setdefault((name, instructor), []).append(key)
+            for room in rooms:
+                self.__by_room.setdefault((name, instructor, room), []).append(key)
+        self.__slots[key] = {(slot.day, slot.start) for slot in slots}
+        self.__memo.clear()
+
+    @classmethod
+    def from_class_datas(cls, datas: Iterable[dict], min_confidence: float = 0.7,
+                         max_memo: int = 65536) -> 'CatalogMatcher':
+        """
+        Build a matcher from class datas.
+
+        Parameters
+        ----------
+        datas : Iterable[dict]
+            Class datas in the ``HYUSeoulClassData.datas`` shape.
+        min_confidence : float, optional
+            Least lexicon confidence of a fuzzy name match, by default 0.7.
+        max_memo : int, optional
+            Maximum number of resolved blocks kept, by default 65536.
+
+        Returns
+        -------
+        CatalogMatcher
+            Built matcher.
+        """
+        matcher = cls(min_confidence=min_confidence, max_memo=max_memo)
+        for data in datas:
+            matcher.add_class_data(data)
+        return matcher
+
+    @classmethod
+    def from_catalog_dir(cls, dir_path: str, min_confidence: float = 0.7, max_memo: int = 65536) -> 'CatalogMatcher':
+        """
+        Build a matcher from a directory of scraped json files (ex) ./HakFile/UnivData/HYU_S).
+        """
+        return cls.from_class_datas(iter_catalog_dir(dir_path), min_confidence=min_confidence, max_memo=max_memo)
+
+    def __pick(self, candidates: list[RecordKey], times: tuple[tuple[int, int], ...]) -> tuple[RecordKey, float]:
+        """
+        Pick the candidate whose meeting times overlap the block times the most.
+
+        Returns the key and the ratio of the block times it has (1.0 if there is nothing to compare).
+        """
+        if len(candidates) == 1 and not times:
+            return candidates[0], 1.0
+        best_key, best_ratio = candidates[0], -1.0
+        for key in candidates:
+            ratio = len(self.__slots[key].intersection(times)) / len(times) if times else 0.0
+            if ratio > best_ratio:
+                best_key, best_ratio = key, ratio
+        if not times:
+            # several sections share the name and nothing tells them apart
+            return best_key, 1.0 / len(candidates)
+        return best_key, best_ratio
+
+    def match_block(self,
+                    name: Optional[str],
+                    instructor: Optional[str] = None,
+                    place: Optional[str] = None,
+                    times: Iterable[tuple[int, int]] = ()) -> CatalogMatch:
+        """
+        Resolve one Everytime block to a catalog class.
+
+        Parameters
+        ----------
+        name : str or None
+            Class name on Everytime.
+        instructor : str, optional
+            Instructor on Everytime.
+        place : str, optional
+            Place on Everytime (ex) '제1공학관 606').
+        times : Iterable[tuple[int, int]], optional
+            (day, start minute) of the meetings, used to pick one section among candidates.
+
+        Returns
+        -------
+        CatalogMatch
+            Matched key and confidence. Confidence is lowered for looser keys, ambiguous sections
+            and fuzzy names. key is None if nothing matched.
+        """
+        times = tuple(sorted(set(times)))
+        memo_key = (name, instructor, place, times)
+        match = self.__memo.get(memo_key)
+        if match is not None:
+            self.__memo.move_to_end(memo_key)
+            return match
+
+        normalized = normalize_name(name)
+        instructors = split_instructors(instructor)
+        room = get_room_number(place)
+        match = CatalogMatch(name, None, 0.0, None)
+        for method, weight, candidates in self.__iter_candidates(normalized, instructors, room):
+            key, ratio = self.__pick(candidates, times)
+            match = CatalogMatch(name, key, weight * (0.5 + 0.5 * ratio), method)
+            break
+        else:
+            corrected = self.__lexicon.correct(name, min_confidence=self.min_confidence)
+            if corrected.name is not None:
+                corrected_name = normalize_name(corrected.name)
+                for method, weight, candidates in self.__iter_candidates(corrected_name, instructors, room):
+                    key, ratio = self.__pick(candidates, times)
+                    # a corrected name is never as sure as the same key with the exact name
+                    match = CatalogMatch(name, key, 0.9 * corrected.confidence * weight * (0.5 + 0.5 * ratio),
+                                         'fuzzy')
+                    break
+        self.__memo[memo_key] = match
+        while len(self.__memo) > self.max_memo:
+            self.__memo.popitem(last=False)
+        return match
+
+    def __iter_candidates(self, name: str, instructors: list[str], room: str):
+        """
+        Yield (method, weight, candidates) from the most specific index to the loosest.
+        """
+        for instructor in instructors:
+            candidates = self.__by_room.get((name, instructor, room))
+            if candidates:
+                yield 'exact', 1.0, candidates
+        for instructor in instructors:
+            candidates = self.__by_instructor.get((name, instructor))
+            if candidates:
+                yield 'instructor', 0.9, candidates
+        candidates = self.__by_name.get(name)
+        if candidates:
+            yield 'name', 0.7, candidates
+
+    def match_classroom_datas(self, classroom_datas: Iterable[dict]) -> list[CatalogMatch]:
+        """
+        Resolve every classroom data of a timetable.
+
+        Parameters
+        ----------
+        classroom_datas : Iterable[dict]
+            ``EverytimeScheduleData.classroom_datas``.
+
+        Returns
+        -------
+        list of CatalogMatch
+            One match per classroom data, in the same order.
+        """
+        matches = []
+        for classroom_data in classroom_datas:
+            times = [(slot['day'], slot['start']) for slot in classroom_data.get('times', [])
+                     if slot.get('day') is not None and slot.get('start') is not None]
+            matches.append(self.match_block(classroom_data.get('name'), classroom_data.get('instructor'),
+                                            classroom_data.get('place'), times))
+        return matches
+
+    def match_batch(self, schedules: Iterable[Union[EverytimeScheduleData, list[dict]]]) -> list[list[CatalogMatch]]:
+        """
+        Resolve many imported timetables in one pass.
+
+        Parameters
+        ----------
+        schedules : Iterable[EverytimeScheduleData or list[dict]]
+            Imported timetables or their classroom datas.
+
+        Returns
+        -------
+        list of list[CatalogMatch]
+            Matches of every timetable, in the same order.
+        """
+        return [self.match_classroom_datas(schedule.classroom_datas if isinstance(schedule, EverytimeScheduleData)
+                                           else schedule)
+                for schedule in schedules]
@@ -0,0 +1,248 @@
+"""
+Bulk import of shared Everytime timetables.
+
+Codes are spread over a small pool of WebDrivers (one per worker thread), and every code gets
+its own timeout. Timetables are yielded as soon as they are read, and codes that failed are kept
+in ``failures`` with the reason instead of a bare None.
+"""
+import itertools
+import queue
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from HakModule.UnivData.ScheduleExtractor.ByEverytime import EverytimeScheduleData, EverytimeToText
+
+EverytimeImportResult = namedtuple('EverytimeImportResult', ['code', 'data', 'seconds'])
+EverytimeImportFailure = namedtuple('EverytimeImportFailure', ['code', 'error', 'seconds'])
+
+
+def default_headless_options() -> Options:
+    """
+    Create Chrome options for a headless import driver.
+    """
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    return options
+
+
+class EverytimeBulkImporter:
+    """
+    Import many shared Everytime timetables with a pool of WebDrivers.
+
+    Attributes
+    ----------
+    driver_count : int
+        Number of drivers (= maximum concurrent page loads).
+    timeout : float
+        Seconds allowed for the page load and for the timetable of one code.
+    failures : list of EverytimeImportFailure
+        Codes that failed during ``iter_import``.
+
+    Methods
+    -------
+    start()
+        Start the worker threads (drivers are started on first use).
+    close()
+        Quit every driver.
+    fetch(code)
+        Import one code with a driver of the pool.
+    fetch_data(code)
+        Import one code, raising on page load and driver failures.
+    iter_import(codes, max_pending=None)
+        Import codes concurrently and yield every timetable as soon as it is read.
+    """
+    def __init__(self,
+                 driver_count: int = 4,
+                 timeout: float = 5,
+                 options_factory: Callable[[], Options] = default_headless_options,
+                 service_factory: Callable[[], Service] = Service):
+        """
+        Initialize the EverytimeBulkImporter.
+
+        Parameters
+        ----------
+        driver_count : int, optional
+            Number of drivers, by default 4.
+        timeout : float, optional
+            Seconds allowed for one code, by default 5.
+        options_factory : Callable[[], Options], optional
+            Creates the options of every driver, by default headless Chrome without images.
+        service_factory : Callable[[], Service], optional
+            Creates the service of every driver, by default Service.
+        """
+        self.driver_count: int = driver_count
+        self.timeout: float = timeout
+        self.options_factory: Callable[[], Options] = options_factory
+        self.service_factory: Callable[[], Service] = service_factory
+        self.failures: list[EverytimeImportFailure] = []
+
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__drivers: queue.Queue = queue.Queue()
+        self.__all_drivers: list[EverytimeToText] = []
+
+    def __enter__(self) -> 'EverytimeBulkImporter':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Start the worker threads. Drivers are started on first use.
+        """
+        if self.__executor is not None:
+            return
+        self.__executor = ThreadPoolExecutor(max_workers=self.driver_count, thread_name_prefix='everytime')
+        for _ in range(self.driver_count - len(self.__all_drivers)):
+            everytime = EverytimeToText(options=self.options_factory(), service=self.service_factory())
+            self.__all_drivers.append(everytime)
+            self.__drivers.put(everytime)
+
+    def close(self) -> None:
+        """
+        Stop the worker threads and quit every driver.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+        for everytime in self.__all_drivers:
+            everytime.quit()
+
+    def __start_driver(self, everytime: EverytimeToText) -> None:
+        """
+        Start a driver if it is not running and apply the page load timeout.
+        """
+        if everytime.driver is None:
+            everytime.run()
+            everytime.driver.set_page_load_timeout(self.timeout)
+
+    def __import(self, code: str) -> Optional[EverytimeScheduleData]:
+        """
+        Import one code with a free driver of the pool. Driver errors are raised.
+        """
+        self.start()
+        everytime = self.__drivers.get()
+        try:
+            self.__start_driver(everytime)
+            return everytime.code_to_classroom_data(code, timeout=self.timeout)
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            # the browser may be broken after a driver error, start a new one for the next code
+            everytime.quit()
+            raise
+        finally:
+            self.__drivers.put(everytime)
+
+    def fetch(self, code: str) -> tuple[Optional[EverytimeScheduleData], Optional[str], float]:
+        """
+        Import one code with a free driver of the pool. Errors are returned as the failure reason
+        instead of raised, so one broken page does not stop ``iter_import``.
+
+        Parameters
+        ----------
+        code : str
+            Everytime timetable code (the part after '@').
+
+        Returns
+        -------
+        tuple[EverytimeScheduleData or None, str or None, float]
+            Timetable (None if it failed), failure reason and elapsed seconds.
+        """
+        start_time = time.perf_counter()
+        try:
+            data = self.__import(code)
+        except TimeoutException:
+            return None, "timeout : page load", time.perf_counter() - start_time
+        except WebDriverException as error:
+            return None, f"{type(error).__name__}: {error.msg}", time.perf_counter() - start_time
+        except Exception as error:
+            # ex) an unexpected table shape while converting the page
+            return None, f"{type(error).__name__}: {error}", time.perf_counter() - start_time
+        if data is None:
+            return None, "timeout : timetable not found", time.perf_counter() - start_time
+        return data, None, time.perf_counter() - start_time
+
+    def fetch_data(self, code: str) -> Optional[EverytimeScheduleData]:
+        """
+        Import one code, raising on page load and driver failures.
+
+        Use this as the fetcher of ``EverytimeResultCache``, so only "timetable not found" is cached
+        and failed page loads are tried again.
+
+        Parameters
+        ----------
+        code : str
+            Everytime timetable code (the part after '@').
+
+        Returns
+        -------
+        EverytimeScheduleData or None
+            Timetable, or None if the page loaded without a timetable.
+
+        Raises
+        ------
+        TimeoutException
+            If the page did not load in time.
+        WebDriverException
+            If the driver failed.
+        """
+        return self.__import(code)
+
+    def iter_import(self, codes: Iterable[str], max_pending: Optional[int] = None) -> Iterator[EverytimeImportResult]:
+        """
+        Import codes concurrently and yield every timetable as soon as it is read.
+
+        Failed codes are not yielded, they are appended to ``failures``.
+
+        Parameters
+        ----------
+        codes : Iterable[str]
+            Timetable codes. The iterable is read lazily.
+        max_pending : int, optional
+            Maximum codes submitted but not yet finished, by default 2 * driver_count.
+
+        Yields
+        ------
+        EverytimeImportResult
+            (code, data, seconds) in completion order.
+        """
+        self.start()
+        max_pending = max_pending or 2 * self.driver_count
+        code_iterator = iter(codes)
+        pending: dict[Future, str] = {}
+
+        def submit_next(count: int) -> None:
+            for code in itertools.islice(code_iterator, count):
+                pending[self.__executor.submit(self.fetch, code)] = code
+
+        submit_next(max_pending)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                code = pending.pop(future)
+                data, error, seconds = future.result()
+                if data is None:
+                    self.failures.append(EverytimeImportFailure(code, error, seconds))
+                else:
+                    yield EverytimeImportResult(code, data, seconds)
+            submit_next(max_pending - len(pending))
+
+
+if __name__ == "__main__":
+    CODES: list[str] = ["WT0E2D8NrETJDQ5eaF8q"]
+
+    with EverytimeBulkImporter(driver_count=2) as importer:
+        for import_result in importer.iter_import(CODES):
+            print(import_result.code, import_result.seconds, import_result.data.classroom_datas)
+        print(importer.failures)
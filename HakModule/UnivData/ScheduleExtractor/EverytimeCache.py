@@ -0,0 +1,190 @@
+"""
+Expiring result cache in front of the Everytime timetable fetch.
+
+Timetables are kept per code for a TTL in a size-bounded LRU. Concurrent lookups of a code that
+is being fetched wait for that one fetch instead of opening another page, and the cache counts
+hits, misses, coalesced lookups, expirations and evictions. A fetch that was running when its code
+was invalidated still answers its waiters but is not cached.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from HakModule.UnivData.ScheduleExtractor.ByEverytime import EverytimeScheduleData
+
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'coalesced', 'expired', 'evictions', 'errors', 'size'])
+
+
+class EverytimeResultCache:
+    """
+    TTL + LRU cache of Everytime timetables keyed by code.
+
+    The fetcher is called from the thread of the first lookup of a code, so it must be safe to call
+    from several threads (ex) ``EverytimeBulkImporter.fetch_data`` with a pool of drivers). It must
+    return None only when there is no timetable and raise on page load or driver failures, which
+    are not cached.
+
+    Attributes
+    ----------
+    ttl : float
+        Seconds a timetable is kept.
+    negative_ttl : float
+        Seconds a missing timetable (fetch returned None) is kept.
+    max_size : int
+        Maximum number of cached codes.
+
+    Methods
+    -------
+    get(code)
+        Get the timetable of a code, fetching it on a miss.
+    invalidate(code)
+        Drop the cached timetable of a code.
+    clear()
+        Drop every cached timetable.
+    get_stats()
+        Get the hit/miss metrics.
+    """
+    def __init__(self,
+                 fetcher: Callable[[str], Optional[EverytimeScheduleData]],
+                 ttl: float = 600,
+                 negative_ttl: float = 30,
+                 max_size: int = 1024):
+        """
+        Initialize the EverytimeResultCache.
+
+        Parameters
+        ----------
+        fetcher : Callable[[str], Optional[EverytimeScheduleData]]
+            Fetches the timetable of a code (None if there is none).
+        ttl : float, optional
+            Seconds a timetable is kept, by default 600.
+        negative_ttl : float, optional
+            Seconds a missing timetable is kept, by default 30.
+        max_size : int, optional
+            Maximum number of cached codes, by default 1024.
+        """
+        self.fetcher: Callable[[str], Optional[EverytimeScheduleData]] = fetcher
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self.max_size: int = max_size
+
+        self.__entries: OrderedDict[str, tuple[float, Optional[EverytimeScheduleData]]] = OrderedDict()
+        self.__in_flight: dict[str, Future] = {}
+        self.__lock = threading.Lock()
+        self.__counts: dict[str, int] = dict.fromkeys(('hits', 'misses', 'coalesced', 'expired', 'evictions',
+                                                       'errors'), 0)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, code: str) -> Optional[EverytimeScheduleData]:
+        """
+        Get the timetable of a code, fetching it on a miss.
+
+        Parameters
+        ----------
+        code : str
+            Everytime timetable code.
+
+        Returns
+        -------
+        EverytimeScheduleData or None
+            Timetable, or None if the fetch found none.
+
+        Raises
+        ------
+        Exception
+            Whatever the fetcher raised. Errors are not cached.
+        """
+        with self.__lock:
+            entry = self.__entries.get(code)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at > time.monotonic():
+                    self.__entries.move_to_end(code)
+                    self.__counts['hits'] += 1
+                    return data
+                del self.__entries[code]
+                self.__counts['expired'] += 1
+
+            future = self.__in_flight.get(code)
+            if future is not None:
+                self.__counts['coalesced'] += 1
+                owner = False
+            else:
+                future = self.__in_flight[code] = Future()
+                self.__counts['misses'] += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            data = self.fetcher(code)
+        except BaseException as error:
+            with self.__lock:
+                self.__counts['errors'] += 1
+                if self.__in_flight.get(code) is future:
+                    del self.__in_flight[code]
+            future.set_exception(error)
+            raise
+
+        with self.__lock:
+            # invalidate() or clear() during the fetch replaced (or removed) the in-flight future
+            if self.__in_flight.get(code) is future:
+                del self.__in_flight[code]
+                self.__entries[code] = (time.monotonic() + (self.ttl if data is not None else self.negative_ttl),
+                                        data)
+                self.__entries.move_to_end(code)
+                while len(self.__entries) > self.max_size:
+                    self.__entries.popitem(last=False)
+                    self.__counts['evictions'] += 1
+        future.set_result(data)
+        return data
+
+    def invalidate(self, code: str) -> None:
+        """
+        Drop the cached timetable of a code.
+
+        A running fetch of the code is not cached, and later lookups start a new fetch.
+
+        Parameters
+        ----------
+        code : str
+            Everytime timetable code.
+        """
+        with self.__lock:
+            self.__entries.pop(code, None)
+            self.__in_flight.pop(code, None)
+
+    def clear(self) -> None:
+        """
+        Drop every cached timetable. Running fetches are not cached.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__in_flight.clear()
+
+    def get_stats(self) -> CacheStats:
+        """
+        Get the hit/miss metrics.
+
+        Returns
+        -------
+        CacheStats
+            Counts since the cache was created and the current size.
+        """
+        with self.__lock:
+            return CacheStats(size=len(self.__entries), **self.__counts)
+
+
+if __name__ == "__main__":
+    from HakModule.UnivData.ScheduleExtractor.EverytimeBulk import EverytimeBulkImporter
+
+    with EverytimeBulkImporter(driver_count=2) as importer:
+        cache = EverytimeResultCache(importer.fetch_data)
+        for _ in range(3):
+            cache.get("WT0E2D8NrETJDQ5eaF8q")
+        print(cache.get_stats())
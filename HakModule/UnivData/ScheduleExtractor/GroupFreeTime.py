@@ -0,0 +1,237 @@
+"""
+Common free time of a group of Everytime timetables.
+
+Every member timetable becomes one weekly busy bitset (packed numpy bits, one bit per slot).
+For a group the bitsets are stacked once, and the number of free members of every slot comes
+from one vectorized unpack/sum, so "all N free" and "at least k of N free" are the same query.
+"""
+import threading
+from collections import namedtuple
+from typing import Hashable, Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+from HakModule.UnivData.ScheduleExtractor.ByEverytime import EverytimeScheduleData
+
+# start/end are minutes from midnight, free_count is the least number of free members in the window
+FreeWindow = namedtuple('FreeWindow', ['day', 'start', 'end', 'free_count', 'member_count'])
+
+MINUTES_PER_DAY: int = 24 * 60
+
+
+def get_busy_slots(classroom_datas: Iterable[dict]) -> list[tuple[int, int, int]]:
+    """
+    Collect (day, start, end) of every timed block of classroom datas.
+
+    Parameters
+    ----------
+    classroom_datas : Iterable[dict]
+        ``EverytimeScheduleData.classroom_datas``. Slots without a time are skipped.
+
+    Returns
+    -------
+    list of tuple[int, int, int]
+        Day index (0 is Monday), start and end minutes.
+    """
+    slots = []
+    for classroom_data in classroom_datas:
+        for slot in classroom_data.get('times', []):
+            if slot.get('day') is not None and slot.get('start') is not None and slot.get('end') is not None:
+                slots.append((slot['day'], slot['start'], slot['end']))
+    return slots
+
+
+class GroupFreeTimeFinder:
+    """
+    Finder of common free time windows over cached member timetables.
+
+    Attributes
+    ----------
+    slot_minutes : int
+        Size of one bit in minutes.
+    slot_count : int
+        Number of slots in a week.
+
+    Methods
+    -------
+    set_member(member_id, schedule)
+        Cache the busy bitset of a member.
+    remove_member(member_id)
+        Remove a cached member.
+    get_free_counts(member_ids)
+        Get the number of free members of every slot of the week.
+    find_free_windows(member_ids, min_free=None, min_minutes=30, days=range(5), day_start=540, day_end=1260)
+        Get the windows where at least min_free members are free, best first.
+    """
+    def __init__(self, slot_minutes: int = 5, group_cache_size: int = 128):
+        """
+        Initialize the GroupFreeTimeFinder.
+
+        Parameters
+        ----------
+        slot_minutes : int, optional
+            Size of one bit in minutes, by default 5.
+        group_cache_size : int, optional
+            Number of stacked groups kept for re-queries, by default 128.
+        """
+        self.slot_minutes: int = slot_minutes
+        self.slot_count: int = 7 * MINUTES_PER_DAY // slot_minutes
+        self.group_cache_size: int = group_cache_size
+
+        self.__members: dict[Hashable, np.ndarray] = {}
+        self.__member_versions: dict[Hashable, int] = {}
+        self.__groups: dict[tuple, tuple[tuple[int, ...], np.ndarray]] = {}
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__members)
+
+    def to_busy_bits(self, slots: Iterable[tuple[int, int, int]]) -> np.ndarray:
+        """
+        Convert (day, start, end) slots to a packed weekly busy bitset.
+
+        Parameters
+        ----------
+        slots : Iterable[tuple[int, int, int]]
+            Day index, start and end minutes.
+
+        Returns
+        -------
+        numpy.ndarray
+            Packed bits (uint8). A slot is busy if any part of it is used.
+        """
+        busy = np.zeros(self.slot_count, dtype=bool)
+        for day, start, end in slots:
+            first = day * MINUTES_PER_DAY // self.slot_minutes + start // self.slot_minutes
+            last = day * MINUTES_PER_DAY // self.slot_minutes + -(-end // self.slot_minutes)
+            busy[first:last] = True
+        return np.packbits(busy)
+
+    def set_member(self, member_id: Hashable,
+                   schedule: Union[EverytimeScheduleData, Iterable[dict], Iterable[tuple[int, int, int]]]) -> None:
+        """
+        Cache the busy bitset of a member.
+
+        Parameters
+        ----------
+        member_id : Hashable
+            Member key (ex) user id or Everytime code).
+        schedule : EverytimeScheduleData, Iterable[dict] or Iterable[tuple[int, int, int]]
+            Imported timetable, its classroom datas, or (day, start, end) slots.
+        """
+        if isinstance(schedule, EverytimeScheduleData):
+            slots = get_busy_slots(schedule.classroom_datas)
+        else:
+            schedule = list(schedule)
+            slots = get_busy_slots(schedule) if schedule and isinstance(schedule[0], dict) else schedule
+        bits = self.to_busy_bits(slots)
+        with self.__lock:
+            self.__members[member_id] = bits
+            self.__member_versions[member_id] = self.__member_versions.get(member_id, 0) + 1
+
+    def remove_member(self, member_id: Hashable) -> None:
+        """
+        Remove a cached member.
+
+        Parameters
+        ----------
+        member_id : Hashable
+            Member key.
+        """
+        with self.__lock:
+            self.__members.pop(member_id, None)
+            self.__member_versions[member_id] = self.__member_versions.get(member_id, 0) + 1
+
+    def __get_group_bits(self, member_ids: Sequence[Hashable]) -> np.ndarray:
+        """
+        Get the stacked bitsets of a group, reusing the stack while no member changed.
+        """
+        group_key = tuple(sorted(set(member_ids), key=repr))
+        with self.__lock:
+            missing = [member_id for member_id in group_key if member_id not in self.__members]
+            if missing:
+                raise KeyError(f"unknown members : {missing}")
+            versions = tuple(self.__member_versions[member_id] for member_id in group_key)
+            cached = self.__groups.pop(group_key, None)
+            if cached is None or cached[0] != versions:
+                cached = (versions, np.stack([self.__members[member_id] for member_id in group_key]))
+            self.__groups[group_key] = cached
+            while len(self.__groups) > self.group_cache_size:
+                del self.__groups[next(iter(self.__groups))]
+            return cached[1]
+
+    def get_free_counts(self, member_ids: Sequence[Hashable]) -> np.ndarray:
+        """
+        Get the number of free members of every slot of the week.
+
+        Parameters
+        ----------
+        member_ids : Sequence[Hashable]
+            Members of the group.
+
+        Returns
+        -------
+        numpy.ndarray
+            Free member count per slot (length slot_count, Monday 00:00 first).
+        """
+        group_bits = self.__get_group_bits(member_ids)
+        busy_counts = np.unpackbits(group_bits, axis=1, count=self.slot_count).sum(axis=0, dtype=np.int32)
+        return group_bits.shape[0] - busy_counts
+
+    def find_free_windows(self,
+                          member_ids: Sequence[Hashable],
+                          min_free: Optional[int] = None,
+                          min_minutes: int = 30,
+                          days: Iterable[int] = range(5),
+                          day_start: int = 9 * 60,
+                          day_end: int = 21 * 60,
+                          limit: Optional[int] = None) -> list[FreeWindow]:
+        """
+        Get the windows where at least min_free members are free.
+
+        Parameters
+        ----------
+        member_ids : Sequence[Hashable]
+            Members of the group.
+        min_free : int, optional
+            Least number of free members (k of N), by default every member.
+        min_minutes : int, optional
+            Shortest window in minutes, by default 30.
+        days : Iterable[int], optional
+            Days to search (0 is Monday), by default Monday to Friday.
+        day_start : int, optional
+            First minute of a day to search, by default 9:00.
+        day_end : int, optional
+            Last minute of a day to search, by default 21:00.
+        limit : int, optional
+            Maximum number of windows, by default all.
+
+        Returns
+        -------
+        list of FreeWindow
+            Windows ranked by free member count, then length, then time.
+            A window is a run of slots that all have at least min_free free members, and its
+            free_count is the least free member count inside it.
+        """
+        free_counts = self.get_free_counts(member_ids)
+        member_count = len(set(member_ids))
+        min_free = member_count if min_free is None else min_free
+        min_slots = -(-min_minutes // self.slot_minutes)
+        slots_per_day = MINUTES_PER_DAY // self.slot_minutes
+        first_slot, last_slot = day_start // self.slot_minutes, day_end // self.slot_minutes
+
+        windows = []
+        for day in days:
+            day_counts = free_counts[day * slots_per_day + first_slot:day * slots_per_day + last_slot]
+            is_free = np.concatenate(([False], day_counts >= min_free, [False]))
+            edges = np.flatnonzero(np.diff(is_free.astype(np.int8)))
+            for start, end in zip(edges[::2], edges[1::2]):
+                if end - start < min_slots:
+                    continue
+                windows.append(FreeWindow(day,
+                                          int(first_slot + start) * self.slot_minutes,
+                                          int(first_slot + end) * self.slot_minutes,
+                                          int(day_counts[start:end].min()),
+                                          member_count))
+        windows.sort(key=lambda window: (-window.free_count, window.start - window.end, window.day, window.start))
+        return windows if limit is None else windows[:limit]
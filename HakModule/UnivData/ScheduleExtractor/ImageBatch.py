@@ -0,0 +1,218 @@
+"""
+Headless batch pipeline for schedule images.
+
+Images (paths or encoded bytes) are spread over a process pool. Every worker process keeps one
+OCRWorkerPool for its whole life, and results are streamed back as soon as each image finishes.
+Nothing here opens a window or waits for a key.
+"""
+import os
+import time
+import itertools
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, Optional, Union
+
+import cv2
+import numpy as np
+
+from HakModule.UnivData.ScheduleExtractor.ByImage import ImageToText
+from HakModule.UnivData.ScheduleExtractor.ByImageGrid import GridImageToText
+from HakModule.UnivData.ScheduleExtractor.ImageCache import ImageResultCache, run_with_cache
+from HakModule.UnivData.ScheduleExtractor.OCREngine import OCRWorkerPool
+
+# path, encoded bytes, or (key, path or bytes) so results of uploads can be matched by key
+ImageSource = Union[str, bytes, tuple]
+ImageResult = namedtuple('ImageResult', ['source', 'boxes', 'texts', 'schedule', 'timings', 'error'])
+
+IMAGE_EXTENSIONS: tuple[str, ...] = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+_worker_ocr_pool: Optional[OCRWorkerPool] = None
+_worker_cache: Optional[ImageResultCache] = None
+
+
+def iter_image_dir(dir_path: str) -> Iterator[str]:
+    """
+    Iterate over the image files of a directory in name order.
+
+    Parameters
+    ----------
+    dir_path : str
+        Directory of schedule images.
+
+    Yields
+    ------
+    str
+        Image path.
+    """
+    for file_name in sorted(os.listdir(dir_path)):
+        if file_name.lower().endswith(IMAGE_EXTENSIONS):
+            yield os.path.join(dir_path, file_name)
+
+
+def decode_image(source: ImageSource) -> Optional[np.ndarray]:
+    """
+    Decode an image path or encoded image bytes (ex) an uploaded file) to a BGR array.
+
+    Parameters
+    ----------
+    source : str or bytes
+        Image path or encoded image bytes.
+
+    Returns
+    -------
+    numpy.ndarray or None
+        Decoded image, or None if it can not be decoded.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return cv2.imread(source)
+
+
+def _init_worker(lang: str, ocr_worker_count: int, cache_dir: Optional[str] = None) -> None:
+    """
+    Create the OCR pool (and the result cache) of a worker process.
+    """
+    global _worker_ocr_pool, _worker_cache
+    _worker_ocr_pool = OCRWorkerPool(lang=lang, worker_count=ocr_worker_count)
+    _worker_cache = ImageResultCache(cache_dir) if cache_dir is not None else None
+
+
+def process_image(source: ImageSource,
+                  detect_mode: str = 'color',
+                  run_ocr: bool = True,
+                  ocr_pool: Optional[OCRWorkerPool] = None,
+                  setting_options: Optional[dict] = None,
+                  cache: Optional[ImageResultCache] = None) -> ImageResult:
+    """
+    Run decode, box detection and OCR for one image without any GUI.
+
+    Parameters
+    ----------
+    source : str, bytes or tuple
+        Image path, encoded image bytes or (key, path or bytes).
+    detect_mode : str, optional
+        'color' (palette contours, ImageToText) or 'grid' (GridImageToText), by default 'color'.
+    run_ocr : bool, optional
+        Whether to run OCR on the detected boxes, by default True.
+    ocr_pool : OCRWorkerPool, optional
+        OCR pool to use, by default the pool of the current worker process.
+    setting_options : dict, optional
+        Extra keyword arguments for ``run_setting_box``.
+    cache : ImageResultCache, optional
+        Result cache ('color' mode), by default the cache of the current worker process.
+
+    Returns
+    -------
+    ImageResult
+        Boxes, texts, schedule (grid mode), stage timings in seconds and the error message if it failed.
+        source is the key (or the path), or None for bare bytes.
+    """
+    if isinstance(source, tuple):
+        result_source, source = source
+    else:
+        result_source = source if isinstance(source, str) else None
+    timings: dict[str, float] = {}
+    try:
+        start_time = time.perf_counter()
+        image = decode_image(source)
+        timings['decode'] = time.perf_counter() - start_time
+        if image is None:
+            return ImageResult(result_source, [], [], None, timings, "can not decode image")
+
+        if detect_mode == 'grid':
+            image_to_text = GridImageToText(image=image)
+            image_to_text.run_setting_box(**(setting_options or {}))
+        elif detect_mode == 'color':
+            image_to_text = ImageToText(image=image)
+            cache = cache or _worker_cache
+            if cache is not None:
+                ocr_pool = ocr_pool or _worker_ocr_pool
+                run_with_cache(image_to_text, cache, run_ocr=run_ocr,
+                               lang=ocr_pool.lang if ocr_pool is not None else 'kor+eng',
+                               ocr_pool=ocr_pool, **(setting_options or {}))
+                run_ocr = False
+            else:
+                image_to_text.run_setting_box(**{**(setting_options or {}), 'show_palette': False,
+                                                 'show_boxes': False, 'wait': False})
+        else:
+            raise ValueError(f"unknown detect mode : {detect_mode}")
+
+        if run_ocr:
+            image_to_text.run_get_texts(ocr_pool=ocr_pool or _worker_ocr_pool)
+        timings.update(image_to_text.timings)
+
+        schedule = image_to_text.get_schedule() if detect_mode == 'grid' else None
+        return ImageResult(result_source, [tuple(box) for box in image_to_text.boxes], list(image_to_text.texts),
+                           schedule, timings, None)
+    except Exception as error:  # a broken image must not stop the batch
+        return ImageResult(result_source, [], [], None, timings, f"{type(error).__name__}: {error}")
+
+
+def iter_batch_results(images: Union[str, Iterable[ImageSource]],
+                       worker_count: Optional[int] = None,
+                       detect_mode: str = 'color',
+                       run_ocr: bool = True,
+                       lang: str = 'kor+eng',
+                       ocr_worker_count: int = 1,
+                       max_pending: Optional[int] = None,
+                       setting_options: Optional[dict] = None,
+                       cache_dir: Optional[str] = None) -> Iterator[ImageResult]:
+    """
+    Process images over a process pool and yield each result as soon as it is ready.
+
+    Parameters
+    ----------
+    images : str or Iterable of (str, bytes or tuple)
+        Directory of images, or an iterator of image paths, encoded image bytes or (key, bytes) pairs.
+        The iterator is read lazily, so it can be an endless stream of uploads.
+    worker_count : int, optional
+        Number of worker processes, by default the number of CPUs.
+    detect_mode : str, optional
+        'color' or 'grid', by default 'color'.
+    run_ocr : bool, optional
+        Whether to run OCR, by default True.
+    lang : str, optional
+        Tesseract language(s), by default 'kor+eng'.
+    ocr_worker_count : int, optional
+        OCR workers inside each process, by default 1.
+    max_pending : int, optional
+        Maximum images submitted but not yet yielded, by default 2 * worker_count.
+    setting_options : dict, optional
+        Extra keyword arguments for ``run_setting_box``.
+    cache_dir : str, optional
+        Directory of an ImageResultCache shared by the workers ('color' mode), by default no cache.
+
+    Yields
+    ------
+    ImageResult
+        Result of one image, in completion order (``source`` tells which image it is).
+    """
+    if isinstance(images, str):
+        images = iter_image_dir(images)
+    worker_count = worker_count or os.cpu_count() or 1
+    max_pending = max_pending or 2 * worker_count
+    source_iterator = iter(images)
+
+    with ProcessPoolExecutor(max_workers=worker_count,
+                             initializer=_init_worker,
+                             initargs=(lang, ocr_worker_count, cache_dir)) as executor:
+        pending: set[Future] = set()
+
+        def submit_next(count: int) -> None:
+            for source in itertools.islice(source_iterator, count):
+                pending.add(executor.submit(process_image, source, detect_mode, run_ocr, None, setting_options))
+
+        submit_next(max_pending)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield future.result()
+            submit_next(max_pending - len(pending))
+
+
+if __name__ == "__main__":
+    DIR_PATH: str = r'./HakFile/Test/HanyangImage'
+
+    for image_result in iter_batch_results(DIR_PATH):
+        print(image_result.source, image_result.timings, image_result.texts, image_result.error)
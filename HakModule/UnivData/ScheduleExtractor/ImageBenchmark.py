@@ -0,0 +1,504 @@
+"""
+Benchmarks for the schedule image extractor.
+
+- ``generate_timetable_image`` renders a synthetic timetable screenshot from scraped class datas
+  and returns the ground truth (block boxes, colors and texts) with it.
+- ``run_benchmark`` runs ImageToText over such images and reports the time of every stage
+  with the box and text accuracy, so a pipeline change can be judged on speed and correctness.
+- ``benchmark_detect_scale`` runs box detection at full resolution and on downscaled masks over
+  many images, and fails if the mapped back boxes do not match the full resolution ones.
+"""
+import random
+import time
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional, Sequence
+
+import cv2
+import numpy as np
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = ImageDraw = ImageFont = None
+
+from HakModule.UnivData.HYU_S.Catalog.catalog_file import iter_catalog_dir
+from HakModule.UnivData.HYU_S.Catalog.course_lexicon import get_edit_distance, normalize_name
+from HakModule.UnivData.HYU_S.Catalog.schedule import DAY_NAMES, DAY_NAMES_EN, parse_schedule
+from HakModule.UnivData.ScheduleExtractor.ByImage import ColorRGB, ImageBox2D, ImageToText
+from HakModule.UnivData.ScheduleExtractor.OCREngine import OCRWorkerPool
+
+BoxMatch = namedtuple('BoxMatch', ['matched', 'expected', 'actual', 'mean_iou'])
+ScaleBenchmark = namedtuple('ScaleBenchmark', ['scale', 'seconds', 'timings', 'match'])
+SyntheticBlock = namedtuple('SyntheticBlock', ['day', 'start', 'end', 'box', 'color', 'name', 'text'])
+BenchmarkReport = namedtuple('BenchmarkReport', ['image_count', 'timings', 'box_precision', 'box_recall',
+                                                 'mean_iou', 'text_accuracy', 'text_similarity',
+                                                 'corrected_accuracy'])
+
+# block colors of the Everytime timetable
+BLOCK_COLORS: list[ColorRGB] = [
+    ColorRGB(242, 139, 130), ColorRGB(247, 179, 110), ColorRGB(243, 206, 97), ColorRGB(146, 203, 119),
+    ColorRGB(102, 196, 189), ColorRGB(110, 171, 236), ColorRGB(150, 141, 232), ColorRGB(214, 138, 214),
+    ColorRGB(178, 153, 121), ColorRGB(233, 124, 161),
+]
+
+
+def calculate_iou(box1: ImageBox2D, box2: ImageBox2D) -> float:
+    """
+    Calculate the intersection over union of two boxes.
+
+    Parameters
+    ----------
+    box1 : ImageBox2D
+        First box.
+    box2 : ImageBox2D
+        Second box.
+
+    Returns
+    -------
+    float
+        Intersection area divided by union area (0 if they do not touch).
+
+    """
+    x1, y1 = max(box1.x, box2.x), max(box1.y, box2.y)
+    x2, y2 = min(box1.x + box1.w, box2.x + box2.w), min(box1.y + box1.h, box2.y + box2.h)
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = box1.w * box1.h + box2.w * box2.h - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def pair_boxes(expected: Sequence[ImageBox2D], actual: Sequence[ImageBox2D],
+               iou_threshold: float = 0.8) -> list[tuple[int, int, float]]:
+    """
+    Greedily pair boxes one to one by IoU.
+
+    Parameters
+    ----------
+    expected : Sequence[ImageBox2D]
+        Reference boxes (ex) full resolution detection or ground truth).
+    actual : Sequence[ImageBox2D]
+        Boxes to check.
+    iou_threshold : float, optional
+        Minimum IoU of a pair, by default 0.8.
+
+    Returns
+    -------
+    list of tuple[int, int, float]
+        (expected index, actual index, IoU) of every pair, best IoU first.
+
+    """
+    candidates = sorted(((calculate_iou(expected_box, actual_box), expected_index, actual_index)
+                         for expected_index, expected_box in enumerate(expected)
+                         for actual_index, actual_box in enumerate(actual)),
+                        reverse=True)
+    used_expected, used_actual = set(), set()
+    pairs = []
+    for iou, expected_index, actual_index in candidates:
+        if iou < iou_threshold:
+            break
+        if expected_index in used_expected or actual_index in used_actual:
+            continue
+        used_expected.add(expected_index)
+        used_actual.add(actual_index)
+        pairs.append((expected_index, actual_index, iou))
+    return pairs
+
+
+def match_boxes(expected: Sequence[ImageBox2D], actual: Sequence[ImageBox2D],
+                iou_threshold: float = 0.8) -> BoxMatch:
+    """
+    Greedily match boxes one to one by IoU.
+
+    Parameters
+    ----------
+    expected : Sequence[ImageBox2D]
+        Reference boxes (ex) full resolution detection or ground truth).
+    actual : Sequence[ImageBox2D]
+        Boxes to check.
+    iou_threshold : float, optional
+        Minimum IoU of a match, by default 0.8.
+
+    Returns
+    -------
+    BoxMatch
+        Number of matches, number of expected and actual boxes, and the mean IoU of the matches.
+
+    """
+    ious = [iou for _, _, iou in pair_boxes(expected, actual, iou_threshold)]
+    return BoxMatch(len(ious), len(expected), len(actual), float(np.mean(ious)) if ious else 0.0)
+
+
+def _draw_texts(image: np.ndarray, texts: list[tuple[tuple[int, int], str, tuple[int, int, int], int]],
+                font_path: Optional[str]) -> np.ndarray:
+    """
+    Draw (position, text, BGR color, size) texts. Pillow with font_path is needed for hangul.
+    """
+    if font_path is None:
+        for (x, y), text, color, size in texts:
+            cv2.putText(image, text, (x, y + size), cv2.FONT_HERSHEY_SIMPLEX, size / 30, color, 2, cv2.LINE_AA)
+        return image
+    if Image is None:
+        raise ImportError("Pillow is needed to draw texts with a font")
+    pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    draw = ImageDraw.Draw(pil_image)
+    fonts = {}
+    for (x, y), text, color, size in texts:
+        if size not in fonts:
+            fonts[size] = ImageFont.truetype(font_path, size)
+        draw.text((x, y), text, font=fonts[size], fill=(color[2], color[1], color[0]))
+    return cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+
+
+def _wrap_text(text: str, width: int, size: int, font_path: Optional[str]) -> list[str]:
+    """
+    Split a text into lines that fit the width, between words when possible.
+    """
+    if font_path is None:
+        def measure(line: str) -> float:
+            return cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX, size / 30, 2)[0][0]
+    else:
+        font = ImageFont.truetype(font_path, size)
+
+        def measure(line: str) -> float:
+            return font.getlength(line)
+
+    lines = []
+    line = ''
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if measure(candidate) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        line = ''
+        for char in word:
+            if line and measure(line + char) > width:
+                lines.append(line)
+                line = ''
+            line += char
+    if line:
+        lines.append(line)
+    return lines
+
+
+def generate_timetable_image(datas: Iterable[dict],
+                             language: str = 'en',
+                             font_path: Optional[str] = None,
+                             start_hour: int = 9,
+                             end_hour: int = 19,
+                             day_count: int = 5,
+                             day_width: int = 220,
+                             hour_height: int = 140,
+                             font_size: int = 24,
+                             seed: Optional[int] = None) -> tuple[np.ndarray, list[SyntheticBlock]]:
+    """
+    Render a synthetic timetable screenshot (Everytime layout) from class datas.
+
+    Classes whose slots overlap an already drawn class or leave the drawn hours are skipped.
+
+    Parameters
+    ----------
+    datas : Iterable[dict]
+        Class datas in the ``HYUSeoulClassData.datas`` shape, in drawing order.
+    language : str, optional
+        'en' (name_en) or 'kr' (name_kr), by default 'en'. 'kr' needs font_path.
+    font_path : str, optional
+        TrueType font with hangul (ex) NanumGothic.ttf), drawn with Pillow. By default the OpenCV font is used.
+    start_hour : int, optional
+        First hour of the grid, by default 9.
+    end_hour : int, optional
+        Last hour of the grid, by default 19.
+    day_count : int, optional
+        Number of day columns, by default 5 (Mon-Fri).
+    day_width : int, optional
+        Width of a day column, by default 220.
+    hour_height : int, optional
+        Height of an hour row, by default 140.
+    font_size : int, optional
+        Text size in pixels, by default 24.
+    seed : int, optional
+        Seed of the block colors.
+
+    Returns
+    -------
+    tuple[numpy.ndarray, list of SyntheticBlock]
+        BGR image and the ground truth of every drawn block (one per slot).
+
+    """
+    if language == 'kr' and font_path is None:
+        raise ValueError("font_path with hangul is needed to draw korean names")
+    random_generator = random.Random(seed)
+    label_width, header_height = 60, 60
+    width = label_width + day_width * day_count + 1
+    height = header_height + hour_height * (end_hour - start_hour) + 1
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    texts = []
+    day_names = DAY_NAMES if language == 'kr' else DAY_NAMES_EN
+    for day in range(day_count + 1):
+        x = label_width + day * day_width
+        cv2.line(image, (x, 0), (x, height - 1), (230, 230, 230), 1)
+        if day < day_count:
+            texts.append(((x + day_width // 2 - font_size, 15), day_names[day], (120, 120, 120), font_size))
+    for hour in range(end_hour - start_hour + 1):
+        y = header_height + hour * hour_height
+        cv2.line(image, (0, y), (width - 1, y), (230, 230, 230), 1)
+        if hour < end_hour - start_hour:
+            texts.append(((10, y + 5), str(start_hour + hour), (120, 120, 120), font_size))
+
+    blocks = []
+    occupied: list[list[tuple[int, int]]] = [[] for _ in range(day_count)]
+    for data in datas:
+        course_info = data.get('course_info') or {}
+        name = course_info.get(f'name_{language}') or ''
+        slots = [slot for slot in parse_schedule(course_info)
+                 if slot.day < day_count and start_hour * 60 <= slot.start < slot.end <= end_hour * 60]
+        if font_path is None:
+            name = name.encode('ascii', 'ignore').decode('ascii').strip()
+        if not name or not slots or any(start < slot.end and slot.start < end
+                                        for slot in slots for start, end in occupied[slot.day]):
+            continue
+        color = BLOCK_COLORS[random_generator.randrange(len(BLOCK_COLORS))]
+        for slot in slots:
+            occupied[slot.day].append((slot.start, slot.end))
+            x = label_width + slot.day * day_width + 1
+            y = header_height + int((slot.start - start_hour * 60) * hour_height / 60) + 1
+            h = int((slot.end - slot.start) * hour_height / 60) - 1
+            box = ImageBox2D(x, y, day_width - 1, h)
+            cv2.rectangle(image, (x, y), (x + box.w - 1, y + h - 1), (color.b, color.g, color.r), -1)
+
+            room = ' '.join(part for part in (slot.building, slot.room) if part)
+            if font_path is None:
+                # the OpenCV font only has ascii
+                room = room.encode('ascii', 'ignore').decode('ascii').strip()
+            lines = _wrap_text(name, box.w - 16, font_size, font_path)
+            lines += _wrap_text(room, box.w - 16, int(font_size * 0.8), font_path) if room else []
+            text_y = y + 8
+            for line_index, line in enumerate(lines):
+                size = font_size if line_index < len(lines) - (1 if room else 0) else int(font_size * 0.8)
+                if text_y + size > y + h - 4:
+                    break
+                texts.append(((x + 8, text_y), line, (255, 255, 255), size))
+                text_y += int(size * 1.3)
+            blocks.append(SyntheticBlock(slot.day, slot.start, slot.end, box, color, name,
+                                         f"{name} {room}".strip()))
+    return _draw_texts(image, texts, font_path), blocks
+
+
+def generate_timetable_samples(datas: Sequence[dict],
+                               count: int = 10,
+                               class_count: int = 12,
+                               seed: int = 0,
+                               **options) -> Iterator[tuple[np.ndarray, list[SyntheticBlock]]]:
+    """
+    Generate synthetic timetables from random classes.
+
+    Parameters
+    ----------
+    datas : Sequence[dict]
+        Class datas to pick from (ex) ``list(iter_catalog_dir(...))``).
+    count : int, optional
+        Number of images, by default 10.
+    class_count : int, optional
+        Number of classes tried per image, by default 12.
+    seed : int, optional
+        Seed, so the same samples are generated every run, by default 0.
+    **options
+        Extra keyword arguments for ``generate_timetable_image``.
+
+    Yields
+    ------
+    tuple[numpy.ndarray, list of SyntheticBlock]
+        Image and ground truth.
+
+    """
+    random_generator = random.Random(seed)
+    for index in range(count):
+        picked = random_generator.sample(list(datas), min(class_count, len(datas)))
+        yield generate_timetable_image(picked, seed=seed * 1000 + index, **options)
+
+
+def get_text_similarity(text: str, expected: str) -> float:
+    """
+    Get the similarity (1 - edit distance / length) of an OCR text to the start of its expected text.
+
+    Parameters
+    ----------
+    text : str
+        OCR text.
+    expected : str
+        Expected course name.
+
+    Returns
+    -------
+    float
+        1.0 if the normalized text starts with the normalized name.
+
+    """
+    text, expected = normalize_name(text), normalize_name(expected)
+    if not expected:
+        return 0.0
+    return max(0.0, 1.0 - get_edit_distance(text[:len(expected)], expected) / len(expected))
+
+
+def run_benchmark(samples: Iterable[tuple[np.ndarray, list[SyntheticBlock]]],
+                  run_ocr: bool = True,
+                  ocr_pool: Optional[OCRWorkerPool] = None,
+                  lexicon=None,
+                  iou_threshold: float = 0.7,
+                  **setting_options) -> BenchmarkReport:
+    """
+    Run ImageToText over synthetic timetables and measure speed and accuracy.
+
+    Parameters
+    ----------
+    samples : Iterable[tuple[numpy.ndarray, list of SyntheticBlock]]
+        Images with their ground truth (ex) ``generate_timetable_samples``).
+    run_ocr : bool, optional
+        Whether to run OCR and measure the texts, by default True.
+    ocr_pool : OCRWorkerPool, optional
+        Pool of long-lived OCR workers, by default None.
+    lexicon : CourseNameLexicon, optional
+        If given, texts are also corrected and the corrected accuracy is measured.
+    iou_threshold : float, optional
+        Minimum IoU of a detected box to count as a block, by default 0.7.
+    **setting_options
+        Extra keyword arguments for ``run_setting_box`` (ex) detect_scale).
+
+    Returns
+    -------
+    BenchmarkReport
+        Mean seconds of every stage (palette, segmentation, nms, ocr, ...), box precision and recall,
+        mean IoU of the matched boxes, and for matched boxes the ratio of texts starting with the course
+        name, the mean text similarity and the ratio of corrections to the right name (None if not measured).
+
+    """
+    setting_options = {**setting_options, 'show_palette': False, 'show_boxes': False, 'wait': False}
+    image_count = 0
+    timings: dict[str, float] = {}
+    expected_count = detected_count = 0
+    ious, similarities, corrected = [], [], []
+    for image, blocks in samples:
+        image_count += 1
+        image_to_text = ImageToText(image=image)
+        image_to_text.run_setting_box(**setting_options)
+        if run_ocr:
+            image_to_text.run_get_texts(ocr_pool=ocr_pool)
+            if lexicon is not None:
+                image_to_text.run_correct_texts(lexicon)
+        for stage, seconds in image_to_text.timings.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+        expected_count += len(blocks)
+        detected_count += len(image_to_text.boxes)
+        for block_index, box_index, iou in pair_boxes([block.box for block in blocks], image_to_text.boxes,
+                                                      iou_threshold):
+            ious.append(iou)
+            if run_ocr:
+                similarities.append(get_text_similarity(image_to_text.texts[box_index], blocks[block_index].name))
+            if image_to_text.corrections:
+                corrected.append(image_to_text.corrections[box_index].name == blocks[block_index].name)
+
+    return BenchmarkReport(
+        image_count=image_count,
+        timings={stage: seconds / max(1, image_count) for stage, seconds in timings.items()},
+        box_precision=len(ious) / detected_count if detected_count else 0.0,
+        box_recall=len(ious) / expected_count if expected_count else 0.0,
+        mean_iou=float(np.mean(ious)) if ious else 0.0,
+        text_accuracy=float(np.mean([similarity == 1.0 for similarity in similarities])) if similarities else None,
+        text_similarity=float(np.mean(similarities)) if similarities else None,
+        corrected_accuracy=float(np.mean(corrected)) if corrected else None,
+    )
+
+
+def benchmark_detect_scale(images: Iterable[np.ndarray], scales: Sequence[float] = (1.0, 0.5, 0.25),
+                           repeat: int = 3, iou_threshold: float = 0.8, strict: bool = True,
+                           **setting_options) -> list[ScaleBenchmark]:
+    """
+    Compare box detection at full resolution with detection on downscaled masks.
+
+    Parameters
+    ----------
+    images : Iterable[numpy.ndarray]
+        Input images in BGR format.
+    scales : Sequence[float], optional
+        Detection scales to run, by default (1.0, 0.5, 0.25). Boxes of the first scale are the reference.
+    repeat : int, optional
+        Runs per scale and image. The fastest run is reported, by default 3.
+    iou_threshold : float, optional
+        Minimum IoU of a box match, by default 0.8.
+    strict : bool, optional
+        Whether to raise when the boxes of a scale do not match the reference on every image,
+        by default True.
+    **setting_options
+        Extra keyword arguments for ``ImageToText.run_setting_box``.
+
+    Returns
+    -------
+    list of ScaleBenchmark
+        Mean of the best seconds and stage timings over the images, and the box match against
+        the reference summed over the images, for every scale.
+
+    Raises
+    ------
+    ValueError
+        If ``strict`` and a scale misses, adds or moves a box on any image.
+
+    """
+    setting_options = {**setting_options, 'show_palette': False, 'show_boxes': False, 'wait': False}
+    seconds = {scale: 0.0 for scale in scales}
+    timings = {scale: {} for scale in scales}
+    matches = {scale: [] for scale in scales}
+    mismatches = []
+    image_count = 0
+    for image_index, image in enumerate(images):
+        image_count += 1
+        reference = None
+        for scale in scales:
+            best_seconds, best_timings, boxes = None, None, []
+            for _ in range(repeat):
+                image_to_text = ImageToText(image=image)
+                start_time = time.perf_counter()
+                image_to_text.run_setting_box(detect_scale=scale, **setting_options)
+                run_seconds = time.perf_counter() - start_time
+                if best_seconds is None or run_seconds < best_seconds:
+                    best_seconds, best_timings = run_seconds, image_to_text.timings
+                boxes = image_to_text.boxes
+            if reference is None:
+                reference = boxes
+            match = match_boxes(reference, boxes, iou_threshold)
+            if match.matched != match.expected or match.actual != match.expected:
+                mismatches.append(f"image {image_index} scale {scale} : "
+                                  f"{match.matched}/{match.expected} matched, {match.actual} detected")
+            seconds[scale] += best_seconds
+            for stage, stage_seconds in best_timings.items():
+                timings[scale][stage] = timings[scale].get(stage, 0.0) + stage_seconds
+            matches[scale].append(match)
+    if strict and mismatches:
+        raise ValueError("boxes do not match the full resolution detection\n" + '\n'.join(mismatches))
+
+    results = []
+    for scale in scales:
+        matched = sum(match.matched for match in matches[scale])
+        total_iou = sum(match.mean_iou * match.matched for match in matches[scale])
+        match = BoxMatch(matched, sum(match.expected for match in matches[scale]),
+                         sum(match.actual for match in matches[scale]), total_iou / matched if matched else 0.0)
+        results.append(ScaleBenchmark(scale, seconds[scale] / max(1, image_count),
+                                      {stage: stage_seconds / max(1, image_count)
+                                       for stage, stage_seconds in timings[scale].items()}, match))
+    return results
+
+
+if __name__ == "__main__":
+    CATALOG_DIR_PATH: str = r'./HakFile/UnivData/HYU_S'
+
+    class_datas = list(iter_catalog_dir(CATALOG_DIR_PATH))
+    samples = list(generate_timetable_samples(class_datas, count=20))
+    for detect_scale in (1.0, 0.5):
+        report = run_benchmark(samples, run_ocr=False, detect_scale=detect_scale)
+        print(f"detect scale {detect_scale} : {report}")
+
+    for result in benchmark_detect_scale([image for image, _ in samples]):
+        print(f"  scale {result.scale:.2f} : {result.seconds * 1000:.1f} ms, "
+              f"{result.match.matched}/{result.match.expected} boxes matched "
+              f"(iou {result.match.mean_iou:.3f}), timings {result.timings}")
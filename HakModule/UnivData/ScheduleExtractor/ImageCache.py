@@ -0,0 +1,415 @@
+"""
+Disk cache for schedule image results.
+
+The same timetable screenshot is often uploaded again with only the status bar or the compression changed.
+
+- detected boxes are stored under a perceptual hash (dHash) of the whole image and a fingerprint of
+  the detection settings, and an image whose hash is within a small Hamming distance (with the same
+  size and settings) reuses them.
+- OCR texts are stored under an exact hash of every cropped cell, so cells that did not change keep
+  their text even when the rest of the image changed.
+
+Every entry is one small file. Reads refresh the file mtime, and the oldest files are removed when
+the cache grows over its size limit (LRU on disk), so several processes can share one cache directory.
+"""
+import os
+import json
+import hashlib
+import inspect
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from HakModule.UnivData.ScheduleExtractor.ByImage import ImageBox2D, ImageToText, extract_text_from_image
+from HakModule.UnivData.ScheduleExtractor.OCREngine import OCRWorkerPool
+
+IMAGE_DIR_NAME: str = 'images'
+TEXT_DIR_NAME: str = 'texts'
+# run_setting_box options that only change what is displayed, not the detected boxes
+DISPLAY_OPTIONS: set[str] = {'show_palette', 'show_boxes', 'box_contour_color', 'show_box_resize', 'wait'}
+
+
+def get_perceptual_hash(image: np.ndarray, hash_size: int = 16) -> int:
+    """
+    Compute the difference hash (dHash) of an image.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Input image in BGR format.
+    hash_size : int, optional
+        The hash has hash_size * hash_size bits, by default 16.
+
+    Returns
+    -------
+    int
+        Hash bits. Similar images have a small Hamming distance.
+
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, dsize=(hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def get_hamming_distance(hash1: int, hash2: int) -> int:
+    """
+    Count the different bits of two hashes.
+    """
+    return bin(hash1 ^ hash2).count('1')
+
+
+def get_crop_hash(image: np.ndarray, box: ImageBox2D, lang: str = 'kor+eng') -> str:
+    """
+    Compute the exact hash of a cropped cell.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Input image in BGR format.
+    box : ImageBox2D
+        Cell box.
+    lang : str, optional
+        OCR language(s), part of the key since the text depends on it, by default 'kor+eng'.
+
+    Returns
+    -------
+    str
+        Hex digest.
+
+    """
+    x, y, w, h = box
+    crop = np.ascontiguousarray(image[y:y + h, x:x + w])
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(lang.encode('UTF-8'))
+    digest.update(str(crop.shape).encode('UTF-8'))
+    digest.update(crop.tobytes())
+    return digest.hexdigest()
+
+
+def get_settings_fingerprint(image_to_text: ImageToText, setting_options: dict) -> str:
+    """
+    Compute a stable fingerprint of the options that change the detected boxes.
+
+    Options are bound to the ``run_setting_box`` signature of the extractor class with its defaults,
+    so leaving an option out and passing its default give the same fingerprint. The extractor
+    class is part of it since each class detects boxes its own way.
+
+    Parameters
+    ----------
+    image_to_text : ImageToText
+        Extractor (ex) ImageToText or GridImageToText).
+    setting_options : dict
+        Keyword arguments for ``run_setting_box``.
+
+    Returns
+    -------
+    str
+        Hex digest.
+
+    """
+    signature = inspect.signature(type(image_to_text).run_setting_box)
+    bound = signature.bind_partial(image_to_text, **setting_options)
+    bound.apply_defaults()
+    settings = {}
+    for name, value in bound.arguments.items():
+        if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+            settings.update(value)
+        elif name != 'self':
+            settings[name] = value
+    settings = {name: value for name, value in settings.items() if name not in DISPLAY_OPTIONS}
+    text = json.dumps([type(image_to_text).__name__, settings], sort_keys=True, default=repr)
+    return hashlib.blake2b(text.encode('UTF-8'), digest_size=8).hexdigest()
+
+
+class ImageResultCache:
+    """
+    Size-bounded disk cache of detected boxes and per-cell OCR texts.
+
+    Attributes
+    ----------
+    cache_dir : str
+        Directory of the cache files.
+    max_bytes : int
+        Size limit of the cache files.
+    hash_size : int
+        Size of the perceptual hash.
+    max_distance : int
+        Maximum Hamming distance of a near duplicate image.
+
+    Methods
+    -------
+    get_boxes(image, settings_key='')
+        Get the boxes of the same or a near duplicate image detected with the same settings.
+    put_boxes(image, boxes, settings_key='')
+        Store the boxes of an image.
+    get_text(crop_hash)
+        Get the OCR text of a cell.
+    put_text(crop_hash, text)
+        Store the OCR text of a cell.
+    clear()
+        Remove every cache file.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = 64 * 1024 * 1024, hash_size: int = 16,
+                 max_distance: int = 12):
+        """
+        Initialize the ImageResultCache.
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory of the cache files. It is created if it does not exist.
+        max_bytes : int, optional
+            Size limit of the cache files, by default 64MB.
+        hash_size : int, optional
+            Size of the perceptual hash, by default 16 (256 bits).
+        max_distance : int, optional
+            Maximum Hamming distance of a near duplicate image, by default 12.
+        """
+        self.cache_dir: str = cache_dir
+        self.max_bytes: int = max_bytes
+        self.hash_size: int = hash_size
+        self.max_distance: int = max_distance
+
+        self.__image_dir: str = os.path.join(cache_dir, IMAGE_DIR_NAME)
+        self.__text_dir: str = os.path.join(cache_dir, TEXT_DIR_NAME)
+        os.makedirs(self.__image_dir, exist_ok=True)
+        os.makedirs(self.__text_dir, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__size: int = sum(entry.stat().st_size for _, entry in self.__iter_entries())
+
+    def __iter_entries(self):
+        """
+        Iterate over (directory, entry) of every cache file.
+        """
+        for dir_path in (self.__image_dir, self.__text_dir):
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith('.'):
+                        yield dir_path, entry
+
+    def __get_image_path(self, image_hash: int, shape: tuple, settings_key: str) -> str:
+        return os.path.join(self.__image_dir, f"{image_hash:0{self.hash_size * self.hash_size // 4}x}"
+                                              f"{self.__get_image_suffix(shape, settings_key)}")
+
+    @staticmethod
+    def __get_image_suffix(shape: tuple, settings_key: str) -> str:
+        return f"_{shape[1]}x{shape[0]}_{settings_key}.json"
+
+    @staticmethod
+    def __touch(path: str) -> None:
+        """
+        Mark a cache file as recently used.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def __write(self, path: str, content: str) -> None:
+        """
+        Write a cache file atomically and evict the oldest files if the cache is too big.
+        """
+        data = content.encode('UTF-8')
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        with self.__lock:
+            self.__size += len(data)
+            if self.__size > self.max_bytes:
+                self.__evict()
+
+    def __evict(self) -> None:
+        """
+        Remove the least recently used files until the cache is under 90% of its limit.
+        """
+        entries = []
+        for _, entry in self.__iter_entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        self.__size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self.__size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.__size -= size
+
+    def get_boxes(self, image: np.ndarray, settings_key: str = '') -> Optional[list[ImageBox2D]]:
+        """
+        Get the boxes of the same or a near duplicate image detected with the same settings.
+
+        Parameters
+        ----------
+        image : numpy.ndarray
+            Input image in BGR format.
+        settings_key : str, optional
+            Fingerprint of the detection settings (``get_settings_fingerprint``), by default ''.
+
+        Returns
+        -------
+        list of ImageBox2D or None
+            Cached boxes, or None if there is no image within max_distance with the same size
+            and settings.
+
+        """
+        image_hash = get_perceptual_hash(image, self.hash_size)
+        path = self.__get_image_path(image_hash, image.shape, settings_key)
+        if not os.path.exists(path):
+            suffix = self.__get_image_suffix(image.shape, settings_key)
+            best_distance, path = None, None
+            with os.scandir(self.__image_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(suffix) or entry.name.startswith('.'):
+                        continue
+                    distance = get_hamming_distance(image_hash, int(entry.name[:-len(suffix)], 16))
+                    if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                        best_distance, path = distance, entry.path
+            if path is None:
+                return None
+        try:
+            with open(path, "r", encoding='UTF-8') as file:
+                boxes = json.load(file)['boxes']
+        except (OSError, ValueError, KeyError):
+            return None
+        self.__touch(path)
+        return [ImageBox2D(*box) for box in boxes]
+
+    def put_boxes(self, image: np.ndarray, boxes: list[ImageBox2D], settings_key: str = '') -> None:
+        """
+        Store the boxes of an image.
+
+        Parameters
+        ----------
+        image : numpy.ndarray
+            Input image in BGR format.
+        boxes : list of ImageBox2D
+            Detected boxes.
+        settings_key : str, optional
+            Fingerprint of the detection settings (``get_settings_fingerprint``), by default ''.
+
+        """
+        path = self.__get_image_path(get_perceptual_hash(image, self.hash_size), image.shape, settings_key)
+        self.__write(path, json.dumps({'boxes': [list(map(int, box)) for box in boxes], 'time': time.time()}))
+
+    def get_text(self, crop_hash: str) -> Optional[str]:
+        """
+        Get the OCR text of a cell.
+
+        Parameters
+        ----------
+        crop_hash : str
+            Hash from ``get_crop_hash``.
+
+        Returns
+        -------
+        str or None
+            Cached text, or None on a miss.
+
+        """
+        path = os.path.join(self.__text_dir, f"{crop_hash}.txt")
+        try:
+            with open(path, "r", encoding='UTF-8') as file:
+                text = file.read()
+        except OSError:
+            return None
+        self.__touch(path)
+        return text
+
+    def put_text(self, crop_hash: str, text: str) -> None:
+        """
+        Store the OCR text of a cell.
+
+        Parameters
+        ----------
+        crop_hash : str
+            Hash from ``get_crop_hash``.
+        text : str
+            OCR text.
+
+        """
+        self.__write(os.path.join(self.__text_dir, f"{crop_hash}.txt"), text)
+
+    def clear(self) -> None:
+        """
+        Remove every cache file.
+        """
+        with self.__lock:
+            for _, entry in list(self.__iter_entries()):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            self.__size = 0
+
+
+def run_with_cache(image_to_text: ImageToText, cache: ImageResultCache, run_ocr: bool = True,
+                   lang: str = 'kor+eng', ocr_pool: Optional[OCRWorkerPool] = None,
+                   **setting_options) -> None:
+    """
+    Set boxes and texts of an ImageToText, reusing cached results.
+
+    Boxes of a near duplicate image detected with the same settings skip ``run_setting_box``, and only cells whose crop is not cached are sent to OCR.
+    ``timings`` gets 'cache' (lookups) and 'ocr' (only the missed cells).
+
+    Parameters
+    ----------
+    image_to_text : ImageToText
+        Extractor with the image loaded.
+    cache : ImageResultCache
+        Result cache.
+    run_ocr : bool, optional
+        Whether to set texts, by default True.
+    lang : str, optional
+        Tesseract language(s), by default 'kor+eng'.
+    ocr_pool : OCRWorkerPool, optional
+        Pool of long-lived OCR workers, by default None.
+    **setting_options
+        Extra keyword arguments for ``run_setting_box`` on a miss.
+
+    Returns
+    -------
+    None
+
+    """
+    image = image_to_text.original_image
+    start_time = time.perf_counter()
+    settings_key = get_settings_fingerprint(image_to_text, setting_options)
+    boxes = cache.get_boxes(image, settings_key)
+    image_to_text.timings['cache'] = time.perf_counter() - start_time
+    if boxes is None:
+        image_to_text.run_setting_box(**{**setting_options, 'show_palette': False, 'show_boxes': False,
+                                         'wait': False})
+        cache.put_boxes(image, image_to_text.boxes, settings_key)
+    else:
+        image_to_text.boxes = boxes
+    if not run_ocr:
+        return
+
+    start_time = time.perf_counter()
+    crop_hashes = [get_crop_hash(image, box, lang) for box in image_to_text.boxes]
+    texts = [cache.get_text(crop_hash) for crop_hash in crop_hashes]
+    image_to_text.timings['cache'] += time.perf_counter() - start_time
+
+    missing = [index for index, text in enumerate(texts) if text is None]
+    start_time = time.perf_counter()
+    if missing:
+        missing_texts = extract_text_from_image(image, [image_to_text.boxes[index] for index in missing],
+                                                lang=lang, ocr_pool=ocr_pool)
+        for index, text in zip(missing, missing_texts):
+            texts[index] = text
+            cache.put_text(crop_hashes[index], text)
+    image_to_text.timings['ocr'] = time.perf_counter() - start_time
+    image_to_text.texts = texts
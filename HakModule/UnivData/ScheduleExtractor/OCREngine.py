@@ -0,0 +1,236 @@
+"""
+OCR engine layer for the schedule image extractor.
+
+``pytesseract.image_to_string`` starts a new tesseract process (and reloads the language models)
+for every call. OCRWorkerPool keeps long-lived workers instead:
+
+- with ``tesserocr`` installed (the intended setup), every worker thread keeps one loaded
+  tesseract API, so the models are loaded once per worker.
+- without it, cells with the same config are sent to one tesseract process per worker as a
+  multi-page list file, so the models are loaded once per worker batch instead of once per cell.
+  A process per cell costs about 4 times a cell of a batch (eng model, tesseract 5.5).
+"""
+import os
+import math
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+OCRConfig = namedtuple('OCRConfig', ['psm', 'whitelist'], defaults=[None, None])
+
+PAGE_SEPARATOR: str = '\f'
+
+
+def build_tesseract_config(config: Optional[OCRConfig]) -> str:
+    """
+    Convert an OCRConfig to tesseract command line options.
+
+    Parameters
+    ----------
+    config : OCRConfig or None
+        Page segmentation mode and character whitelist.
+
+    Returns
+    -------
+    str
+        Options for ``pytesseract`` (ex) '--psm 6 -c tessedit_char_whitelist=0123456789').
+    """
+    if config is None:
+        return ''
+    options = []
+    if config.psm is not None:
+        options.append(f"--psm {config.psm}")
+    if config.whitelist is not None:
+        options.append(f"-c tessedit_char_whitelist={config.whitelist}")
+    return ' '.join(options)
+
+
+class OCRWorkerPool:
+    """
+    Pool of long-lived OCR workers.
+
+    Attributes
+    ----------
+    lang : str
+        Tesseract language(s).
+    worker_count : int
+        Number of workers.
+    use_tesserocr : bool
+        Whether workers keep a loaded tesserocr API.
+
+    Methods
+    -------
+    start()
+        Start the workers.
+    close()
+        Stop the workers and release the loaded models.
+    recognize(images, configs=None)
+        Recognize images and return texts in the same order.
+    """
+    def __init__(self, lang: str = 'kor+eng', worker_count: Optional[int] = None,
+                 use_tesserocr: Optional[bool] = None):
+        """
+        Initialize the OCRWorkerPool.
+
+        Parameters
+        ----------
+        lang : str, optional
+            Tesseract language(s), by default 'kor+eng'.
+        worker_count : int, optional
+            Number of workers, by default the number of CPUs.
+        use_tesserocr : bool, optional
+            Force (True) or disable (False) tesserocr, by default it is used when installed.
+        """
+        self.lang: str = lang
+        self.worker_count: int = worker_count or os.cpu_count() or 1
+        if use_tesserocr is None:
+            use_tesserocr = tesserocr is not None
+        elif use_tesserocr and tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        self.use_tesserocr: bool = use_tesserocr
+
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__local = threading.local()
+        self.__apis: list = []
+        self.__apis_lock = threading.Lock()
+
+    def __enter__(self) -> 'OCRWorkerPool':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Start the workers.
+        """
+        if self.__executor is not None:
+            return
+        self.__executor = ThreadPoolExecutor(max_workers=self.worker_count, thread_name_prefix='ocr')
+
+    def close(self) -> None:
+        """
+        Stop the workers and release the loaded models.
+        """
+        if self.__executor is None:
+            return
+        self.__executor.shutdown(wait=True)
+        self.__executor = None
+        with self.__apis_lock:
+            for api in self.__apis:
+                api.End()
+            self.__apis.clear()
+        self.__local = threading.local()
+
+    def recognize(self, images: Sequence[np.ndarray],
+                  configs: Optional[Sequence[Optional[OCRConfig]]] = None) -> list[str]:
+        """
+        Recognize images concurrently and return the texts in the same order.
+
+        Parameters
+        ----------
+        images : Sequence[numpy.ndarray]
+            Grayscale or BGR images (ex) preprocessed timetable cells).
+        configs : Sequence[OCRConfig or None], optional
+            Config for every image, by default None (tesseract defaults).
+
+        Returns
+        -------
+        list of str
+            Raw recognized texts.
+        """
+        if len(images) == 0:
+            return []
+        if configs is None:
+            configs = [None] * len(images)
+        self.start()
+
+        if self.use_tesserocr:
+            futures = [self.__executor.submit(self.__recognize_tesserocr, image, config)
+                       for image, config in zip(images, configs)]
+            return [future.result() for future in futures]
+
+        groups: dict[Optional[OCRConfig], list[int]] = {}
+        for index, config in enumerate(configs):
+            groups.setdefault(config, []).append(index)
+
+        texts: list[str] = [''] * len(images)
+        futures = []
+        for config, indexes in groups.items():
+            chunk_size = math.ceil(len(indexes) / self.worker_count)
+            for start in range(0, len(indexes), chunk_size):
+                chunk = indexes[start:start + chunk_size]
+                futures.append((chunk, self.__executor.submit(
+                    self.__recognize_batch, [images[index] for index in chunk], config)))
+        for chunk, future in futures:
+            for index, text in zip(chunk, future.result()):
+                texts[index] = text
+        return texts
+
+    def __get_api(self):
+        """
+        Get the tesserocr API of the current worker thread, loading it on first use.
+        """
+        api = getattr(self.__local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=self.lang)
+            self.__local.api = api
+            with self.__apis_lock:
+                self.__apis.append(api)
+        return api
+
+    def __recognize_tesserocr(self, image: np.ndarray, config: Optional[OCRConfig]) -> str:
+        """
+        Recognize one image with the loaded API of the current worker.
+        """
+        api = self.__get_api()
+        config = config or OCRConfig()
+        api.SetPageSegMode(tesserocr.PSM.AUTO if config.psm is None else config.psm)
+        api.SetVariable('tessedit_char_whitelist', config.whitelist or '')
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        if channels == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+        return api.GetUTF8Text()
+
+    def __recognize_batch(self, images: list[np.ndarray], config: Optional[OCRConfig]) -> list[str]:
+        """
+        Recognize images with one tesseract process using a multi-page list file.
+        """
+        options = build_tesseract_config(config)
+        with tempfile.TemporaryDirectory(prefix='hak_ocr_') as temp_dir:
+            paths = []
+            for index, image in enumerate(images):
+                path = os.path.join(temp_dir, f"{index}.png")
+                cv2.imwrite(path, image)
+                paths.append(path)
+            list_path = os.path.join(temp_dir, 'images.txt')
+            with open(list_path, "w", encoding='UTF-8') as file:
+                file.write('\n'.join(paths) + '\n')
+            output = pytesseract.image_to_string(list_path, lang=self.lang, config=options)
+
+        texts = output.split(PAGE_SEPARATOR)
+        if len(texts) > len(images) and texts[-1].strip() == '':
+            texts = texts[:len(images)]
+        if len(texts) == len(images):
+            return texts
+        if len(images) == 1:
+            return [output.replace(PAGE_SEPARATOR, '')]
+        # page count does not match, split the batch so that only a few processes are added
+        # instead of one per image
+        middle = len(images) // 2
+        return self.__recognize_batch(images[:middle], config) + self.__recognize_batch(images[middle:], config)
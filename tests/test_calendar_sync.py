@@ -0,0 +1,213 @@
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from HakModule.Google.CalendarSync import GoogleCalendarSync, MAX_BATCH_SIZE
+import datetime
+import json
+import re
+import threading
+import unittest
+
+
+class CalendarEndpoint:
+    """
+    Local Google Calendar batch endpoint that keeps events in memory.
+
+    Like the real API, an insert of an existing or deleted (cancelled) id is 409, an update of a
+    missing id is 404 and a delete of a missing id is 410. ``failures`` is a list of
+    (status, reason) that the next calls answer with instead.
+    """
+    def __init__(self):
+        self.events: dict[str, dict] = {}
+        self.cancelled: set[str] = set()
+        self.batches: list[list[str]] = []
+        self.failures: list[tuple[int, str]] = []
+        self.lock = threading.Lock()
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode('UTF-8')
+                boundary = re.search(r'boundary="?([^";]+)', self.headers['Content-Type']).group(1)
+                with endpoint.lock:
+                    data = endpoint.answer(body, boundary)
+                self.send_response(200)
+                self.send_header('Content-Type', 'multipart/mixed; boundary=response')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def answer(self, body: str, boundary: str) -> bytes:
+        body = body.replace('\r\n', '\n')
+        parts = [part for part in body.split('--' + boundary) if part.strip() and part.strip() != '--']
+        self.batches.append([])
+        responses = []
+        for part in parts:
+            # unfold the folded header lines of the part
+            content_id = re.search(r'Content-ID: <([^>]+)>', re.sub(r'\n[ \t]+', ' ', part)).group(1)
+            request = part.split('\n\n', 1)[1]
+            request_line, rest = request.split('\n', 1)
+            method, path = request_line.split(' ')[:2]
+            payload = rest.split('\n\n', 1)[1].strip() if '\n\n' in rest else ''
+            self.batches[-1].append(method)
+            status, result = self.call(method, path.split('?')[0].rstrip('/').split('/')[-1], payload)
+            text = '' if result is None else json.dumps(result)
+            responses.append(f'--response\r\nContent-Type: application/http\r\n'
+                             f'Content-ID: <response-{content_id}>\r\n\r\n'
+                             f'HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(text)}\r\n\r\n{text}\r\n')
+        return (''.join(responses) + '--response--').encode('UTF-8')
+
+    def call(self, method: str, event_id: str, payload: str) -> tuple[int, dict]:
+        if self.failures:
+            status, reason = self.failures.pop(0)
+            return status, {'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}
+        if method == 'POST':
+            event = json.loads(payload)
+            if event['id'] in self.events or event['id'] in self.cancelled:
+                return 409, {'error': {'code': 409, 'message': 'duplicate', 'errors': [{'reason': 'duplicate'}]}}
+            self.events[event['id']] = event
+            return 200, event
+        if method == 'PUT':
+            if event_id not in self.events and event_id not in self.cancelled:
+                return 404, {'error': {'code': 404, 'message': 'notFound', 'errors': [{'reason': 'notFound'}]}}
+            self.cancelled.discard(event_id)
+            self.events[event_id] = json.loads(payload)
+            return 200, self.events[event_id]
+        if event_id not in self.events:
+            return 410, {'error': {'code': 410, 'message': 'deleted', 'errors': [{'reason': 'deleted'}]}}
+        del self.events[event_id]
+        self.cancelled.add(event_id)
+        return 204, None
+
+
+def make_class(code: str, name: str, *schedule: list[str]) -> dict:
+    return {'course_info': {'year': 2024, 'semester': 10, 'code': code, 'number': code,
+                            'name_kr': name, 'name_en': name, 'schedule': list(schedule)}}
+
+
+class TestGoogleCalendarSync(unittest.TestCase):
+    semester_start = datetime.date(2024, 3, 4)
+
+    def setUp(self):
+        self.endpoint = CalendarEndpoint()
+        service = build('calendar', 'v3', credentials=AnonymousCredentials(), static_discovery=True,
+                        client_options={'api_endpoint': self.endpoint.url})
+        # the batch uri of the discovery document does not follow api_endpoint
+        batch_uri = self.endpoint.url + 'batch/calendar/v3'
+        service.new_batch_http_request = lambda callback=None: BatchHttpRequest(callback=callback,
+                                                                                batch_uri=batch_uri)
+        self.sync = GoogleCalendarSync(service, retry_delay=0)
+        self.datas = [make_class('10001', 'Calculus', ['월', '09:00-10:30', 'IT', '101'],
+                                 ['수', '09:00-10:30', 'IT', '101']),
+                      make_class('10002', 'Physics', ['화', '13:00-15:00', 'Science', '201'])]
+
+    def tearDown(self):
+        self.endpoint.close()
+
+    def build_events(self, datas=None):
+        return self.sync.build_events(self.datas if datas is None else datas, self.semester_start)
+
+    def test_first_push_and_resync(self):
+        events = self.build_events()
+        result = self.sync.sync(events)
+        self.assertEqual(sorted(result.inserted), sorted(events))
+        self.assertEqual(result.failed, {})
+        self.assertEqual(result.request_count, 1)
+        self.assertEqual(set(self.endpoint.events), set(events))
+
+        # nothing changed, so nothing is sent
+        again = self.sync.sync(self.build_events(), result.state)
+        self.assertEqual((again.inserted, again.updated, again.deleted), ([], [], []))
+        self.assertEqual(again.request_count, 0)
+        self.assertEqual(again.state, result.state)
+
+    def test_rename_is_update(self):
+        result = self.sync.sync(self.build_events())
+        self.datas[1]['course_info']['name_kr'] = 'General Physics'
+        events = self.build_events()
+
+        again = self.sync.sync(events, result.state)
+        self.assertEqual(len(again.updated), 1)
+        self.assertEqual(again.inserted, [])
+        self.assertEqual(self.endpoint.events[again.updated[0]]['summary'], 'General Physics')
+        self.assertEqual(self.endpoint.batches[-1], ['PUT'])
+
+    def test_removed_class_is_deleted(self):
+        result = self.sync.sync(self.build_events())
+        events = self.build_events(self.datas[:1])
+
+        again = self.sync.sync(events, result.state)
+        self.assertEqual(len(again.deleted), 1)
+        self.assertEqual(set(self.endpoint.events), set(events))
+        self.assertEqual(set(again.state), set(events))
+
+    def test_lost_state_insert_becomes_update(self):
+        events = self.build_events()
+        self.sync.sync(events)
+        self.datas[0]['course_info']['name_kr'] = 'Calculus 1'
+
+        # without the state every event is inserted again, and the 409s are retried as updates
+        result = self.sync.sync(self.build_events())
+        self.assertEqual(sorted(result.updated), sorted(events))
+        self.assertEqual(result.failed, {})
+        self.assertEqual(self.endpoint.batches[-1], ['PUT'] * len(events))
+
+    def test_rate_limit_is_retried(self):
+        events = self.build_events()
+        self.endpoint.failures = [(429, 'rateLimitExceeded'), (403, 'userRateLimitExceeded')]
+
+        result = self.sync.sync(events)
+        self.assertEqual(result.failed, {})
+        self.assertEqual(sorted(result.inserted), sorted(events))
+        self.assertEqual(result.request_count, 2)
+
+    def test_forbidden_is_not_retried(self):
+        events = self.build_events()
+        self.endpoint.failures = [(403, 'forbidden')]
+
+        result = self.sync.sync(events)
+        self.assertEqual(len(result.failed), 1)
+        self.assertEqual(result.request_count, 1)
+        # the failed event keeps no state, so the next sync inserts it again
+        self.assertEqual(set(result.state), set(events) - set(result.failed))
+
+    def test_large_sync_is_split_into_batches(self):
+        datas = [make_class(str(20000 + index), f'Class {index}', ['목', '10:00-11:00', 'IT', str(index)])
+                 for index in range(120)]
+        events = self.build_events(datas)
+
+        result = self.sync.sync(events)
+        self.assertEqual(len(result.inserted), 120)
+        self.assertEqual(result.request_count, 3)
+        self.assertTrue(all(len(batch) <= MAX_BATCH_SIZE for batch in self.endpoint.batches))
+
+    def test_holidays_are_excluded_only_on_given_dates(self):
+        data = make_class('10003', 'Chemistry', ['월', '09:00-10:00'], ['목', '09:00-10:00'])
+        data['weekly_course'] = [{'number': week, 'holiday': week == 3} for week in range(1, 17)]
+
+        events = self.sync.build_events([data], self.semester_start)
+        self.assertTrue(all(len(event['recurrence']) == 1 for event in events.values()))
+
+        # the holiday of week 3 is on Thursday, the Monday class still meets
+        holiday = self.semester_start + datetime.timedelta(weeks=2, days=3)
+        events = self.sync.build_events([data], self.semester_start, holiday_dates=[holiday])
+        exdates = [event['recurrence'][1:] for event in events.values()]
+        self.assertEqual(sorted(map(len, exdates)), [0, 1])
+        self.assertIn('20240321T090000', ''.join(sum(exdates, [])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+from google.auth.exceptions import RefreshError
+from google.oauth2 import credentials
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from HakModule.Google.Credentials.TokenRefresher import TokenRefreshScheduler
+import datetime
+import json
+import threading
+import time
+import unittest
+
+
+class TokenEndpoint:
+    """
+    Local OAuth token endpoint that counts the refresh POSTs it answers.
+    """
+    def __init__(self):
+        self.posts: int = 0
+        self.error: str = ''
+        self.delay: float = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.received = threading.Event()
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                endpoint.posts += 1
+                endpoint.received.set()
+                endpoint.release.wait(timeout=10)
+                time.sleep(endpoint.delay)
+                if endpoint.error:
+                    status, body = 400, {'error': endpoint.error, 'error_description': 'Bad Request'}
+                else:
+                    status, body = 200, {'access_token': f'token-{endpoint.posts}', 'expires_in': 3600,
+                                         'token_type': 'Bearer'}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.uri = f'http://127.0.0.1:{self.server.server_address[1]}/token'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MemoryStore:
+    """
+    Credentials store that keeps the saved tokens in a dict.
+    """
+    def __init__(self):
+        self.tokens: dict[str, str] = {}
+
+    def put(self, user_id, cred):
+        self.tokens[user_id] = cred.token
+
+    def delete(self, user_id):
+        self.tokens.pop(user_id, None)
+
+
+class TestTokenRefreshScheduler(unittest.TestCase):
+    def setUp(self):
+        self.endpoint = TokenEndpoint()
+        self.store = MemoryStore()
+        self.scheduler = TokenRefreshScheduler(store=self.store, refresh_margin=60, retry_delay=60)
+
+    def tearDown(self):
+        self.endpoint.close()
+        self.scheduler.close()
+
+    def make_creds(self, expires_in: float) -> credentials.Credentials:
+        # google-auth compares expiry as a naive UTC datetime
+        expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return credentials.Credentials(token='old', refresh_token='refresh', token_uri=self.endpoint.uri,
+                                       client_id='client', client_secret='secret',
+                                       expiry=expiry + datetime.timedelta(seconds=expires_in))
+
+    def wait_until(self, predicate, timeout: float = 5):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                self.fail("condition was not met in time")
+            time.sleep(0.02)
+
+    def test_refresh_before_expiry(self):
+        cred = self.make_creds(expires_in=60.5)
+        self.scheduler.start()
+        self.scheduler.track('user', cred)
+
+        self.wait_until(lambda: self.store.tokens.get('user') == 'token-1')
+        self.assertEqual(self.scheduler.get_creds('user').token, 'token-1')
+        time.sleep(0.5)
+        # the next refresh is due an hour later
+        self.assertEqual(self.endpoint.posts, 1)
+
+    def test_concurrent_refresh_is_coalesced(self):
+        self.endpoint.delay = 0.3
+        self.scheduler.track('user', self.make_creds(expires_in=3600))
+        futures = []
+        threads = [threading.Thread(target=lambda: futures.append(self.scheduler.refresh_now('user')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results = {future.result(timeout=5).token for future in futures}
+        self.assertEqual(results, {'token-1'})
+        self.assertEqual(self.endpoint.posts, 1)
+
+    def test_invalid_grant_backs_off(self):
+        self.endpoint.error = 'invalid_grant'
+        self.scheduler.track('user', self.make_creds(expires_in=-10))
+
+        with self.assertRaises(RefreshError):
+            self.scheduler.refresh_now('user').result(timeout=5)
+        self.assertIsInstance(self.scheduler.get_errors()['user'], RefreshError)
+
+        # expired credentials do not start another refresh while the retry waits
+        for _ in range(5):
+            self.assertIsNotNone(self.scheduler.get_creds('user'))
+        time.sleep(0.3)
+        self.assertEqual(self.endpoint.posts, 1)
+
+    def test_untrack_during_refresh_drops_result(self):
+        self.endpoint.release.clear()
+        self.scheduler.track('user', self.make_creds(expires_in=3600))
+        future = self.scheduler.refresh_now('user')
+        self.assertTrue(self.endpoint.received.wait(timeout=5))
+
+        self.scheduler.untrack('user')
+        self.store.delete('user')
+        self.endpoint.release.set()
+        future.result(timeout=5)
+
+        self.assertNotIn('user', self.store.tokens)
+        self.assertIsNone(self.scheduler.get_creds('user'))
+
+    def test_track_during_refresh_keeps_new_creds(self):
+        self.endpoint.release.clear()
+        self.scheduler.track('user', self.make_creds(expires_in=3600))
+        old_future = self.scheduler.refresh_now('user')
+        self.assertTrue(self.endpoint.received.wait(timeout=5))
+
+        # the user consents again while the old token is being refreshed
+        new_cred = self.make_creds(expires_in=3600)
+        new_cred.token = 'consented'
+        self.scheduler.track('user', new_cred)
+        self.endpoint.release.set()
+        old_future.result(timeout=5)
+
+        self.assertIs(self.scheduler.get_creds('user'), new_cred)
+        self.assertEqual(new_cred.token, 'consented')
+        self.assertNotIn('user', self.store.tokens)
+
+        # a new refresh runs for the new credentials instead of sharing the dropped one
+        self.assertIs(self.scheduler.refresh_now('user').result(timeout=5), new_cred)
+        self.assertEqual(self.endpoint.posts, 2)
+        self.assertEqual(self.store.tokens['user'], new_cred.token)
+
+
+if __name__ == '__main__':
+    unittest.main()